@@ -1,12 +1,75 @@
 from __future__ import annotations
+import importlib
+import click
 import typer
-from .train import app as train_app
-from .predict import app as predict_app
-from .log_actuals import app as actuals_app
-from .dashboards import app as dashboards_app
-
-app = typer.Typer(help="WhiteShorts 3.0 CLI")
-app.add_typer(train_app, name="train")
-app.add_typer(predict_app, name="predict")
-app.add_typer(actuals_app, name="log-actuals")
-app.add_typer(dashboards_app, name="dashboards")
+from typer.core import TyperGroup
+from ..utils import trace
+
+# The `ws` entry point loads sub-apps lazily: a sub-command's module (and the
+# pandas / DuckDB / LightGBM / sklearn / statsmodels stack behind it) is only
+# imported when that sub-command is dispatched. `ws --help` lists the
+# sub-commands from the help strings below without importing any of them.
+# `ws bench startup` measures the import cost of each command.
+#
+# `ws --profile [--trace-json run.json] <command>` traces the run's stages
+# (utils/trace.py): spans go to the DuckDB `run_spans` table and a summary is
+# printed at exit. WS_PROFILE=1 does the same for `python -m` entry points.
+
+trace.start_from_env()
+
+SUBCOMMANDS = {
+    # name: (module under white_shorts.cli exposing `app`, its help text)
+    "train": ("train", "Training commands"),
+    "predict": ("predict", "Prediction commands"),
+    "log-actuals": ("log_actuals", "Actuals logging"),
+    "dashboards": ("dashboards", "Metrics extraction and dashboard artifact writer"),
+    "bench": ("bench", "Benchmarks and parity checks for the hot paths"),
+    "backtest": ("backtest", "Walk-forward backtests over past seasons (point-in-time features)"),
+    "daily": ("daily", "Daily pipeline in one process: fetch slate → actuals → train → predict → dashboards"),
+    "fixtures": ("fixtures", "Local SportsData stand-in server for offline and load-test runs"),
+}
+
+
+class LazyGroup(TyperGroup):
+    """TyperGroup whose SUBCOMMANDS are imported on first use."""
+
+    _listing = False
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return list(super().list_commands(ctx)) + [n for n in SUBCOMMANDS if n not in self.commands]
+
+    def get_command(self, ctx: click.Context, name: str) -> click.Command | None:
+        if name in self.commands or name not in SUBCOMMANDS:
+            return super().get_command(ctx, name)
+        module, help_text = SUBCOMMANDS[name]
+        if self._listing:
+            # listing sub-commands for --help: a stub carrying the help text is enough
+            return click.Group(name, help=help_text)
+        sub = importlib.import_module(f"{__name__}.{module}").app
+        cmd = typer.main.get_group(sub)       # a group even for one-command apps: `ws train all`
+        cmd.name = name
+        self.add_command(cmd, name)
+        return cmd
+
+    def format_help(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        self._listing = True
+        try:
+            super().format_help(ctx, formatter)
+        finally:
+            self._listing = False
+
+
+app = typer.Typer(help="WhiteShorts 3.0 CLI", cls=LazyGroup)
+
+
+@app.callback()
+def main(
+    ctx: typer.Context,
+    profile: bool = typer.Option(trace._flag("WS_PROFILE"), "--profile/--no-profile",
+                                 help="Trace stage timings, CPU, RSS and row counts into run_spans"),
+    trace_json: str = typer.Option(None, envvar="WS_TRACE_JSON",
+                                   help="Also write the spans as a Chrome trace (chrome://tracing, Perfetto)"),
+) -> None:
+    if profile or trace_json:
+        trace.start(trace_json=trace_json)
+        ctx.call_on_close(trace.finish)
@@ -12,6 +12,7 @@ from ..data.persist import init_db, append, PRED_COLS
 from ..modeling.trainers_qrf import train_player_qrf, qrf_predict_with_quantiles
 from ..modeling.io_qrf import save_qrf, load_latest
 from ..modeling.ets_totals import fit_team_ets, forecast_next
+from ..utils.trace import traced
 
 app = typer.Typer(help="QRF players + ETS totals predictions (additive CLI)")
 
@@ -22,6 +23,7 @@ def _bundle_from_loaded(d):
     b.model_name = d["model_name"]; b.model_version = d["model_version"]
     return b
 
+@traced
 def _load_or_train(prefix: str, df_feat: pd.DataFrame, features: list[str], target: str):
     d = load_latest(prefix, features)
     if d and d.get("features") == features:
@@ -1,14 +1,22 @@
 ﻿from __future__ import annotations
 import glob, json, os
 import pandas as pd
-import duckdb
 import typer
-from ..config import settings
+from ..data.persist import connection
+from ..modeling import registry
 
 app = typer.Typer(help="Training provenance audit utilities")
 
 @app.command()
-def print_latest(models_dir: str = typer.Option("models", help="Folder with *.meta.json")):
+def print_latest(models_dir: str = typer.Option("models", help="Models folder (registry.sqlite or *.meta.json)")):
+    reg = registry.history(models_dir)
+    if not reg.empty:
+        act = reg[reg["active"] == 1]
+        cols = ["id","model_name","target","feature_sig","model_version","path","format",
+                "data_fingerprint","train_rows","size_bytes","train_seconds","created_ts"]
+        typer.echo(f"ACTIVE MODELS → {registry.registry_path(models_dir)}")
+        typer.echo(act[cols].to_string(index=False))
+        return
     files = sorted(glob.glob(os.path.join(models_dir, "*.meta.json")))
     if not files:
         typer.echo("No model meta files found.")
@@ -18,8 +26,32 @@ def print_latest(models_dir: str = typer.Option("models", help="Folder with *.me
     typer.echo(open(latest, "r", encoding="utf-8").read())
 
 @app.command()
-def persist(models_dir: str = typer.Option("models", help="Folder with *.meta.json")):
-    """Load all model meta JSONs and persist a flat audit table in DuckDB."""
+def persist(models_dir: str = typer.Option("models", help="Models folder (registry.sqlite or *.meta.json)")):
+    """Mirror the model registry into DuckDB (model_registry), new rows only.
+
+    Folders without a registry fall back to loading all *.meta.json into training_audit.
+    """
+    if registry.registry_path(models_dir).exists():
+        with connection() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS model_registry (
+                    id BIGINT, model_name VARCHAR, target VARCHAR, feature_sig VARCHAR, features VARCHAR,
+                    model_version VARCHAR, path VARCHAR, format VARCHAR, data_fingerprint VARCHAR,
+                    train_rows BIGINT, size_bytes BIGINT, train_seconds DOUBLE, created_ts VARCHAR,
+                    active BOOLEAN)""")
+            last = con.execute("SELECT COALESCE(MAX(id), 0) FROM model_registry").fetchone()[0]
+            reg = registry.history(models_dir)
+            reg["active"] = reg["active"].astype(bool)
+            new = reg[reg["id"] > last]
+            if not new.empty:
+                con.register("new_models", new)
+                con.execute("INSERT INTO model_registry BY NAME SELECT * FROM new_models")
+            # active flags move when a newer model is registered
+            con.register("active_ids", reg.loc[reg["active"], ["id"]])
+            con.execute("UPDATE model_registry SET active = id IN (SELECT id FROM active_ids)")
+        typer.echo(f"Persisted {len(new)} new registry rows into model_registry")
+        return
+
     files = sorted(glob.glob(os.path.join(models_dir, "*.meta.json")))
     if not files:
         typer.echo("No model meta files found; nothing to persist.")
@@ -38,14 +70,11 @@ def persist(models_dir: str = typer.Option("models", help="Folder with *.meta.js
         raise typer.Exit(code=0)
 
     df = pd.DataFrame(rows)
-    con = duckdb.connect(settings.DUCKDB_PATH)
-    try:
+    with connection() as con:
         con.execute("CREATE TABLE IF NOT EXISTS training_audit AS SELECT * FROM df LIMIT 0")
         con.execute("INSERT INTO training_audit SELECT * FROM df")
-    finally:
-        con.close()
 
-    typer.echo(f"Persisted {len[df]} rows into training_audit")
+    typer.echo(f"Persisted {len(df)} rows into training_audit")
     cols = [c for c in df.columns if c in ("created_ts","model_name","model_version","target","train_rows","train_cutoff_max_date","features_hash")]
     if cols:
         typer.echo(df[cols].sort_values("created_ts").tail(10).to_string(index=False))
@@ -0,0 +1,129 @@
+from __future__ import annotations
+import os, time, uuid, shutil
+from datetime import datetime
+from pathlib import Path
+from typing import List
+import typer
+import pandas as pd
+
+from ..data.load_ytd import load_ytd
+from ..data.persist import append, connection, in_session
+from ..modeling.backtest import BACKTEST_DIR, TARGETS, fold_jobs, plan_folds, season_features, write_features
+from ..modeling.scheduler import default_workers, run_jobs
+
+app = typer.Typer(help="Walk-forward backtests over past seasons (point-in-time features)")
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS backtest_daily (
+    run_id VARCHAR, season VARCHAR, model VARCHAR, target VARCHAR, date DATE, fold INTEGER,
+    n BIGINT, mae DOUBLE, rmse DOUBLE, bias DOUBLE, coverage_80 DOUBLE, pinball_10 DOUBLE, pinball_90 DOUBLE,
+    train_rows BIGINT, fit_seconds DOUBLE, predict_seconds DOUBLE, rows_per_sec DOUBLE, created_ts TIMESTAMP);
+CREATE TABLE IF NOT EXISTS backtest_runs (
+    run_id VARCHAR, season VARCHAR, model VARCHAR, folds INTEGER, days INTEGER, rows BIGINT,
+    feature_seconds DOUBLE, wall_seconds DOUBLE, cpu_seconds DOUBLE, workers INTEGER,
+    warmup_days INTEGER, retrain_every INTEGER, trees INTEGER, failed_folds INTEGER, created_ts TIMESTAMP);
+"""
+
+
+def _ensure_tables() -> None:
+    with connection() as con:
+        con.execute(_DDL)
+
+
+@app.command()
+@in_session
+def run(
+    csv: List[str] = typer.Option(..., "--csv", help="Season CSV (repeat --csv for several seasons)"),
+    model: str = typer.Option("qrf", help="Pipeline to replay: qrf | lgbm"),
+    warmup_days: int = typer.Option(21, help="Days of history before the first scored day"),
+    retrain_every: int = typer.Option(7, help="Days per fold (model refit cadence)"),
+    max_days: int = typer.Option(None, help="Score at most this many days per season"),
+    trees: int = typer.Option(200, help="QRF trees per fold"),
+    workers: int = typer.Option(None, help="Fold processes (default: env WS_TRAIN_WORKERS or one per core)"),
+    work_dir: str = typer.Option(BACKTEST_DIR, help="Scratch dir for the shared point-in-time feature files"),
+):
+    """Replay each season day by day: refit per fold, score every day, write metrics to DuckDB."""
+    _ensure_tables()
+    run_id = os.getenv("WS_RUN_ID", f"bt-{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}")
+    scratch = Path(work_dir) / run_id
+    jobs, seasons = [], {}
+    for path in csv:
+        season = Path(path).stem
+        t0 = time.perf_counter()
+        train, pit = season_features(load_ytd(path))
+        feat_s = time.perf_counter() - t0
+        folds = plan_folds(pit["date"], season, warmup_days, retrain_every, max_days)
+        seasons[season] = dict(folds=len(folds), days=sum(f.days for f in folds), rows=len(pit),
+                               feature_seconds=feat_s, wall_seconds=0.0, cpu_seconds=0.0, failed_folds=0)
+        typer.echo(f"{season}: {len(pit):,} rows, point-in-time features {feat_s:.2f}s, "
+                   f"{len(folds)} folds / {seasons[season]['days']} days")
+        jobs += fold_jobs(folds, write_features(train, scratch, f"train_{season}"),
+                          write_features(pit, scratch, f"pit_{season}"), model, TARGETS, trees)
+
+    frames = []
+    t0 = time.perf_counter()
+    try:
+        for r in run_jobs(jobs, workers=workers):
+            season = r.name.split("#")[0]
+            seasons[season]["cpu_seconds"] += r.cpu_s
+            if r.error:
+                seasons[season]["failed_folds"] += 1
+            elif r.result is not None and not r.result.empty:
+                frames.append(r.result)
+            typer.echo(f"  {r.name}: {r.timing()}" if not r.error else f"  {r.summary()}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    wall = time.perf_counter() - t0
+    n_workers = min(len(jobs), workers or default_workers(len(jobs))) if jobs else 0   # as run_jobs sizes its pool
+
+    now = datetime.utcnow()
+    daily = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if not daily.empty:
+        append("backtest_daily", daily.assign(run_id=run_id, created_ts=now))
+    runs = pd.DataFrame([dict(run_id=run_id, season=s, model=model, workers=n_workers, warmup_days=warmup_days,
+                              retrain_every=retrain_every, trees=trees, created_ts=now,
+                              **{**v, "wall_seconds": wall}) for s, v in seasons.items()])
+    append("backtest_runs", runs)
+
+    if daily.empty:
+        typer.echo("No days scored.")
+        raise typer.Exit(code=1)
+    summary = (daily.assign(w_mae=daily["mae"] * daily["n"], w_cov=daily["coverage_80"] * daily["n"])
+                    .groupby(["season", "target"])[["n", "w_mae", "w_cov"]].sum())
+    summary["mae"] = summary.pop("w_mae") / summary["n"]
+    summary["coverage_80"] = summary.pop("w_cov") / summary["n"]
+    typer.echo(summary.round(3).to_string())
+    scored = int(daily.groupby(["season", "date"])["n"].first().sum())
+    typer.echo(f"run {run_id}: {scored:,} player-games scored over {len(jobs)} folds in {wall:.1f}s "
+               f"({scored / max(wall, 1e-9):,.0f} player-games/s end to end)")
+    if any(v["failed_folds"] for v in seasons.values()):
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def show(run_id: str = typer.Option(None, help="Run to summarise (default: latest)")):
+    """Per-season, per-target metrics of a stored backtest run."""
+    _ensure_tables()
+    with connection() as con:
+        if run_id is None:
+            row = con.execute("SELECT run_id FROM backtest_runs ORDER BY created_ts DESC LIMIT 1").fetchone()
+            if row is None:
+                typer.echo("No backtest runs stored.")
+                raise typer.Exit(code=1)
+            run_id = row[0]
+        df = con.execute("""
+            SELECT season, model, target, SUM(n) AS n,
+                   SUM(mae * n) / SUM(n) AS mae, SQRT(SUM(rmse * rmse * n) / SUM(n)) AS rmse,
+                   SUM(bias * n) / SUM(n) AS bias, SUM(coverage_80 * n) / SUM(n) AS coverage_80,
+                   SUM(pinball_10 * n) / SUM(n) AS pinball_10, SUM(pinball_90 * n) / SUM(n) AS pinball_90,
+                   COUNT(DISTINCT date) AS days
+            FROM backtest_daily WHERE run_id = ? GROUP BY ALL ORDER BY season, target""", [run_id]).df()
+        runs = con.execute("SELECT season, folds, days, rows, feature_seconds, wall_seconds, cpu_seconds, workers "
+                           "FROM backtest_runs WHERE run_id = ? ORDER BY season", [run_id]).df()
+    typer.echo(f"run {run_id}")
+    typer.echo(df.round(4).to_string(index=False))
+    typer.echo(runs.round(2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,749 @@
+from __future__ import annotations
+import os
+import json
+import time
+import random
+import tracemalloc
+from pathlib import Path
+import typer
+import pandas as pd
+
+from ..data.load_ytd import load_ytd
+from ..data import columnar_cache
+from ..features.engineer import engineer_minimal
+from ..features.engine import engineer_fast
+
+app = typer.Typer(help="Benchmarks and parity checks for the hot paths")
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+@app.command()
+def features(
+    ytd_csv: str = typer.Option(None, help="Path to YTD CSV (defaults to env WS_YTD_CSV or data/NHL_2023_24.csv)"),
+    repeat: int = typer.Option(3, help="Timed repetitions per engine"),
+):
+    """Check engineer_fast == engineer_minimal column for column, then time both."""
+    df = load_ytd(ytd_csv or os.getenv("WS_YTD_CSV", "data/NHL_2023_24.csv"))
+
+    ref, _ = _timed(engineer_minimal, df)
+    fast, _ = _timed(engineer_fast, df)
+    pd.testing.assert_index_equal(ref.columns, fast.columns)
+    pd.testing.assert_index_equal(ref.index, fast.index)
+    for c in ref.columns:
+        pd.testing.assert_series_equal(ref[c], fast[c], check_dtype=False, check_exact=False, rtol=1e-9)
+    typer.echo(f"Parity OK: {len(ref)} rows x {len(ref.columns)} columns")
+
+    t_ref = min(_timed(engineer_minimal, df)[1] for _ in range(repeat))
+    t_fast = min(_timed(engineer_fast, df)[1] for _ in range(repeat))
+    typer.echo(f"engineer_minimal: {t_ref:.3f}s")
+    typer.echo(f"engineer_fast   : {t_fast:.3f}s  ({t_ref / max(t_fast, 1e-9):.1f}x)")
+
+@app.command()
+def load(
+    ytd_csv: str = typer.Option(None, help="Path to YTD CSV (defaults to env WS_YTD_CSV or data/NHL_2023_24.csv)"),
+    repeat: int = typer.Option(5, help="Timed warm loads"),
+):
+    """Cold (CSV parse + cache write) vs warm (memory-mapped Arrow) load_ytd."""
+    path = ytd_csv or os.getenv("WS_YTD_CSV", "data/NHL_2023_24.csv")
+    if not columnar_cache.cache_enabled():
+        typer.echo("Columnar cache disabled (pyarrow missing or WS_CSV_CACHE=0)")
+        raise typer.Exit(code=1)
+
+    raw, t_raw = _timed(load_ytd, path, use_cache=False)
+    columnar_cache.clear(path)
+    cold, t_cold = _timed(load_ytd, path)
+    warm, _ = _timed(load_ytd, path)
+    pd.testing.assert_frame_equal(raw, warm)
+    t_warm = min(_timed(load_ytd, path)[1] for _ in range(repeat))
+
+    typer.echo(f"rows: {len(raw)}  csv: {os.path.getsize(path) / 1e6:.1f} MB")
+    typer.echo(f"uncached : {t_raw:.3f}s")
+    typer.echo(f"cold     : {t_cold:.3f}s  (parse + write cache)")
+    typer.echo(f"warm     : {t_warm:.3f}s  ({t_raw / max(t_warm, 1e-9):.1f}x vs uncached)")
+
+def _synthetic_payload(days: int, rows_per_day: int, extra_fields: int = 90) -> bytes:
+    """PlayerGameStatsByDate-shaped JSON array: the FIELD_MAP fields plus filler stats."""
+    rng = random.Random(7)
+    teams = ["BOS", "TOR", "MTL", "NYR", "EDM", "VAN", "CGY", "SEA", "COL", "DAL"]
+    recs = []
+    for d in pd.date_range("2025-10-07", periods=days, freq="D"):
+        for i in range(rows_per_day):
+            t = teams[i % len(teams)]
+            rec = {"DateTime": d.strftime("%Y-%m-%dT19:00:00"), "GameID": 20000 + i // 40, "Team": t,
+                   "Opponent": teams[(i + 1) % len(teams)], "PlayerID": 30000000 + i, "Name": f"Player {i}",
+                   "Points": rng.randint(0, 3), "Goals": rng.randint(0, 2), "Assists": rng.randint(0, 2),
+                   "ShotsOnGoal": rng.randint(0, 6), "Minutes": rng.randint(5, 25)}
+            rec.update({f"Stat{k}": rng.random() for k in range(extra_fields)})
+            recs.append(rec)
+    return json.dumps(recs).encode("utf-8")
+
+def _legacy_normalize(body: bytes) -> pd.DataFrame:
+    """The pre-streaming path: json.loads -> DataFrame -> rename -> per-row date parse."""
+    from .update_history import FIELD_MAP, REQUIRED, _parse_date
+    df = pd.DataFrame(json.loads(body)).rename(columns=FIELD_MAP)
+    df["date"] = df["date"].apply(_parse_date)
+    for c in ("game_id", "player_id"):
+        df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
+    for c in ("team", "opponent", "name"):
+        df[c] = df[c].astype(str).str.strip()
+    for c in ("points", "goals", "assists", "shots_on_goal"):
+        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).astype(float)
+    return df[REQUIRED].dropna(subset=["date", "game_id", "team", "opponent", "player_id"])
+
+def _peak(fn, *args):
+    tracemalloc.start()
+    try:
+        out, secs = _timed(fn, *args)
+        return out, secs, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+@app.command()
+def ingest(
+    days: int = typer.Option(1, help="Days in the payload (multi-day pull when > 1)"),
+    rows_per_day: int = typer.Option(800, help="Player rows per day (a full slate is ~700-800)"),
+    repeat: int = typer.Option(3, help="Timed repetitions per path"),
+):
+    """Legacy json.loads + per-row parse vs streaming JSON -> Arrow ingest of actuals."""
+    from .update_history import _decode_actuals, _normalize
+    body = _synthetic_payload(days, rows_per_day)
+    new = lambda b: _normalize(_decode_actuals(b))
+
+    ref, _, peak_ref = _peak(_legacy_normalize, body)
+    out, _, peak_new = _peak(new, body)
+    pd.testing.assert_frame_equal(ref.reset_index(drop=True), out.reset_index(drop=True), check_dtype=False)
+    typer.echo(f"Parity OK: {len(out)} rows from {len(body) / 1e6:.1f} MB of JSON")
+
+    t_ref = min(_timed(_legacy_normalize, body)[1] for _ in range(repeat))
+    t_new = min(_timed(new, body)[1] for _ in range(repeat))
+    typer.echo(f"legacy   : {t_ref:.3f}s  peak {peak_ref / 1e6:.1f} MB")
+    typer.echo(f"streaming: {t_new:.3f}s  peak {peak_new / 1e6:.1f} MB  ({t_ref / max(t_new, 1e-9):.1f}x)")
+
+@app.command()
+def qrf(
+    ytd_csv: str = typer.Option(None, help="Path to YTD CSV (defaults to env WS_YTD_CSV or data/NHL_2023_24.csv)"),
+    target: str = typer.Option("points", help="Player target"),
+    trees: int = typer.Option(200, help="Trees in the benchmark forest"),
+    holdout: float = typer.Option(0.1, help="Fraction of latest dates held out"),
+    grid: int = typer.Option(3, help="Quantile levels, evenly spaced over [0.1, 0.9]"),
+    repeat: int = typer.Option(3, help="Timed repetitions per path"),
+):
+    """Per-tree loop (quantiles of tree means) vs leaf-weight QRF: speed, coverage and width."""
+    import numpy as np
+    from ..features.registry import PLAYER_FEATURES
+    from ..modeling.trainers_qrf import train_player_qrf, qrf_predict_quantile_grid, ModelBundle
+
+    df = engineer_fast(load_ytd(ytd_csv or os.getenv("WS_YTD_CSV", "data/NHL_2023_24.csv")))
+    df = df.dropna(subset=[target])
+    cut = df["date"].quantile(1 - holdout)
+    train, test = df[df["date"] <= cut], df[df["date"] > cut]
+
+    bundle, t_fit = _timed(train_player_qrf, train, PLAYER_FEATURES, target, mode="leaf", n_estimators=trees)
+    legacy = ModelBundle(bundle.model.forest, bundle.features, bundle.target, bundle.model_name, bundle.model_version)
+    typer.echo(f"train {len(train)} rows / test {len(test)} rows, {trees} trees, fit+index {t_fit:.1f}s")
+
+    qs = list(np.linspace(0.1, 0.9, max(2, grid)))
+    y = test[target].to_numpy(dtype=float)
+    for name, b in (("per-tree loop", legacy), ("leaf-weight QRF", bundle)):
+        (_, q), _ = _timed(qrf_predict_quantile_grid, b, test, qs)
+        t = min(_timed(qrf_predict_quantile_grid, b, test, qs)[1] for _ in range(repeat))
+        cover = np.mean((y >= q[:, 0]) & (y <= q[:, -1]))
+        typer.echo(f"{name:16s}: {t:.3f}s  ({len(test) / max(t, 1e-9):,.0f} rows/s)  "
+                   f"q10-q90 coverage {cover:.3f}  mean width {np.mean(q[:, -1] - q[:, 0]):.2f}")
+
+@app.command("qrf-multi")
+def qrf_multi(
+    ytd_csv: str = typer.Option(None, help="Path to YTD CSV (defaults to env WS_YTD_CSV or data/NHL_2023_24.csv)"),
+    trees: int = typer.Option(200, help="Trees per forest"),
+    holdout: float = typer.Option(0.1, help="Fraction of latest dates held out"),
+):
+    """Per-target forests vs one multi-output forest: fit/predict time, size, MAE, pinball loss, coverage."""
+    import io, joblib
+    import numpy as np
+    from ..features.registry import PLAYER_FEATURES
+    from ..modeling.trainers_qrf import (QRF_TARGETS, train_player_qrf, train_player_qrf_multi,
+                                         qrf_predict_quantile_grid, qrf_predict_multi)
+
+    df = engineer_fast(load_ytd(ytd_csv or os.getenv("WS_YTD_CSV", "data/NHL_2023_24.csv")))
+    df = df.dropna(subset=list(QRF_TARGETS))
+    cut = df["date"].quantile(1 - holdout)
+    train, test = df[df["date"] <= cut], df[df["date"] > cut]
+    qs = [0.1, 0.5, 0.9]
+
+    def _size(obj) -> float:
+        buf = io.BytesIO()
+        joblib.dump(obj, buf)
+        return buf.tell() / 1e6
+
+    t0 = time.perf_counter()
+    singles = {t: train_player_qrf(train, PLAYER_FEATURES, t, mode="leaf", n_estimators=trees) for t in QRF_TARGETS}
+    fit_single = time.perf_counter() - t0
+    multi, fit_multi = _timed(train_player_qrf_multi, train, PLAYER_FEATURES, list(QRF_TARGETS), n_estimators=trees)
+
+    preds_single, t_single = _timed(lambda: {t: qrf_predict_quantile_grid(b, test, qs) for t, b in singles.items()})
+    preds_multi, t_multi = _timed(qrf_predict_multi, multi, test, qs)
+    size_single = sum(_size(b.model) for b in singles.values())
+    typer.echo(f"train {len(train)} rows / test {len(test)} rows, {trees} trees per forest")
+    typer.echo(f"per-target: fit {fit_single:.1f}s  predict {t_single:.3f}s  size {size_single:.1f} MB")
+    typer.echo(f"multi     : fit {fit_multi:.1f}s  predict {t_multi:.3f}s  size {_size(multi.model):.1f} MB")
+
+    for t in QRF_TARGETS:
+        y = test[t].to_numpy(dtype=float)
+        for name, (mean, q) in (("per-target", preds_single[t]), ("multi", preds_multi[t])):
+            pinball = np.mean([np.mean(np.maximum(a * (y - q[:, i]), (a - 1) * (y - q[:, i]))) for i, a in enumerate(qs)])
+            cover = np.mean((y >= q[:, 0]) & (y <= q[:, -1]))
+            typer.echo(f"  {t:14s} {name:10s}: MAE {np.mean(np.abs(y - mean)):.3f}  "
+                       f"pinball {pinball:.3f}  q10-q90 coverage {cover:.3f}")
+
+def _rss_mb() -> tuple[float, float]:
+    """(resident, file-backed shared) MB of this process, from /proc/self/statm."""
+    page = os.sysconf("SC_PAGE_SIZE")
+    with open("/proc/self/statm") as f:
+        _, resident, shared = (int(x) for x in f.read().split()[:3])
+    return resident * page / 1e6, shared * page / 1e6
+
+def _artifact_probe(path: str, csv: str, rows: int) -> None:
+    """Run in a fresh interpreter: load time, RSS after load and after a predict pass (JSON on stdout)."""
+    from types import SimpleNamespace
+    from ..modeling.io_qrf import load_path
+    from ..modeling.trainers_qrf import qrf_predict_quantile_grid
+    X = pd.read_csv(csv, nrows=rows)
+    rss0, sh0 = _rss_mb()
+    d, t_load = _timed(load_path, path)
+    rss1, sh1 = _rss_mb()
+    (mean, q), t_pred = _timed(qrf_predict_quantile_grid, SimpleNamespace(output=0, **d), X, [0.1, 0.5, 0.9])
+    rss2, sh2 = _rss_mb()
+    # private = anonymous memory only this process holds; shared = file-backed pages (mmap, page cache)
+    print(json.dumps({"load_s": t_load, "predict_s": t_pred,
+                      "private_load": (rss1 - sh1) - (rss0 - sh0), "private_pred": (rss2 - sh2) - (rss0 - sh0),
+                      "shared_pred": sh2 - sh0, "mean": mean.tolist()[:50], "q": q[:50].tolist()}))
+
+@app.command()
+def artifacts(
+    ytd_csv: str = typer.Option(None, help="Path to YTD CSV (defaults to env WS_YTD_CSV or data/NHL_2023_24.csv)"),
+    target: str = typer.Option("points", help="Player target"),
+    trees: int = typer.Option(200, help="Trees in the benchmark forest"),
+    pruned_trees: int = typer.Option(100, help="Trees kept by the pruned variant"),
+    rows: int = typer.Option(2000, help="Rows scored after loading"),
+    out_dir: str = typer.Option("data/bench_artifacts", help="Where the artifacts are written"),
+):
+    """joblib vs compact (mmap) vs quantized vs pruned QRF artifacts: size, load time, RSS, parity."""
+    import subprocess, sys, tempfile
+    import numpy as np
+    from ..features.registry import PLAYER_FEATURES
+    from ..modeling.trainers_qrf import train_player_qrf
+    from ..modeling import io_qrf
+    from ..modeling.artifacts import save_artifact, artifact_bytes
+
+    df = engineer_fast(load_ytd(ytd_csv or os.getenv("WS_YTD_CSV", "data/NHL_2023_24.csv"))).dropna(subset=[target])
+    bundle = train_player_qrf(df, PLAYER_FEATURES, target, mode="leaf", n_estimators=trees)
+    os.makedirs(out_dir, exist_ok=True)
+    io_qrf.DEFAULT_DIR = Path(out_dir)
+    paths = {
+        "joblib": io_qrf.save_qrf(bundle, fmt="joblib"),
+        "compact": save_artifact(bundle, Path(out_dir) / "compact.qrf"),
+        "quantized": save_artifact(bundle, Path(out_dir) / "quantized.qrf", quantize=True),
+        f"pruned-{pruned_trees}": save_artifact(bundle, Path(out_dir) / "pruned.qrf", max_trees=pruned_trees),
+    }
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+        df[PLAYER_FEATURES].sample(min(rows, len(df)), random_state=0).to_csv(f, index=False)
+    typer.echo(f"{len(df)} training rows, {trees} trees; scoring {rows} rows per variant in a fresh process")
+    ref = None
+    for name, path in paths.items():
+        out = subprocess.run([sys.executable, "-c", "import sys; from white_shorts.cli.bench import _artifact_probe; "
+                              "_artifact_probe(sys.argv[1], sys.argv[2], int(sys.argv[3]))", path, f.name, str(rows)],
+                             capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        ref = ref or r
+        dq = np.mean(np.asarray(r["q"]) != np.asarray(ref["q"]))
+        dm = np.max(np.abs(np.asarray(r["mean"]) - np.asarray(ref["mean"])))
+        typer.echo(f"{name:11s}: {artifact_bytes(path) / 1e6:7.1f} MB  load {r['load_s']:.3f}s  "
+                   f"private RSS +{r['private_load']:.0f} MB loaded / +{r['private_pred']:.0f} MB after predict, "
+                   f"shared +{r['shared_pred']:.0f} MB  predict {r['predict_s']:.3f}s  "
+                   f"vs joblib: max |dmean| {dm:.2g}, quantile mismatch {dq:.1%}")
+    os.unlink(f.name)
+
+@app.command()
+def poisson(
+    rows: str = typer.Option("1000,10000,100000", help="Comma-separated slate sizes"),
+    k_max: int = typer.Option(10, help="Largest k in P(X>=k)"),
+    legacy_rows: int = typer.Option(2000, help="Per-row path is timed on at most this many rows and scaled"),
+):
+    """Per-row scipy ppf/cdf + json.dumps vs array kernels (exact and CDF-table) for q10/q90 + P(X>=k) JSON."""
+    import numpy as np
+    from ..modeling.poisson import (poisson_quantiles, p_ge_k_json, poisson_quantiles_array,
+                                    p_ge_k_json_array, p_ge_k_matrix, default_cdf_table)
+
+    table, t_table = _timed(default_cdf_table)
+    typer.echo(f"CDF table build {t_table:.3f}s ({table.table.nbytes / 1e6:.1f} MB)")
+    rng = np.random.default_rng(0)
+    for n in (int(x) for x in rows.split(",")):
+        lam = rng.gamma(1.5, 0.6, n)
+        m = min(n, legacy_rows)
+
+        def legacy():
+            q = [poisson_quantiles(float(l)) for l in lam[:m]]
+            return q, [p_ge_k_json(float(l), k_max) for l in lam[:m]]
+
+        (q_ref, js_ref), t_ref = _timed(legacy)
+        t_ref *= n / m
+        exact = lambda: (poisson_quantiles_array(lam), p_ge_k_json_array(lam, k_max))
+        tabled = lambda: (poisson_quantiles_array(lam), p_ge_k_json_array(lam, k_max, table))
+        (q, js), t_exact = _timed(exact)
+        _, t_tab = _timed(tabled)
+        ok_q = np.array_equal(q[:m], np.asarray(q_ref))
+        err = np.abs(p_ge_k_matrix(lam[:m], k_max) - np.array([json.loads(s) for s in js_ref])).max()
+        err_t = np.abs(p_ge_k_matrix(lam[:m], k_max, table) - p_ge_k_matrix(lam[:m], k_max)).max()
+        typer.echo(f"{n:>7,} rows: per-row {t_ref:8.3f}s{'*' if m < n else ' '}  array {t_exact:.4f}s "
+                   f"({t_ref / max(t_exact, 1e-9):,.0f}x)  table {t_tab:.4f}s  "
+                   f"quantiles equal: {ok_q}  max |dP| {err:.1e} (table {err_t:.1e})")
+    typer.echo(f"* per-row time measured on {legacy_rows:,} rows and scaled linearly")
+    for lam in (np.array([np.nan]), np.array([np.nan, 0.0, 1.2, np.nan])):
+        q_ref = np.array([poisson_quantiles(float(l)) for l in lam])
+        ok_q = np.array_equal(poisson_quantiles_array(lam), q_ref, equal_nan=True)
+        js = p_ge_k_json_array(lam, k_max)
+        ok_js = js == [p_ge_k_json(float(l), k_max) for l in lam] and all(json.loads(s) for s in js)
+        typer.echo(f"NaN lambdas {lam.tolist()}: quantiles equal: {ok_q}  JSON equal + parses: {ok_js}")
+
+@app.command()
+def ets(
+    ytd_csv: str = typer.Option(os.getenv("WS_YTD_CSV", "data/NHL_2023_24.csv"), help="History CSV"),
+    holdout_days: int = typer.Option(10, help="Trailing days replayed one day at a time as incremental updates"),
+):
+    """Per-team statsmodels fits vs the batched TeamETS fit, then day-by-day incremental updates."""
+    import warnings
+    import numpy as np
+    from ..modeling.ets_totals import TeamETS, fit_team_ets, forecast_next, team_goal_history
+
+    hist = team_goal_history(load_ytd(ytd_csv)).dropna(subset=["date"])
+    days = np.sort(hist["date"].unique())
+    cut = days[-holdout_days]
+    train = hist[hist["date"] < cut]
+
+    def per_team():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return {team: fit_team_ets(g[["date", "team_goals"]].dropna().sort_values("date"), team)
+                    for team, g in train.groupby("team") if len(g) >= 5}
+
+    fits, t_sm = _timed(per_team)
+    eng, t_fit = _timed(TeamETS.fit, train)
+    teams = sorted(fits)
+    sm_mu = np.array([forecast_next(fits[t]) for t in teams])
+    fc = eng.forecast(teams)
+    typer.echo(f"{len(teams)} teams, {len(train):,} team-games: statsmodels loop {t_sm:.3f}s, "
+               f"batched fit {t_fit:.3f}s ({t_sm / max(t_fit, 1e-9):.1f}x)")
+    typer.echo(f"  one-step forecast |statsmodels - batched|: mean {np.nanmean(np.abs(sm_mu - fc['mu'])):.3f}")
+
+    # replay the held-out days: score each day's forecasts, then advance the states
+    err, cover, t_upd = [], [], 0.0
+    for d in days[-holdout_days:]:
+        day = hist[hist["date"] == d]
+        f = eng.forecast(day["team"])
+        y = day["team_goals"].to_numpy(dtype=float)
+        ok = f["mu"].notna().to_numpy()
+        err.append(np.abs(f["mu"].to_numpy() - y)[ok])
+        cover.append(((y >= f["q10"].to_numpy()) & (y <= f["q90"].to_numpy()))[ok])
+        _, t = _timed(eng.update, hist[hist["date"] <= d])
+        t_upd += t
+    typer.echo(f"  {holdout_days} incremental updates {t_upd:.3f}s ({t_upd / holdout_days * 1e3:.1f} ms/day); "
+               f"holdout MAE {np.concatenate(err).mean():.3f}, q10-q90 coverage {np.concatenate(cover).mean():.3f}")
+
+@app.command("lgb-dataset")
+def lgb_dataset(
+    ytd_csv: str = typer.Option(os.getenv("WS_YTD_CSV", "data/NHL_2023_24.csv"), help="History CSV"),
+    scale: int = typer.Option(10, help="Replicate the engineered rows this many times (with jitter)"),
+    cache_dir: str = typer.Option("/tmp/ws_bench_lgb", help="Scratch directory for the binary dataset"),
+):
+    """Dataset construction for the four player targets: per-target binning vs one shared binary Dataset."""
+    import shutil
+    import numpy as np
+    import lightgbm as lgb
+    from ..features.registry import PLAYER_FEATURES
+    from ..modeling.lgb_dataset import BIN_PARAMS, shared_dataset, load_dataset
+
+    base = engineer_minimal(load_ytd(ytd_csv))
+    rng = np.random.default_rng(0)
+    df = pd.concat([base] * scale, ignore_index=True)
+    df[PLAYER_FEATURES] = df[PLAYER_FEATURES].fillna(0) + rng.normal(0, 1e-3, (len(df), len(PLAYER_FEATURES)))
+    targets = ["points", "goals", "assists", "shots_on_goal"]
+
+    def per_target():
+        for t in targets:
+            lgb.Dataset(df[PLAYER_FEATURES].fillna(0), label=df[t], params=dict(BIN_PARAMS)).construct()
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    _, t_old = _timed(per_target)
+    (path, _), t_build = _timed(shared_dataset, df, PLAYER_FEATURES, cache_dir)
+    _, t_load = _timed(lambda: [load_dataset(path, df[t].to_numpy()) for t in targets])
+    _, t_warm = _timed(shared_dataset, df, PLAYER_FEATURES, cache_dir)
+    typer.echo(f"{len(df):,} rows x {len(PLAYER_FEATURES)} features, {len(targets)} targets")
+    typer.echo(f"  per-target construction      {t_old:.3f}s")
+    typer.echo(f"  shared: bin + save once      {t_build:.3f}s, load x{len(targets)} {t_load:.3f}s "
+               f"-> {t_build + t_load:.3f}s ({t_old / max(t_build + t_load, 1e-9):.1f}x)")
+    typer.echo(f"  warm run (cache hit)         {t_warm:.3f}s + load {t_load:.3f}s "
+               f"({t_old / max(t_warm + t_load, 1e-9):.1f}x)")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+@app.command("forest-kernel")
+def forest_kernel(
+    ytd_csv: str = typer.Option(None, help="Path to YTD CSV (defaults to env WS_YTD_CSV or data/NHL_2023_24.csv)"),
+    trees: int = typer.Option(300, help="Trees in the benchmark forest"),
+    rows: str = typer.Option("10000,100000", help="Comma-separated batch sizes (feature rows are resampled)"),
+    mem_mb: float = typer.Option(64, help="Memory ceiling for the chunked paths (WS_FOREST_MEM_MB)"),
+    qs: str = typer.Option("0.1,0.5,0.9", help="Quantile levels"),
+):
+    """Per-tree predict matrix + np.quantile vs the chunked array kernel: rows/s and peak memory."""
+    import numpy as np
+    from ..features.registry import PLAYER_FEATURES
+    from ..modeling.forest_kernel import ForestKernel
+    from ..modeling.trainers_qrf import train_player_qrf
+
+    df = engineer_fast(load_ytd(ytd_csv or os.getenv("WS_YTD_CSV", "data/NHL_2023_24.csv"))).dropna(subset=["points"])
+    bundle = train_player_qrf(df, PLAYER_FEATURES, "points", mode="leaf", n_estimators=trees)
+    rf, qf = bundle.model.forest, bundle.model
+    kernel = ForestKernel.from_sklearn(rf)
+    walk = ForestKernel(kernel.children, kernel.feature, kernel.threshold, kernel.roots, kernel.value)
+    levels = [float(x) for x in qs.split(",")]
+    base = df[PLAYER_FEATURES].fillna(0).to_numpy(dtype=np.float32)
+    rng = np.random.default_rng(0)
+    typer.echo(f"{trees} trees, {kernel.n_nodes:,} nodes, ceiling {mem_mb:g} MB "
+               f"({kernel.chunk_rows(mem_mb):,} rows/chunk)")
+
+    def per_tree(X):
+        est = np.stack([t.predict(X) for t in rf.estimators_], axis=1)
+        return est.mean(axis=1), np.quantile(est, levels, axis=1).T
+
+    for n in (int(x) for x in rows.split(",")):
+        X = base[rng.integers(0, len(base), n)]
+        ref = None
+        for name, fn in (("per-tree matrix", per_tree),
+                         ("kernel (sklearn apply)", lambda X: kernel.predict(X, levels, mem_mb=mem_mb)),
+                         ("kernel (flat walk)", lambda X: walk.predict(X, levels, mem_mb=mem_mb)),
+                         ("leaf QRF (chunked)", lambda X: qf.predict_with_quantiles(
+                             X, levels, chunk_rows=qf.chunk_rows(mem_mb)))):
+            (mean, q), secs, peak = _peak(fn, X)
+            same = "" if ref is None or "QRF" in name else \
+                f"  equal: {np.array_equal(mean, ref[0]) and np.array_equal(q, ref[1])}"
+            ref = ref or (mean, q)
+            typer.echo(f"{n:>8,} rows  {name:24s} {secs:7.3f}s  {n / max(secs, 1e-9):>10,.0f} rows/s  "
+                       f"peak {peak / 2**20:8.1f} MB{same}")
+
+# Startup: `ws` must not pay for the modelling stack before a command needs it.
+_STARTUP_HEAVY = ("pandas", "numpy", "pyarrow", "duckdb", "scipy", "sklearn", "lightgbm", "statsmodels", "joblib")
+
+def _startup_probe(argv: list[str]) -> tuple[float, float, list[str]]:
+    """(wall seconds, summed import seconds, heavy top-level packages imported) for `ws <argv>` in a fresh interpreter."""
+    import subprocess, sys
+    code = f"from white_shorts.cli import app; app({argv!r})"
+    t0 = time.perf_counter()
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    if p.returncode != 0:
+        raise RuntimeError(f"ws {' '.join(argv)} exited {p.returncode}: {p.stderr.strip().splitlines()[-1:]}")
+    imported, heavy = 0, set()
+    for line in p.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        imported += int(self_us)
+        if name.strip() in _STARTUP_HEAVY:
+            heavy.add(name.strip())
+    return wall, imported / 1e6, sorted(heavy)
+
+@app.command()
+def startup(
+    repeat: int = typer.Option(5, help="Fresh interpreters per command (min / median reported)"),
+    out: str = typer.Option(None, help="Write the results as JSON (a baseline for --baseline)"),
+    baseline: str = typer.Option(None, help="JSON written by --out; exit 1 when a command regresses against it"),
+    tolerance: float = typer.Option(0.5, help="Allowed import-time growth over the baseline (0.5 = +50%)"),
+):
+    """Import time of `ws --help` and of every sub-command, in fresh interpreters (-X importtime)."""
+    import statistics
+    from . import SUBCOMMANDS
+    commands = [["--help"]] + [[name, "--help"] for name in SUBCOMMANDS]
+    rows = []
+    for argv in commands:
+        runs = [_startup_probe(argv) for _ in range(repeat)]
+        rows.append({"command": " ".join(["ws"] + argv), "wall_min": min(r[0] for r in runs),
+                     "wall_median": statistics.median(r[0] for r in runs), "import_s": min(r[1] for r in runs),
+                     "heavy": runs[0][2]})
+        r = rows[-1]
+        typer.echo(f"{r['command']:24s} wall {r['wall_min']:.3f}s (median {r['wall_median']:.3f}s)  "
+                   f"imports {r['import_s']:.3f}s  heavy: {', '.join(r['heavy']) or '-'}")
+    if out:
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        Path(out).write_text(json.dumps(rows, indent=1))
+        typer.echo(f"Wrote {out}")
+
+    problems = []
+    if rows[0]["heavy"]:
+        problems.append(f"ws --help imports {', '.join(rows[0]['heavy'])}")
+    if baseline:
+        base = {r["command"]: r for r in json.loads(Path(baseline).read_text())}
+        for r in rows:
+            b = base.get(r["command"])
+            if b is None:
+                continue
+            new = sorted(set(r["heavy"]) - set(b["heavy"]))
+            if new:
+                problems.append(f"{r['command']} now imports {', '.join(new)}")
+            # small absolute slack: sub-50 ms commands are mostly interpreter noise
+            if r["import_s"] > b["import_s"] * (1 + tolerance) + 0.05:
+                problems.append(f"{r['command']} imports {r['import_s']:.3f}s vs baseline {b['import_s']:.3f}s")
+    for msg in problems:
+        typer.echo(f"REGRESSION: {msg}")
+    if problems:
+        raise typer.Exit(code=1)
+
+# Scale suite: the hot paths on deterministic synthetic data (data/synthetic.py)
+# at 1x / 10x / 100x. Scale s = s seasons of league history (~47k player-games
+# per season) and an s-times-wider slate (s x 32 teams, ~736 rows per 32 teams).
+# Each scale runs in a fresh interpreter so peak RSS is per scale and a scale
+# that runs out of memory is recorded rather than taking the suite down.
+# Results go to the DuckDB bench_results table keyed by git commit;
+# `ws bench compare` diffs two commits (or runs) and flags regressions.
+_BENCH_DDL = """
+CREATE TABLE IF NOT EXISTS bench_results (
+    run_id VARCHAR, git_sha VARCHAR, git_dirty BOOLEAN, bench VARCHAR, scale INTEGER, rows BIGINT,
+    wall_s DOUBLE, cpu_s DOUBLE, rows_per_s DOUBLE, peak_rss_mb DOUBLE, status VARCHAR,
+    params_json VARCHAR, host VARCHAR, python VARCHAR, created_ts TIMESTAMP);
+"""
+_SCALE_BENCHES = ("generate", "load_ytd", "load_ytd.cached", "engineer_minimal", "engineer_fast", "train_player_qrf",
+                  "qrf_predict_with_quantiles", "persist.append", "dashboards._eval_frame", "broadcast.default_pipeline")
+
+def _git_rev() -> tuple[str, bool]:
+    import subprocess
+    here = Path(__file__).resolve().parent              # the checkout this code runs from, not the cwd
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short=12", "HEAD"], cwd=here, capture_output=True, text=True,
+                             check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=here,
+                                    capture_output=True, text=True).stdout.strip())
+        return sha, dirty
+    except Exception:
+        return "unknown", False
+
+def _scale_probe(scale: int, work_dir: str, trees: int, max_train_rows: int, eval_days: int, seed: int) -> None:
+    """Run in a fresh interpreter: every scale bench once, one JSON line per bench on stdout."""
+    import duckdb
+    import numpy as np
+    from ..data import persist
+    from ..data.synthetic import SyntheticLeague
+    from ..features.registry import PLAYER_FEATURES
+    from ..modeling.trainers_qrf import train_player_qrf, qrf_predict_with_quantiles
+    from ..utils import trace
+    from .dashboards import _eval_frame
+
+    work = Path(work_dir) / f"{scale}x"
+    work.mkdir(parents=True, exist_ok=True)
+    columnar_cache.CACHE_DIR = str(work / "cache")
+    today = pd.Timestamp.today().normalize()
+    trace.start(run_id=f"bench-scale-{scale}x", command=f"bench scale {scale}x")
+
+    def bench(name, fn, rows=None):
+        with trace.span(name, scale=scale) as sp:
+            c0 = time.process_time()
+            out = fn()
+            sp.set(rows_out=rows(out) if rows else len(out))
+        print(json.dumps({"bench": name, "scale": scale, "rows": sp.rows_out, "wall_s": sp.wall_s,
+                          "cpu_s": time.process_time() - c0, "peak_rss_mb": trace._peak_rss_mb(), "status": "ok"}),
+              flush=True)
+        return out
+
+    hist = bench("generate", lambda: SyntheticLeague(seed=seed).history(scale, today - pd.Timedelta(days=1)))
+    csv = work / "ytd.csv"
+    hist.assign(date=hist["date"].dt.strftime("%Y-%m-%d")).to_csv(csv, index=False)
+    del hist
+    df = bench("load_ytd", lambda: load_ytd(csv, use_cache=False))
+    columnar_cache.clear(csv)
+    load_ytd(csv)                                               # parse + write the Arrow cache
+    bench("load_ytd.cached", lambda: load_ytd(csv))
+    feat = bench("engineer_minimal", lambda: engineer_minimal(df))
+    bench("engineer_fast", lambda: engineer_fast(df))
+    del df
+
+    train = feat.dropna(subset=["points"]).sort_values("date").tail(max_train_rows)
+    bundle = bench("train_player_qrf", lambda: train_player_qrf(train, PLAYER_FEATURES, "points", mode="leaf",
+                                                                n_estimators=trees), rows=lambda _: len(train))
+    slate = SyntheticLeague(teams=32 * scale, seed=seed + 1).slate(today)
+    rng = np.random.default_rng(seed)
+    X = feat[PLAYER_FEATURES].iloc[rng.integers(0, len(feat), len(slate))].reset_index(drop=True)
+    del feat, train
+    mu, q10, q90 = bench("qrf_predict_with_quantiles", lambda: qrf_predict_with_quantiles(bundle, X, 0.10, 0.90),
+                         rows=lambda out: len(out[0]))
+
+    now = pd.Timestamp.utcnow().tz_localize(None)
+    targets = ["points", "goals", "assists", "shots_on_goal"]
+    preds = pd.concat([slate.assign(target=t, model_name="rf_qrf_bench", model_version="bench",
+                                    distribution="empirical_qrf", lambda_or_mu=mu, q10=q10, q90=q90, p_ge_k_json="",
+                                    run_id="bench", created_ts=now) for t in targets], ignore_index=True)
+    db = work / "bench.duckdb"
+    for f in (db, Path(f"{db}.wal")):
+        f.unlink(missing_ok=True)
+
+    def write():
+        with persist.session(str(db)):
+            persist.init_db()
+            persist.append("fact_predictions", preds)
+        return preds
+
+    bench("persist.append", write)
+    # eval window: the same slate predicted and scored on each of the last eval_days days
+    with persist.session(str(db)):
+        for k in range(1, eval_days):
+            persist.append("fact_predictions", preds.assign(date=today - pd.Timedelta(days=k)))
+        for k in range(eval_days):
+            day = preds.assign(date=today - pd.Timedelta(days=k))
+            persist.append("fact_actuals", day[["target", "date", "game_id", "team", "opponent", "player_id", "name",
+                                                "created_ts"]].assign(actual=rng.poisson(day["lambda_or_mu"])))
+    con = duckdb.connect(str(db))
+    try:
+        bench("dashboards._eval_frame", lambda: _eval_frame(con, eval_days))
+    finally:
+        con.close()
+
+    try:
+        from whiteshorts_broadcast import BroadcastConfig, default_pipeline
+    except ImportError:
+        print(json.dumps({"bench": "broadcast.default_pipeline", "scale": scale,
+                          "status": "skipped: whiteshorts_broadcast not installed "
+                                    "(pip install packages/whiteshorts_broadcast)"}), flush=True)
+        return
+    cfg = BroadcastConfig(backend="file", out_json_path=str(work / "payload.json"))
+    bench("broadcast.default_pipeline", lambda: default_pipeline(preds, cfg), rows=lambda _: len(preds))
+
+def _bench_frame(con, ref: str) -> pd.DataFrame:
+    """Latest results of a run id or git sha (prefix), one row per (bench, scale)."""
+    return con.execute("""
+        SELECT * FROM bench_results
+        WHERE status = 'ok' AND run_id = (
+            SELECT run_id FROM bench_results WHERE run_id = ? OR git_sha LIKE ? || '%'
+            ORDER BY created_ts DESC LIMIT 1)""", [ref, ref]).df()
+
+def _compare(base_ref: str, head_ref: str | None, tolerance: float) -> list[str]:
+    from ..data.persist import connection
+    with connection() as con:
+        con.execute(_BENCH_DDL)
+        if head_ref is None:
+            row = con.execute("SELECT run_id FROM bench_results ORDER BY created_ts DESC LIMIT 1").fetchone()
+            head_ref = row[0] if row else ""
+        base, head = _bench_frame(con, base_ref), _bench_frame(con, head_ref)
+    if base.empty or head.empty:
+        raise typer.BadParameter(f"no bench_results for {base_ref if base.empty else head_ref}")
+    m = head.merge(base, on=["bench", "scale"], suffixes=("", "_base"))
+    label = lambda f: f"{f['run_id'].iat[0]} ({f['git_sha'].iat[0]}{'+dirty' if f['git_dirty'].iat[0] else ''})"
+    typer.echo(f"head {label(head)} vs base {label(base)}")
+    problems = []
+    for r in m.sort_values(["scale", "bench"]).itertuples():
+        ratio = r.wall_s / max(r.wall_s_base, 1e-9)
+        # small absolute slack: sub-50 ms steps are mostly timer noise
+        bad = r.wall_s > r.wall_s_base * (1 + tolerance) + 0.05
+        typer.echo(f"  {r.scale:>4d}x {r.bench:28s} {r.wall_s_base:9.3f}s -> {r.wall_s:9.3f}s  {ratio:5.2f}x"
+                   f"{'  REGRESSION' if bad else ''}")
+        if bad:
+            problems.append(f"{r.bench} @ {r.scale}x: {r.wall_s:.3f}s vs {r.wall_s_base:.3f}s")
+    return problems
+
+@app.command()
+def synth(
+    out_dir: str = typer.Option("data/synthetic", help="Directory to write"),
+    seasons: int = typer.Option(1, help="Seasons of history (~47k player-games each)"),
+    current_days: int = typer.Option(30, help="Trailing days written as the current season + actuals JSON"),
+    slate_teams: int = typer.Option(32, help="Teams in the slate league (32 = a full NHL night, ~736 rows)"),
+    seed: int = typer.Option(7, help="Generator seed"),
+    end: str = typer.Option(None, help="Last game date (YYYY-MM-DD, default today)"),
+):
+    """Write a deterministic synthetic data set: YTD CSV, current-season Parquet, slate, SportsData JSON."""
+    from ..data.synthetic import write_dataset
+    manifest, secs = _timed(write_dataset, out_dir, seasons, current_days, slate_teams, seed, end)
+    typer.echo(json.dumps(manifest, indent=1))
+    typer.echo(f"Wrote {out_dir} in {secs:.1f}s")
+
+@app.command()
+def scale(
+    scales: str = typer.Option("1,10,100", help="Comma-separated scale factors"),
+    trees: int = typer.Option(50, help="Trees in the benchmark forest"),
+    max_train_rows: int = typer.Option(200_000, help="Train on at most this many (latest) rows"),
+    eval_days: int = typer.Option(14, help="Days of predictions + actuals behind the _eval_frame bench"),
+    seed: int = typer.Option(7, help="Generator seed"),
+    work_dir: str = typer.Option("/tmp/ws_bench_scale", help="Scratch directory (CSV, caches, DuckDB)"),
+    out: str = typer.Option(None, help="Also write the results as JSON"),
+    baseline: str = typer.Option(None, help="Run id or git sha to compare against; exit 1 on regression"),
+    tolerance: float = typer.Option(0.25, help="Allowed wall-time growth over the baseline (0.25 = +25%)"),
+):
+    """load -> features -> train -> predict -> persist -> eval -> broadcast on synthetic data at each scale."""
+    import platform, shutil, subprocess, sys, uuid
+    from datetime import datetime
+    from ..data.persist import append, connection
+
+    sha, dirty = _git_rev()
+    run_id = f"bench-{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}"
+    params = json.dumps({"trees": trees, "max_train_rows": max_train_rows, "eval_days": eval_days, "seed": seed})
+    rows = []
+    for s in (int(x) for x in scales.split(",")):
+        typer.echo(f"-- {s}x")
+        p = subprocess.Popen([sys.executable, "-c", "import sys; from white_shorts.cli.bench import _scale_probe; "
+                              "_scale_probe(*map(int, sys.argv[1:2]), sys.argv[2], *map(int, sys.argv[3:]))",
+                              str(s), work_dir, str(trees), str(max_train_rows), str(eval_days), str(seed)],
+                             stdout=subprocess.PIPE, text=True)
+        done = set()
+        for line in p.stdout:
+            if not line.startswith("{"):
+                continue
+            r = json.loads(line)
+            done.add(r["bench"])
+            rows.append(r)
+            if r["status"] == "ok":
+                typer.echo(f"  {r['bench']:28s} {r['wall_s']:9.3f}s  {r['rows']:>11,d} rows  "
+                           f"{r['rows'] / max(r['wall_s'], 1e-9):>12,.0f} rows/s  peak {r['peak_rss_mb']:6.0f} MB")
+            else:
+                typer.echo(f"  {r['bench']:28s} {r['status']}")
+        if p.wait() != 0:
+            status = f"failed: exit {p.returncode}" + (" (killed, out of memory?)" if p.returncode < 0 else "")
+            for b in _SCALE_BENCHES:
+                if b not in done:
+                    rows.append({"bench": b, "scale": s, "status": status})
+            typer.echo(f"  {status}; not run: {', '.join(b for b in _SCALE_BENCHES if b not in done)}")
+        shutil.rmtree(Path(work_dir) / f"{s}x", ignore_errors=True)
+
+    df = pd.DataFrame(rows)
+    for c in ("rows", "wall_s", "cpu_s", "peak_rss_mb"):
+        if c not in df.columns:
+            df[c] = None
+    df["rows_per_s"] = df["rows"] / df["wall_s"].clip(lower=1e-9)
+    df = df.assign(run_id=run_id, git_sha=sha, git_dirty=dirty, params_json=params, host=platform.node(),
+                   python=platform.python_version(), created_ts=datetime.utcnow())
+    with connection() as con:
+        con.execute(_BENCH_DDL)
+    append("bench_results", df)
+    typer.echo(f"run {run_id} @ {sha}{'+dirty' if dirty else ''} → bench_results")
+    if out:
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        df.to_json(out, orient="records", indent=1, date_format="iso")
+        typer.echo(f"Wrote {out}")
+    if baseline:
+        problems = _compare(baseline, run_id, tolerance)
+        for msg in problems:
+            typer.echo(f"REGRESSION: {msg}")
+        if problems:
+            raise typer.Exit(code=1)
+
+@app.command()
+def compare(
+    base: str = typer.Option(..., help="Baseline run id or git sha (prefix)"),
+    head: str = typer.Option(None, help="Run id or git sha to check (default: the latest run)"),
+    tolerance: float = typer.Option(0.25, help="Allowed wall-time growth (0.25 = +25%)"),
+):
+    """Scale-suite wall times of two runs / commits side by side; exit 1 on regression."""
+    problems = _compare(base, head, tolerance)
+    for msg in problems:
+        typer.echo(f"REGRESSION: {msg}")
+    if problems:
+        raise typer.Exit(code=1)
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,33 @@
+from __future__ import annotations
+import typer
+from ..data.update_history import CURRENT_SEASON_PATH, compact_current_season, load_current_season
+
+app = typer.Typer(help="Maintenance for the partitioned current-season history dataset")
+
+@app.command()
+def compact(
+    path: str = typer.Option(CURRENT_SEASON_PATH, help="Dataset path (defaults to WS_CURRENT_SEASON_PARQUET)"),
+    migrate_legacy: bool = typer.Option(True, help="Split a legacy single-file parquet into partitions first"),
+):
+    """Merge multi-file date partitions (dedup on date/game_id/player_id) and drop empty ones."""
+    stats = compact_current_season(path, migrate_legacy=migrate_legacy)
+    typer.echo(
+        f"partitions: {stats['partitions']}  merged: {stats['merged']}  "
+        f"files removed: {stats['files_removed']}  migrated rows: {stats['migrated_rows']}"
+    )
+
+@app.command()
+def show(
+    path: str = typer.Option(CURRENT_SEASON_PATH, help="Dataset path (defaults to WS_CURRENT_SEASON_PARQUET)"),
+    start: str = typer.Option(None, help="First date (YYYY-MM-DD)"),
+    end: str = typer.Option(None, help="Last date (YYYY-MM-DD)"),
+):
+    """Row counts per date for a date range (reads only the matching partitions)."""
+    df = load_current_season(path, start=start, end=end, columns=["date", "player_id"])
+    if df.empty:
+        typer.echo("No rows.")
+        return
+    typer.echo(df.groupby("date").size().rename("rows").to_string())
+
+if __name__ == "__main__":
+    app()
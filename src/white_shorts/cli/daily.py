@@ -0,0 +1,286 @@
+from __future__ import annotations
+import json, os, uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+import typer
+import pandas as pd
+
+from ..data import http_cache
+from ..data.columnar_cache import content_hash
+from ..data.load_ytd import load_ytd
+from ..data.persist import append, connection, session
+from ..features.registry import PLAYER_FEATURES
+from ..features.state import FEATURE_STATE_DIR
+from ..modeling import registry
+from ..modeling.io_qrf import DEFAULT_DIR as MODELS_DIR
+from ..utils import trace
+from ..utils.dag import Stage, StageResult, run_dag
+from ..utils.time import today_str
+
+app = typer.Typer(help="Daily pipeline in one process: fetch slate → actuals → train → predict → dashboards")
+
+# The daily workflow as one DAG (see utils/dag.py). Stages share one DuckDB
+# session and one loaded YTD frame, and are skipped when their input
+# fingerprints match the last successful run:
+#   fetch_slate     slate date (or the content hash of a given --slate file)
+#   update_history  actuals date
+# The two API stages are only ever skipped once their date is final
+# (http_cache.is_final): games in progress and late lineup changes mean a
+# recent day is re-asked on every run, and the "final" flag in the fingerprint
+# makes the first run after a day turns final fetch it once more.
+#   train           YTD CSV hash, fact_actuals max date / rows, version, feature list
+#   predict         slate hash, model registry state, YTD hash, feature state, version
+#   dashboards      fact_actuals / fact_predictions state, window, UTC day
+# Fingerprints, timings and outputs of every stage go to the daily_stages table.
+# Stage modules are imported inside the stages, so `ws daily status` / --help
+# don't load the training and prediction stack.
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS daily_stages (
+    run_id VARCHAR, slate_date DATE, stage VARCHAR, status VARCHAR, fingerprint VARCHAR,
+    inputs_json VARCHAR, outputs_json VARCHAR, seconds DOUBLE, saved_seconds DOUBLE,
+    error VARCHAR, created_ts TIMESTAMP);
+"""
+
+STAGES = ("fetch_slate", "update_history", "train", "predict", "dashboards")
+
+
+@dataclass
+class DailyContext:
+    slate_date: pd.Timestamp
+    actuals_date: pd.Timestamp
+    ytd_csv: str
+    version: str = "0.3.0"
+    slate: Optional[str] = None              # use this slate file instead of fetching
+    out_dir: str = "data/parquet"
+    dash_out: str = "data/dashboards"
+    dash_days: int = 14
+    use_duckdb_days: int = 120
+    api_backfill_days: int = 30
+    workers: Optional[int] = None
+    frames: dict = field(default_factory=dict)
+
+    def frame(self, key: str, build: Callable[[], object]):
+        """Load once per run, shared by every stage."""
+        if key not in self.frames:
+            self.frames[key] = build()
+        return self.frames[key]
+
+    def ytd(self) -> pd.DataFrame:
+        return self.frame("ytd", lambda: load_ytd(self.ytd_csv))
+
+    def ytd_hash(self) -> str:
+        return self.frame("ytd_hash", lambda: content_hash(self.ytd_csv))
+
+
+def _table_state(table: str, ts_col: str) -> dict:
+    """Max date / timestamp and row count of a table (empty when it is missing or has no rows)."""
+    with connection() as con:
+        exists = con.execute("SELECT COUNT(*) > 0 FROM information_schema.tables WHERE table_name = ?",
+                             [table]).fetchone()[0]
+        if not exists:
+            return {}
+        hi, n = con.execute(f"SELECT MAX({ts_col}), COUNT(*) FROM {table}").fetchone()
+    return {"max": str(hi), "rows": int(n)} if n else {}
+
+
+def _file_hash(path: str) -> str | None:
+    return content_hash(path) if path and os.path.exists(path) else None
+
+
+# ---------- stages ----------
+
+def _slate_inputs(ctx: DailyContext, up: dict) -> dict:
+    if ctx.slate:
+        return {"date": ctx.slate_date.date(), "file": ctx.slate, "sha": _file_hash(ctx.slate)}
+    return {"date": ctx.slate_date.date(), "source": "api", "final": http_cache.is_final(ctx.slate_date)}
+
+def _slate_run(ctx: DailyContext, up: dict) -> dict:
+    from .fetch_slate import fetch_slate
+    path = ctx.slate
+    if path is None:
+        path = fetch_slate(str(ctx.slate_date.date()))
+    elif not os.path.exists(path):
+        raise FileNotFoundError(f"Slate not found: {path}")
+    if path is None:
+        raise RuntimeError(f"No projections returned for {ctx.slate_date.date()}")
+    return {"slate": path, "sha": content_hash(path)}
+
+def _slate_ok(ctx: DailyContext, out: dict) -> bool:
+    if ctx.slate is None and not http_cache.is_final(ctx.slate_date):
+        return False
+    return _file_hash(out.get("slate")) == out.get("sha")
+
+
+def _actuals_inputs(ctx: DailyContext, up: dict) -> dict:
+    return {"date": ctx.actuals_date.date(), "final": http_cache.is_final(ctx.actuals_date)}
+
+def _actuals_run(ctx: DailyContext, up: dict) -> dict:
+    from .update_history import update_actuals
+    df = update_actuals(ctx.actuals_date)
+    return {"rows": len(df), "actuals": _table_state("fact_actuals", "date")}
+
+def _actuals_ok(ctx: DailyContext, out: dict) -> bool:
+    return http_cache.is_final(ctx.actuals_date)
+
+
+def _train_inputs(ctx: DailyContext, up: dict) -> dict:
+    return {"ytd": ctx.ytd_hash(), "actuals": _table_state("fact_actuals", "date"), "version": ctx.version,
+            "features": PLAYER_FEATURES, "use_duckdb_days": ctx.use_duckdb_days}
+
+def _train_run(ctx: DailyContext, up: dict) -> dict:
+    from ..features.engine import engineer_fast
+    from .train_qrf import _assemble_training_frame, train_all
+    df_raw = _assemble_training_frame(ctx.ytd_csv, ctx.use_duckdb_days, ctx.api_backfill_days, df_ytd=ctx.ytd())
+    if df_raw.empty:
+        raise RuntimeError("Empty training frame")
+    saved = train_all(engineer_fast(df_raw), ctx.version, workers=ctx.workers)
+    return {"models": saved, "registry": registry.active_state(MODELS_DIR)}
+
+def _train_ok(ctx: DailyContext, out: dict) -> bool:
+    # models trained since (or deleted) → not the state this fingerprint produced
+    return registry.active_state(MODELS_DIR) == out.get("registry")
+
+
+def _predict_inputs(ctx: DailyContext, up: dict) -> dict:
+    return {"slate": up["fetch_slate"]["sha"], "registry": registry.active_state(MODELS_DIR), "ytd": ctx.ytd_hash(),
+            "feature_state": _file_hash(os.path.join(FEATURE_STATE_DIR, "state.json")), "version": ctx.version}
+
+def _predict_run(ctx: DailyContext, up: dict) -> dict:
+    from .predict_from_slate import predict_slate
+    out_csv = predict_slate(up["fetch_slate"]["slate"], ctx.ytd_csv, version=ctx.version, out_dir=ctx.out_dir,
+                            df_ytd=ctx.ytd())
+    return {"csv": out_csv}
+
+def _predict_ok(ctx: DailyContext, out: dict) -> bool:
+    return bool(out.get("csv")) and os.path.exists(out["csv"])
+
+
+def _dash_inputs(ctx: DailyContext, up: dict) -> dict:
+    return {"actuals": _table_state("fact_actuals", "date"), "predictions": _table_state("fact_predictions", "created_ts"),
+            "days": ctx.dash_days, "out": ctx.dash_out, "utc_day": datetime.utcnow().date()}
+
+def _dash_run(ctx: DailyContext, up: dict) -> dict:
+    from .dashboards import build_dashboards
+    return {"html": build_dashboards(ctx.dash_days, ctx.dash_out)}
+
+def _dash_ok(ctx: DailyContext, out: dict) -> bool:
+    return bool(out.get("html")) and os.path.exists(out["html"])
+
+
+def build_stages(train: bool = True) -> list[Stage]:
+    stages = [
+        Stage("fetch_slate", _slate_run, _slate_inputs, outputs_ok=_slate_ok),
+        Stage("update_history", _actuals_run, _actuals_inputs, outputs_ok=_actuals_ok),
+        Stage("train", _train_run, _train_inputs, deps=("update_history",), outputs_ok=_train_ok),
+        Stage("predict", _predict_run, _predict_inputs, deps=("fetch_slate", "train"), outputs_ok=_predict_ok),
+        Stage("dashboards", _dash_run, _dash_inputs, deps=("update_history", "predict"), outputs_ok=_dash_ok),
+    ]
+    return [s for s in stages if train or s.name != "train"]
+
+
+# ---------- recording ----------
+
+def _ensure_tables() -> None:
+    with connection() as con:
+        con.execute(_DDL)
+
+def _previous(name: str) -> dict | None:
+    with connection() as con:
+        row = con.execute("SELECT fingerprint, seconds, outputs_json FROM daily_stages"
+                          " WHERE stage = ? AND status = 'ran' ORDER BY created_ts DESC LIMIT 1", [name]).fetchone()
+    if row is None:
+        return None
+    return {"fingerprint": row[0], "seconds": row[1], "outputs": json.loads(row[2] or "{}")}
+
+def _record(run_id: str, slate_date: pd.Timestamp, res: StageResult) -> None:
+    append("daily_stages", pd.DataFrame([{
+        "run_id": run_id, "slate_date": slate_date, "stage": res.name, "status": res.status,
+        "fingerprint": res.fingerprint, "inputs_json": json.dumps(res.inputs, sort_keys=True, default=str),
+        "outputs_json": json.dumps(res.outputs, sort_keys=True, default=str), "seconds": res.seconds,
+        "saved_seconds": res.saved_seconds, "error": res.error, "created_ts": datetime.utcnow(),
+    }]))
+
+
+def _parse_day(s: str) -> pd.Timestamp:
+    d = pd.to_datetime(s, format="%Y-%m-%d", errors="coerce")
+    if pd.isna(d):
+        d = pd.to_datetime(s, dayfirst=True, errors="coerce")
+    if pd.isna(d):
+        raise typer.BadParameter(f"Unparseable date: {s}")
+    return d.normalize()
+
+
+@app.command()
+def run(
+    slate_date: Optional[str] = typer.Option(None, help="Slate date (YYYY-MM-DD or DD/MM/YYYY); default today in Melbourne"),
+    actuals_date: Optional[str] = typer.Option(None, help="Actuals date to upsert; default the day before the slate"),
+    slate: Optional[str] = typer.Option(None, help="Use this slate parquet instead of fetching one"),
+    ytd_csv: Optional[str] = typer.Option(None, help="Path to YTD CSV (defaults to env WS_YTD_CSV or data/NHL_2023_24.csv)"),
+    version: str = typer.Option("0.3.0", help="Model version tag"),
+    train: bool = typer.Option(True, "--train/--no-train", help="Include the training stage"),
+    workers: Optional[int] = typer.Option(None, help="Training processes for per-target forests"),
+    out_dir: str = typer.Option(os.getenv("WS_PARQUET_DIR", "data/parquet"), help="Output directory for the predictions CSV"),
+    dash_days: int = typer.Option(14, help="Dashboard rolling window (days)"),
+    dash_out: str = typer.Option("data/dashboards", help="Dashboard output directory"),
+    force: List[str] = typer.Option([], "--force", help="Run this stage even if its inputs are unchanged (repeatable; 'all')"),
+):
+    """Run the daily DAG in one process, skipping stages whose inputs did not change."""
+    unknown = [f for f in force if f != "all" and f not in STAGES]
+    if unknown:
+        raise typer.BadParameter(f"Unknown stage(s) {unknown}; stages: {', '.join(STAGES)}")
+    sd = _parse_day(slate_date or today_str())
+    ctx = DailyContext(
+        slate_date=sd,
+        actuals_date=_parse_day(actuals_date) if actuals_date else sd - timedelta(days=1),
+        ytd_csv=ytd_csv or os.getenv("WS_YTD_CSV", "data/NHL_2023_24.csv"),
+        version=version, slate=slate, out_dir=out_dir, dash_out=dash_out, dash_days=dash_days, workers=workers,
+    )
+    run_id = os.getenv("WS_RUN_ID", f"daily-{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}")
+    typer.echo(f"daily {run_id}: slate {sd.date()}, actuals {ctx.actuals_date.date()}")
+    if trace.active() is not None:
+        trace.active().run_id = run_id     # run_spans rows join daily_stages on run_id
+
+    results = []
+    with session() as db:
+        _ensure_tables()
+
+        def after(res: StageResult) -> None:
+            _record(run_id, sd, res)
+            db.flush()                # later stages (and other connections) see this stage's writes
+            typer.echo(f"[daily] {res.summary()}")
+            if res.status == "failed":
+                typer.echo(res.error)
+
+        results = list(run_dag(build_stages(train), ctx, _previous, set(force), after=after))
+
+    report = pd.DataFrame([{"stage": r.name, "status": r.status, "seconds": round(r.seconds, 2),
+                            "saved": round(r.saved_seconds, 2)} for r in results])
+    typer.echo(report.to_string(index=False))
+    ran = report["status"].eq("ran").sum()
+    typer.echo(f"{ran} stage(s) ran, {report['status'].eq('skipped').sum()} skipped: "
+               f"{report['seconds'].sum():.1f}s spent, ~{report['saved'].sum():.1f}s saved")
+    if report["status"].isin(["failed", "blocked"]).any():
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def status(runs: int = typer.Option(3, help="How many recent runs to show")):
+    """Stage outcomes, timings and fingerprints of the most recent daily runs."""
+    _ensure_tables()
+    with connection() as con:
+        df = con.execute("""
+            SELECT run_id, slate_date, stage, status, round(seconds, 2) AS seconds,
+                   round(saved_seconds, 2) AS saved, fingerprint
+            FROM daily_stages
+            WHERE run_id IN (SELECT run_id FROM daily_stages GROUP BY run_id ORDER BY MAX(created_ts) DESC LIMIT ?)
+            ORDER BY created_ts""", [runs]).df()
+    if df.empty:
+        typer.echo("No daily runs recorded.")
+        return
+    typer.echo(df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    app()
@@ -7,7 +7,9 @@ import duckdb
 import typer
 
 from ..config import settings
+from ..data.persist import connection
 from ..modeling.evaluation import rmse, coverage
+from ..utils.trace import traced
 
 app = typer.Typer(help="Metrics extraction and dashboard artifact writer")
 
@@ -45,10 +47,16 @@ def _eval_frame(con: duckdb.DuckDBPyConnection, days: int) -> pd.DataFrame:
         """)
     else:
         cur_path = os.getenv("WS_CURRENT_SEASON_PARQUET", "data/current_season.parquet")
+        cur_root = cur_path[:-len(".parquet")] if cur_path.endswith(".parquet") else cur_path
+        if os.path.isdir(cur_root):
+            # hive-partitioned dataset: DuckDB prunes date=... partitions from the WHERE clause
+            source = f"read_parquet('{cur_root}/*/*/*.parquet', hive_partitioning = true)"
+        else:
+            source = f"read_parquet('{cur_path}')"
         con.execute(f"""
             CREATE OR REPLACE TEMP VIEW cur_raw AS
-            SELECT * FROM read_parquet('{cur_path}')
-            WHERE date >= (CURRENT_DATE - INTERVAL {int(days)} DAY)
+            SELECT * FROM {source}
+            WHERE CAST(date AS DATE) >= (CURRENT_DATE - INTERVAL {int(days)} DAY)
         """)
         con.execute("""
             CREATE OR REPLACE TEMP VIEW acts_long AS
@@ -146,12 +154,14 @@ def build(
     out: str = typer.Option("data/dashboards", help="Output directory for artifacts"),
     echo_table: bool = typer.Option(True, help="Print summary table to stdout"),
 ) -> None:
+    build_dashboards(days, out, echo_table)
+
+@traced
+def build_dashboards(days: int = 14, out: str = "data/dashboards", echo_table: bool = True) -> str | None:
+    """Write the metrics / consistency CSVs and the HTML summary; returns the HTML path (None if no metrics)."""
     os.makedirs(out, exist_ok=True)
-    con = duckdb.connect(settings.DUCKDB_PATH)
-    try:
+    with connection() as con:   # the run's session connection when called inside one
         df = _eval_frame(con, days)
-    finally:
-        con.close()
 
     df.columns = [str(c).strip().lower() for c in df.columns]
     if df.empty or "target" not in df.columns:
@@ -216,6 +226,7 @@ def build(
     typer.echo(f"Wrote consistency → {consistency_csv}")
     typer.echo(f"Wrote HTML        → {html_path}")
     typer.echo(f"Wrote raw join    → {raw_csv}")
+    return html_path
 
 @app.command()
 def rolling_metrics(days: int = typer.Option(14, help="Rolling window (days) to evaluate")) -> None:
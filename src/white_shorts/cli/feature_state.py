@@ -0,0 +1,46 @@
+from __future__ import annotations
+import os
+import typer
+import pandas as pd
+
+from ..data.load_ytd import load_ytd
+from ..features.state import FeatureState, FEATURE_STATE_DIR
+from .train_qrf import _load_current_from_duckdb
+
+app = typer.Typer(help="Per-player rolling feature state store")
+
+@app.command()
+def rebuild(
+    ytd_csv: str = typer.Option(None, help="Path to YTD CSV (defaults to env WS_YTD_CSV or data/NHL_2023_24.csv)"),
+    path: str = typer.Option(FEATURE_STATE_DIR, help="Feature state directory"),
+    use_duckdb: bool = typer.Option(True, help="Include current-season actuals from DuckDB fact_actuals"),
+):
+    """Rebuild the store from full history (YTD CSV + current-season actuals)."""
+    hist = load_ytd(ytd_csv or os.getenv("WS_YTD_CSV", "data/NHL_2023_24.csv"))
+    cur = _load_current_from_duckdb(days=0) if use_duckdb else pd.DataFrame()
+    if not cur.empty:
+        cols = sorted(set(hist.columns).union(cur.columns))
+        for c in cols:
+            if c not in hist.columns: hist[c] = pd.NA
+            if c not in cur.columns: cur[c] = pd.NA
+        hist = pd.concat([hist[cols], cur[cols]], ignore_index=True)
+    hist["date"] = pd.to_datetime(hist["date"], errors="coerce")
+
+    state = FeatureState.build(hist)
+    out = state.save(path)
+    typer.echo(f"Feature state rebuilt from {len(hist)} rows → {out} (as of {state.as_of.date() if state.as_of is not None else '-'})")
+
+@app.command()
+def show(path: str = typer.Option(FEATURE_STATE_DIR, help="Feature state directory")):
+    """Print the store's as-of date and buffer sizes."""
+    state = FeatureState.load(path)
+    if state is None:
+        typer.echo(f"No feature state at {path}")
+        raise typer.Exit(code=1)
+    typer.echo(f"as_of: {state.as_of.date() if state.as_of is not None else '-'}")
+    for name, tail in state.tails.items():
+        typer.echo(f"{name:10s}: {tail.iloc[:, 0].nunique()} keys, {len(tail)} buffered rows")
+    typer.echo(f"snapshots : {len(state.snapshots)} (player_id, team) pairs")
+
+if __name__ == "__main__":
+    app()
@@ -3,6 +3,7 @@ import os
 import typer
 import pandas as pd
 from ..data.projections import fetch_projections_by_date
+from ..utils.trace import traced
 
 
 app = typer.Typer(help="Fetch projections slate (players+games)")
@@ -17,20 +18,28 @@ def _parse_date(date_str: str) -> pd.Timestamp:
         raise ValueError(f"Unparseable date: {date_str}")
     return d.normalize()
 
-@app.command()
-def by_date(date: str = typer.Argument(..., help="YYYY-MM-DD or DD/MM/YYYY")):
+def slate_path(date: str | pd.Timestamp, out_dir: str | None = None) -> str:
+    dd = _parse_date(date) if isinstance(date, str) else pd.Timestamp(date).normalize()
+    out_dir = out_dir or os.getenv("WS_SLATES_DIR", "data/slates")
+    return os.path.join(out_dir, f"slate_{dd.year}-{dd.month}-{dd.day:02d}.parquet")
+
+@traced
+def fetch_slate(date: str, out_dir: str | None = None) -> str | None:
+    """Fetch the slate for `date` and save it; returns the parquet path (None if nothing came back)."""
     df = fetch_projections_by_date(date)
     if df.empty:
         typer.echo("No projections returned.")
-        return
-    out_dir = os.getenv("WS_SLATES_DIR", "data/slates")
-    os.makedirs(out_dir, exist_ok=True)
-    dd = _parse_date(date)
-    slate_name = f"slate_{dd.year}-{dd.month}-{dd.day:02d}.parquet"
-    typer.echo(f"Saved slate (debug) → {slate_name}")
-    out_path = os.path.join(out_dir, slate_name) #f"slate_{dd.year}-{dd.month}-{dd.day:02d}.parquet")
+        return None
+    out_path = slate_path(date, out_dir)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    typer.echo(f"Saved slate (debug) → {os.path.basename(out_path)}")
     df.to_parquet(out_path, index=False)
     typer.echo(f"Saved slate → {out_path} (players: {len(df)})")
+    return out_path
+
+@app.command()
+def by_date(date: str = typer.Argument(..., help="YYYY-MM-DD or DD/MM/YYYY")):
+    fetch_slate(date)
 
 if __name__ == "__main__":
     app()
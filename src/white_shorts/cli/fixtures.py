@@ -0,0 +1,172 @@
+from __future__ import annotations
+import json, os, time
+from pathlib import Path
+from typing import List
+import typer
+import pandas as pd
+
+from ..data.fixture_server import ENDPOINTS, Faults, FixtureServer, FixtureStore
+
+app = typer.Typer(help="Local SportsData stand-in server for offline and load-test runs")
+
+# `ws fixtures serve` answers the SportsData by-date endpoints from fixture
+# files, a recorded http cache or a synthetic league (data/fixture_server.py);
+# point a run at it with
+#   SPORTS_DATA_BASE=http://127.0.0.1:8765 SPORTS_DATA_API_KEY=fixture WS_HTTP_CACHE=0 ws daily run ...
+# `ws fixtures record` saves live responses in the fixture layout, and
+# `ws fixtures load` drives the concurrent actuals backfill against an
+# in-process server at several concurrency levels under the configured faults.
+
+
+def _store(fixtures: List[str], http_cache: List[str], synthetic_seasons: int, end: str | None, seed: int) -> FixtureStore:
+    store = FixtureStore()
+    for d in fixtures or []:
+        typer.echo(f"fixtures {d}: {store.add_dir(d)} responses")
+    for d in http_cache or []:
+        typer.echo(f"http cache {d}: {store.add_http_cache(d)} responses")
+    if synthetic_seasons:
+        days = store.add_synthetic(synthetic_seasons, end, seed)
+        typer.echo(f"synthetic league: {synthetic_seasons} season(s), {days} game days (seed {seed})")
+    return store
+
+
+_FIXTURES = typer.Option(None, "--fixtures", help="Fixture dir <dir>/<endpoint>/<YYYY-MM-DD>.json (repeatable)")
+_HTTP_CACHE = typer.Option(None, "--http-cache", help="Replay a recorded WS_HTTP_CACHE_DIR (repeatable)")
+_SYNTH = typer.Option(0, help="Also serve a synthetic league with this many seasons of history")
+_END = typer.Option(None, help="Last synthetic game day (YYYY-MM-DD, default today)")
+_SEED = typer.Option(7, help="Synthetic league seed")
+_LATENCY = typer.Option(0.0, help="Mean added latency per request (ms)")
+_JITTER = typer.Option(0.0, help="Latency standard deviation (ms)")
+_ERRORS = typer.Option(0.0, help="Fraction of requests answered with --error-status")
+_STATUS = typer.Option(503, help="Status code of injected errors")
+_RATE = typer.Option(0.0, help="Requests per second per API key before 429s (0 = unlimited)")
+_BURST = typer.Option(1, help="Rate-limit bucket size")
+_RETRY_AFTER = typer.Option(1.0, help="Retry-After seconds sent with 429s")
+_STRICT = typer.Option(False, help="Only accept '2025-OCT-07' date tokens (404 for '2025-10-07'), like the live API")
+
+
+@app.command()
+def serve(
+    fixtures: List[str] = _FIXTURES,
+    http_cache: List[str] = _HTTP_CACHE,
+    synthetic_seasons: int = _SYNTH,
+    end: str = _END,
+    seed: int = _SEED,
+    host: str = typer.Option("127.0.0.1", help="Bind address"),
+    port: int = typer.Option(8765, help="Port (0 = any free port)"),
+    key: str = typer.Option(None, help="Only accept this API key (default: any non-empty key)"),
+    latency_ms: float = _LATENCY,
+    jitter_ms: float = _JITTER,
+    error_rate: float = _ERRORS,
+    error_status: int = _STATUS,
+    rate_limit: float = _RATE,
+    burst: int = _BURST,
+    retry_after: float = _RETRY_AFTER,
+    strict_dates: bool = _STRICT,
+    verbose: bool = typer.Option(False, help="Log every request"),
+):
+    """Serve PlayerGameStatsByDate / PlayerGameProjectionStatsByDate until interrupted."""
+    store = _store(fixtures, http_cache, synthetic_seasons, end, seed)
+    if not any(store.dates(ep) for ep in ENDPOINTS):
+        raise typer.BadParameter("nothing to serve: give --fixtures, --http-cache or --synthetic-seasons")
+    faults = Faults(latency_ms, jitter_ms, error_rate, error_status, rate_limit, burst, retry_after, seed)
+    srv = FixtureServer(store, faults, host, port, key, strict_dates, verbose)
+    for ep in ENDPOINTS:
+        days = store.dates(ep)
+        typer.echo(f"  {ep}: {len(days)} day(s)" + (f", {days[0]} → {days[-1]}" if days else ""))
+    typer.echo(f"Serving on {srv.url}  (SPORTS_DATA_BASE={srv.url} SPORTS_DATA_API_KEY={key or 'fixture'}; "
+               f"stats at {srv.url}/__stats)")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+        typer.echo(srv.stats_summary())
+
+
+@app.command()
+def record(
+    start: str = typer.Option(..., help="First date (YYYY-MM-DD)"),
+    end: str = typer.Option(..., help="Last date, inclusive"),
+    out_dir: str = typer.Option("data/fixtures/sportsdata", help="Fixture dir to write"),
+    endpoint: List[str] = typer.Option(list(ENDPOINTS), help="Endpoints to record (repeatable)"),
+):
+    """Save live SportsData responses (through the http cache) in the fixture layout."""
+    from ..data.sportsdata import get_client
+    client = get_client()
+    n = 0
+    for ep in endpoint:
+        Path(out_dir, ep).mkdir(parents=True, exist_ok=True)
+        for d in pd.date_range(start, end, freq="D"):
+            body = client.get_by_date_raw(ep, d)
+            Path(out_dir, ep, f"{d:%Y-%m-%d}.json").write_bytes(body)
+            n += 1
+    typer.echo(f"Recorded {n} responses → {out_dir}")
+    typer.echo(client.metrics_summary())
+
+
+@app.command()
+def load(
+    start: str = typer.Option(None, help="First date (default: the first synthetic day)"),
+    end: str = typer.Option(None, help="Last date, inclusive (default: start + 59 days)"),
+    concurrency: str = typer.Option("1,4,16", help="Comma-separated worker counts"),
+    client_rate: float = typer.Option(0.0, help="Client-side requests per second (0 = unlimited)"),
+    retries: int = typer.Option(3, help="Client retries per request"),
+    backoff: float = typer.Option(0.05, help="Client base backoff seconds"),
+    decode: bool = typer.Option(True, help="Decode bodies to Arrow in the workers (the `range` ingest path)"),
+    fixtures: List[str] = _FIXTURES,
+    http_cache: List[str] = _HTTP_CACHE,
+    synthetic_seasons: int = typer.Option(1, help="Synthetic seasons to serve (0 = fixtures / http cache only)"),
+    seed: int = _SEED,
+    latency_ms: float = _LATENCY,
+    jitter_ms: float = _JITTER,
+    error_rate: float = _ERRORS,
+    error_status: int = _STATUS,
+    rate_limit: float = _RATE,
+    burst: int = _BURST,
+    retry_after: float = _RETRY_AFTER,
+    strict_dates: bool = _STRICT,
+    out: str = typer.Option(None, help="Also write the results as JSON"),
+):
+    """Backfill actuals from an in-process stand-in at each concurrency level: throughput, errors, retries."""
+    from ..data.backfill import fetch_actuals_range
+    from ..data.sportsdata import SportsDataClient, STATS_BY_DATE
+    from .update_history import _decode_actuals
+
+    store = _store(fixtures, http_cache, synthetic_seasons, None, seed)
+    days = store.dates(STATS_BY_DATE)
+    if not days and not start:
+        raise typer.BadParameter("no actuals to serve: give --fixtures, --http-cache or --synthetic-seasons")
+    s = pd.Timestamp(start or days[0])
+    dates = list(pd.date_range(s, pd.Timestamp(end) if end else s + pd.Timedelta(days=59), freq="D"))
+    faults = Faults(latency_ms, jitter_ms, error_rate, error_status, rate_limit, burst, retry_after, seed)
+    os.environ["WS_HTTP_CACHE"] = "0"              # every date goes over the wire
+    rows = []
+    for n in (int(x) for x in concurrency.split(",")):
+        with FixtureServer(store, faults, strict_dates=strict_dates) as srv:
+            client = SportsDataClient(base=srv.url, key="fixture", pool_size=max(1, n), rate=client_rate,
+                                      retries=retries, backoff=backoff)
+            t0 = time.perf_counter()
+            res = fetch_actuals_range(dates, concurrency=n, client=client,
+                                      decode=_decode_actuals if decode else None)
+            wall = time.perf_counter() - t0
+            client.close()
+            stats = srv.stats().get(STATS_BY_DATE, {"requests": 0, "bytes": 0, "status": {}})
+        failed = sum(isinstance(r, Exception) for r in res.values())
+        got = sum(r.num_rows if decode else len(r) for r in res.values() if not isinstance(r, Exception))
+        rows.append({"concurrency": n, "dates": len(dates), "failed_dates": failed, "rows": got, "wall_s": wall,
+                     "dates_per_s": len(dates) / max(wall, 1e-9), "rows_per_s": got / max(wall, 1e-9),
+                     "requests": stats["requests"], "status": stats["status"], "mb": stats["bytes"] / 1e6})
+        r = rows[-1]
+        typer.echo(f"concurrency {n:>3d}: {r['wall_s']:7.2f}s  {r['dates_per_s']:7.1f} dates/s  "
+                   f"{r['rows_per_s']:>10,.0f} rows/s  {r['requests']} requests "
+                   f"({', '.join(f'{k}x{v}' for k, v in sorted(r['status'].items()))})  failed dates {failed}")
+    if out:
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        Path(out).write_text(json.dumps(rows, indent=1))
+        typer.echo(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    app()
@@ -1,8 +1,9 @@
 from __future__ import annotations
 import typer, pandas as pd
-from ..data.persist import append
+from ..data.persist import append, in_session
 app = typer.Typer(help="Actuals logging")
 @app.command()
+@in_session
 def from_csv(csv_path: str):
     df = pd.read_csv(csv_path, parse_dates=["date"])
     append("fact_actuals", df)
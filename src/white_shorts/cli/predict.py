@@ -5,12 +5,10 @@ from ..config import settings
 from ..data.load_ytd import load_ytd
 from ..data.fetch_recent import fetch_recent
 from ..data.fetch_projections import naive_projections_from_recent, fetch_player_projections_by_date
-from ..data.persist import init_db, append
+from ..data.persist import init_db, append, in_session
 from ..features.engineer import engineer_minimal
 from ..features.registry import PLAYER_FEATURES, TEAM_FEATURES
-from ..modeling.trainers import train_player_count, train_team_goals
-from ..modeling.predictors import predict_player_counts, predict_match_totals
-from ..modeling.io import load_model, latest_model_path
+from ..utils.trace import traced
 
 app = typer.Typer(help="Prediction commands")
 def _check_features(df, required, where=""):
@@ -19,11 +17,16 @@ def _check_features(df, required, where=""):
        raise KeyError(f"Missing features {missing} in {where}. Present sample: {df.columns.tolist()[:25]}")
 
 @app.command()
+@in_session
 def tomorrow(
     
     ytd_csv: str = typer.Option("data/NHL_2023_24.csv", help="Path to last season CSV"),
     date: str = typer.Option(None, help="Prediction slate date (YYYY-MM-DD)"),
 ):
+    # LightGBM / scipy are imported here, not at module load: `ws` only pays for them when predicting
+    from ..modeling.trainers import train_player_count, train_team_goals
+    from ..modeling.predictors import predict_player_counts, predict_match_totals
+    from ..modeling.io import load_model, latest_model_path
     init_db()
     run_id = str(uuid.uuid4())
     df_ytd = load_ytd(ytd_csv)
@@ -39,6 +42,7 @@ def tomorrow(
         b.model_name = d["model_name"]; b.model_version = d["model_version"]
         return b
 
+    @traced
     def _load_or_train(prefix: str, trainer, features: list[str], df, **kwargs):
         """
         Try load latest model (matching feature signature); else train.
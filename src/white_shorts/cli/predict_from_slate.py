@@ -7,13 +7,15 @@ from datetime import datetime
 
 from ..data.load_ytd import load_ytd
 from ..data.update_history import load_current_season
-from ..features.engineer import engineer_minimal
+from ..features.engine import engineer_fast
+from ..features.state import FeatureState, FEATURE_STATE_DIR, unusable_reason
 from ..features.registry import PLAYER_FEATURES
-from ..data.persist import init_db, append, PRED_COLS
+from ..data.persist import init_db, append, PRED_COLS, in_session
 
-from ..modeling.trainers_qrf import train_player_qrf, qrf_predict_with_quantiles
-from ..modeling.io_qrf import save_qrf, load_latest
-from ..modeling.ets_totals import fit_team_ets, forecast_next
+from ..modeling.trainers_qrf import train_player_qrf, train_player_qrf_multi, qrf_predict_with_quantiles, QRF_TARGETS
+from ..modeling.io_qrf import save_qrf, load_latest, load_latest_multi, multi_enabled
+from ..modeling.ets_totals import team_ets, team_goal_history
+from ..utils.trace import traced
 
 app = typer.Typer(help="Predict ONLY for players present in the given slate (single date).")
 
@@ -23,22 +25,48 @@ def _parse_date(date_str: str) -> pd.Timestamp:
         raise ValueError(f"Unparseable date: {date_str}")
     return d.normalize()
 
+def _played_history(df_ytd: pd.DataFrame, before: pd.Timestamp) -> pd.DataFrame:
+    """YTD rows plus current-season actuals from DuckDB, strictly before `before`."""
+    from .train_qrf import _load_current_from_duckdb
+    hist = df_ytd
+    cur = _load_current_from_duckdb(days=0)
+    if not cur.empty:
+        cur = cur.loc[pd.to_datetime(cur["date"]) > pd.to_datetime(df_ytd["date"], errors="coerce").max()]
+        cols = sorted(set(df_ytd.columns).union(cur.columns))
+        hist = pd.concat([df_ytd.reindex(columns=cols), cur.reindex(columns=cols)], ignore_index=True)
+    dates = pd.to_datetime(hist["date"], errors="coerce")
+    return hist.loc[dates < before]
+
 def _bundle_from_loaded(d):
     class B: ...
     b = B()
     b.model = d["model"]; b.features = d["features"]; b.target = d["target"]
     b.model_name = d["model_name"]; b.model_version = d["model_version"]
+    b.output = d.get("output", 0)
     return b
 
-def _load_or_train(prefix: str, df_feat: pd.DataFrame, features: list[str], target: str):
+@traced
+def _load_or_train(prefix: str, df_feat, features: list[str], target: str):
+    if multi_enabled():
+        d = load_latest_multi(features, target)
+        if d:
+            return _bundle_from_loaded(d)
+        if callable(df_feat):
+            df_feat = df_feat()
+        m = train_player_qrf_multi(df_feat, features, list(QRF_TARGETS))
+        save_qrf(m)
+        return m.for_target(target)
     d = load_latest(prefix, features)
     if d and d.get("features") == features:
         return _bundle_from_loaded(d)
+    if callable(df_feat):
+        df_feat = df_feat()
     b = train_player_qrf(df_feat, features, target=target)
     save_qrf(b)
     return b
 
 @app.command()
+@in_session
 def slate(
     slate_parquet: str = typer.Argument(..., help="Path to data/slates/slate_<date>.parquet"),
     ytd_csv: str = typer.Option("data/NHL_YTD.csv", help="Last season CSV"),
@@ -46,12 +74,29 @@ def slate(
     version: str = typer.Option("0.3.0", help="Model version tag"),
     out_dir: str = typer.Option("data/parquet", help="Output directory for CSV artifact"),
     date: str = typer.Option(None, help="Force a specific slate date (YYYY-MM-DD) if the parquet contains multiple dates"),
+    feature_state: str = typer.Option(FEATURE_STATE_DIR, help="Feature state store dir; used instead of re-engineering history when it is older than the slate"),
 ):
     """
     Run QRF player predictions and ETS team totals for the given slate.
     HARD RULE: predictions are produced ONLY for players contained in the slate rows for the resolved date.
     """
-
+    predict_slate(slate_parquet, ytd_csv, current_season_parquet, version, out_dir, date, feature_state)
+
+@traced
+def predict_slate(
+    slate_parquet: str,
+    ytd_csv: str = "data/NHL_YTD.csv",
+    current_season_parquet: str | None = None,
+    version: str = "0.3.0",
+    out_dir: str = "data/parquet",
+    date: str | None = None,
+    feature_state: str | None = FEATURE_STATE_DIR,
+    df_ytd: pd.DataFrame | None = None,
+) -> str | None:
+    """Body of `slate`; returns the predictions CSV path (None when there was nothing to predict).
+
+    `df_ytd` is an already loaded YTD frame (not modified); loaded from `ytd_csv` when None.
+    """
     init_db()
 
     # 0) Load slate (authoritative identifiers: date, game_id, team, opponent, player_id, name)
@@ -106,7 +151,7 @@ def slate(
         return
 
     # 1) Build feature history from YTD (+ current season if available)
-    df_ytd = load_ytd(ytd_csv)
+    df_ytd = load_ytd(ytd_csv) if df_ytd is None else df_ytd.copy(deep=False)
     cur_path = current_season_parquet or os.getenv("WS_CURRENT_SEASON_PARQUET", "data/current_season.parquet")
     df_cur = proj#load_current_season(cur_path)
 
@@ -119,21 +164,41 @@ def slate(
     else:
         hist = df_ytd
 
-    # Engineer features on history
-    df_feat_all = engineer_minimal(hist)
-    df_feat_all["player_id"] = df_feat_all["player_id"].astype(str)
-    df_feat_all["date"] = df_feat_all["date"].apply(_parse_date)
-
-    # Take most recent snapshot per (player_id, team) for features
-    snap_cols = ["player_id", "team"] + [f for f in PLAYER_FEATURES]
-    if "team" not in df_feat_all.columns:
-        df_feat_all["team"] = pd.NA
-    df_feat_all = df_feat_all.sort_values("date")
-    last_feat = (
-        df_feat_all
-        .groupby(["player_id", "team"], as_index=False)
-        .tail(1)[snap_cols]
-    )
+    # Engineered history is only needed when there is no usable feature state
+    # (or a model has to be trained inline), so build it lazily.
+    _feat_all = {}
+    def _feat_history() -> pd.DataFrame:
+        if "df" not in _feat_all:
+            df = engineer_fast(hist)
+            df["player_id"] = df["player_id"].astype(str)
+            df["date"] = df["date"].apply(_parse_date)
+            if "team" not in df.columns:
+                df["team"] = pd.NA
+            _feat_all["df"] = df.sort_values("date")
+        return _feat_all["df"]
+
+    # Most recent played-game snapshot per (player_id, team): straight from the
+    # feature state store when it covers the played history (YTD + fact_actuals)
+    # and predates the slate, else from engineered history (slate rows excluded,
+    # they carry no stats yet).
+    played_hist = _played_history(df_ytd, target_date)
+    state = FeatureState.load(feature_state) if feature_state else None
+    reason = unusable_reason(state, pd.to_datetime(played_hist["date"], errors="coerce").max(),
+                             pd.Timestamp(target_date))
+    if state is not None and reason:
+        typer.echo(f"[warn] {reason}; engineering from history instead")
+        state = None
+    if state is not None:
+        typer.echo(f"Using feature state as of {state.as_of.date()} ({feature_state})")
+        last_feat = state.last_features(PLAYER_FEATURES)
+    else:
+        snap_cols = ["player_id", "team"] + [f for f in PLAYER_FEATURES]
+        played = _feat_history()
+        last_feat = (
+            played.loc[played["date"] < target_date]
+            .groupby(["player_id", "team"], as_index=False)
+            .tail(1)[snap_cols]
+        )
 
     # Merge features ONTO THE SLATE (inner semantics: keep only slate players)
     # Use left join (slate driven) but we will fill features later; output will remain strictly slate players.
@@ -148,9 +213,10 @@ def slate(
     run_id = os.getenv("WS_RUN_ID", str(abs(hash(datetime.utcnow().isoformat()))))
 
     # 2) Player predictions via QRF — strictly for slate players (df_feat rows)
+    @traced
     def _player_block(target: str):
         prefix = f"rf_qrf_{target}"
-        bundle = _load_or_train(prefix, df_feat_all, PLAYER_FEATURES, target=target)
+        bundle = _load_or_train(prefix, _feat_history, PLAYER_FEATURES, target=target)
         X = df_feat[bundle.features].fillna(0)
         mu, q10, q90 = qrf_predict_with_quantiles(bundle, X, 0.10, 0.90)
         out = df_feat[["date", "game_id", "team", "opponent", "player_id", "name"]].copy()
@@ -171,50 +237,31 @@ def slate(
     preds_assists = _player_block("assists")
     preds_shots   = _player_block("shots_on_goal")
 
-    # 3) Team totals via ETS, but driven by THIS DATE'S slate games only
-    hist_keys = ["date", "game_id", "team", "opponent", "home_or_away"]
-    team_hist = (
-        df_feat_all.groupby(hist_keys, as_index=False)["points"]
-        .sum().rename(columns={"points": "team_goals"})
-        .sort_values("date")
-    )
-
-    ets_models = {}
-    for team, grp in team_hist.groupby("team"):
-        s = grp[["date", "team_goals"]].dropna().sort_values("date")
-        if len(s) >= 5:
-            ets_models[team] = fit_team_ets(s, team)
+    # 3) Team totals via ETS, but driven by THIS DATE'S slate games only.
+    # The stored ETS state only ever advances on played games (YTD + fact_actuals
+    # before the slate date) — slate rows carry no goals.
+    ets = team_ets(team_goal_history(played_hist))
 
     # Unique games from the filtered slate (i.e., only today's slate)
-    games = proj[["date", "game_id", "team", "opponent"]].dropna().drop_duplicates()
-    total_rows = []
-
-    for gid, ggrp in games.groupby("game_id"):
-        r0 = ggrp.iloc[0]
-        pred_date = r0["date"].strftime("%Y-%m-%d")
-        team_a = str(r0["team"]); team_b = str(r0["opponent"])
-        lam_a = forecast_next(ets_models.get(team_a)) if team_a in ets_models else np.nan
-        lam_b = forecast_next(ets_models.get(team_b)) if team_b in ets_models else np.nan
-        lam_total = np.nansum([lam_a, lam_b])
-        total_rows.append({
-            "date": r0["date"],
-            "game_id": gid,
-            "team": team_a,
-            "opponent": team_b,
-            "player_id": None,
-            "name": None,
-            "target": "total_goals",
-            "model_name": "ets_sum_team_goals",
-            "model_version": version,
-            "distribution": "ets_sum",
-            "lambda_or_mu": float(lam_total) if lam_total == lam_total else 0.0,
-            "q10": 0.0,
-            "q90": 0.0,
-            "p_ge_k_json": "",
-            "run_id": run_id,
-            "created_ts": datetime.utcnow(),
-        })
-    preds_totals = pd.DataFrame(total_rows)
+    games = (proj[["date", "game_id", "team", "opponent"]].dropna()
+             .drop_duplicates(subset=["game_id"]).reset_index(drop=True))
+    tot = ets.forecast_totals(games["team"].astype(str), games["opponent"].astype(str))
+    preds_totals = games.assign(
+        team=games["team"].astype(str),
+        opponent=games["opponent"].astype(str),
+        player_id=None,
+        name=None,
+        target="total_goals",
+        model_name="ets_sum_team_goals",
+        model_version=version,
+        distribution="ets_sum",
+        lambda_or_mu=tot["mu"],
+        q10=tot["q10"],
+        q90=tot["q90"],
+        p_ge_k_json="",
+        run_id=run_id,
+        created_ts=datetime.utcnow(),
+    )
 
     all_preds = pd.concat(
         [preds_points, preds_goals, preds_assists, preds_shots, preds_totals],
@@ -235,6 +282,7 @@ def slate(
 
     append("fact_predictions", all_preds)
     typer.echo(f"Saved predictions CSV → {out_csv}")
+    return out_csv
 
 if __name__ == "__main__":
     app()
@@ -6,13 +6,16 @@ import numpy as np
 from datetime import datetime
 
 from ..data.load_ytd import load_ytd
-from ..features.engineer import engineer_minimal
+from ..features.engine import engineer_fast
+from ..features.state import FeatureState, FEATURE_STATE_DIR, unusable_reason
 from ..features.registry import PLAYER_FEATURES, TEAM_FEATURES
-from ..data.persist import init_db, append, PRED_COLS
-from ..modeling.trainers_qrf import train_player_qrf, qrf_predict_with_quantiles
-from ..modeling.io_qrf import save_qrf, load_latest
-from ..modeling.ets_totals import fit_team_ets, forecast_next
+from ..data.persist import init_db, append, PRED_COLS, in_session
+from ..modeling.trainers_qrf import train_player_qrf, train_player_qrf_multi, qrf_predict_with_quantiles, QRF_TARGETS
+from ..modeling.io_qrf import save_qrf, load_latest, load_latest_multi, multi_enabled
+from ..modeling.ets_totals import team_ets, team_goal_history
 from ..data.projections import fetch_projections_by_date
+from ..utils.trace import traced
+from .predict_from_slate import _played_history
 
 app = typer.Typer(help="QRF players + ETS totals predictions (additive CLI)")
 
@@ -21,9 +24,18 @@ def _bundle_from_loaded(d):
     b = B()
     b.model = d["model"]; b.features = d["features"]; b.target = d["target"]
     b.model_name = d["model_name"]; b.model_version = d["model_version"]
+    b.output = d.get("output", 0)
     return b
 
+@traced
 def _load_or_train(prefix: str, df_feat: pd.DataFrame, features: list[str], target: str):
+    if multi_enabled():
+        d = load_latest_multi(features, target)
+        if d:
+            return _bundle_from_loaded(d)
+        m = train_player_qrf_multi(df_feat, features, list(QRF_TARGETS))
+        save_qrf(m)
+        return m.for_target(target)
     d = load_latest(prefix, features)
     if d and d.get("features") == features:
         return _bundle_from_loaded(d)
@@ -32,6 +44,7 @@ def _load_or_train(prefix: str, df_feat: pd.DataFrame, features: list[str], targ
     return b
 
 @app.command()
+@in_session
 def tomorrow(date: str = typer.Option(None, help="YYYY-MM-DD (or 15/10/2025) slate date")):
     init_db()
 
@@ -60,22 +73,31 @@ def tomorrow(date: str = typer.Option(None, help="YYYY-MM-DD (or 15/10/2025) sla
     # 2) Build features from YTD (training history), then LEFT-JOIN onto the slate
     ytd_csv = os.getenv("WS_YTD_CSV", "data/NHL_2023_24.csv")
     df_ytd = load_ytd(ytd_csv)
-    df_feat_all = engineer_minimal(df_ytd)
 
-
-    # Use the most recent engineered row per player_id/team as the feature snapshot
-    snap_cols = ["player_id","team"] + [c for c in df_feat_all.columns if c in PLAYER_FEATURES]
-    df_feat_all["player_id"] = df_feat_all["player_id"].astype(str)
-    df_feat_all["date"] = pd.to_datetime(df_feat_all["date"], errors="coerce")
-    last_feat = (df_feat_all
-                 .sort_values("date")
-                 .groupby(["player_id","team"], as_index=False)
-                 .tail(1)[snap_cols])
+    # Use the most recent engineered row per player_id/team as the feature snapshot:
+    # from the feature state store when it covers the played history (YTD + fact_actuals)
+    # and predates the slate, otherwise re-engineered from history.
+    played = _played_history(df_ytd, slate_date)
+    state = FeatureState.load(os.getenv("WS_FEATURE_STATE_DIR", FEATURE_STATE_DIR))
+    reason = unusable_reason(state, pd.to_datetime(played["date"], errors="coerce").max(), slate_date)
+    if state is not None and reason:
+        typer.echo(f"[warn] {reason}; engineering from history instead")
+        state = None
+    if state is not None:
+        typer.echo(f"Using feature state snapshots as of {state.as_of.date()}")
+        last_feat = state.last_features(PLAYER_FEATURES)
+    else:
+        df_feat_all = engineer_fast(df_ytd)
+        snap_cols = ["player_id","team"] + [c for c in df_feat_all.columns if c in PLAYER_FEATURES]
+        df_feat_all["player_id"] = df_feat_all["player_id"].astype(str)
+        df_feat_all["date"] = pd.to_datetime(df_feat_all["date"], errors="coerce")
+        last_feat = (df_feat_all
+                     .sort_values("date")
+                     .groupby(["player_id","team"], as_index=False)
+                     .tail(1)[snap_cols])
 
     # Merge features onto the slate; identifiers (date/game_id/team/opponent) stay from proj
     df_feat = proj.merge(last_feat, on=["player_id","team"], how="left")
-    
-
 
     # 3) If some players lack features, fill with zeros (stub-friendly)
     for f in PLAYER_FEATURES:
@@ -83,47 +105,7 @@ def tomorrow(date: str = typer.Option(None, help="YYYY-MM-DD (or 15/10/2025) sla
             df_feat[f] = 0.0
     df_feat[PLAYER_FEATURES] = df_feat[PLAYER_FEATURES].fillna(0.0)
 
-    ####################################################################
-    # Team totals ETS baseline using the slate games
-    keys = ["date","game_id","team","opponent"]
-    # Build a unique games list for both sides:
-    games_home = proj[["date","game_id","team","opponent"]].dropna().drop_duplicates()
-    games_away = proj.rename(columns={"team":"opponent","opponent":"team"})[["date","game_id","team","opponent"]]
-    games = pd.concat([games_home, games_away], ignore_index=True).drop_duplicates()
-
-    # Team history to fit ETS
-    hist_keys = ["date","game_id","team","opponent","home_or_away"]
-    team_hist = (df_feat_all.groupby(hist_keys, as_index=False)["points"]
-                 .sum().rename(columns={"points":"team_goals"}))
-    team_hist = team_hist.sort_values("date")
-
-    ets_models = {}
-    for team, grp in team_hist.groupby("team"):
-        series = grp[["date","team_goals"]].dropna().sort_values("date")
-        if len(series) >= 5:
-            ets_models[team] = fit_team_ets(series, team)
     run_id = os.getenv("WS_RUN_ID", str(abs(hash(datetime.utcnow().isoformat()))))
-    rows = []
-    for _, r in games.iterrows():
-        lam = np.nan
-        if r["team"] in ets_models:
-            lam = forecast_next(ets_models[r["team"]])
-        rows.append({
-            "date": r["date"], "game_id": r["game_id"], "team": r["team"], "opponent": r["opponent"],
-            "player_id": None, "name": None,
-            "target": "total_goals",
-            "model_name": "ets_sum_team_goals",
-            "model_version": "0.3.0",
-            "distribution": "ets_sum",
-            "lambda_or_mu": float(lam) if lam==lam else 0.0,
-            "q10": 0.0, "q90": 0.0, "p_ge_k_json": "",
-            "run_id": run_id, "created_ts": datetime.utcnow()
-        })
-    preds_totals = pd.DataFrame(rows)
-
-    #####################################################################
-    
-
 
     def _player_block(target: str):
         prefix = f"rf_qrf_{target}"
@@ -148,34 +130,18 @@ def tomorrow(date: str = typer.Option(None, help="YYYY-MM-DD (or 15/10/2025) sla
     preds_assists = _player_block("assists")
     preds_shots   = _player_block("shots_on_goal")
 
-    keys = ["date","game_id","team","opponent","home_or_away"]
-    team_target = (df_feat.groupby(keys, as_index=False)["points"]
-                   .sum().rename(columns={"points":"team_goals"}))
-    team_series = team_target.sort_values("date")
-
-    ets_models = {}
-    for team, grp in team_series.groupby("team"):
-        s = grp[["date","team_goals"]].dropna().sort_values("date")
-        if len(s) >= 5:
-            ets_models[team] = fit_team_ets(s, team)
-
-    rows = []
-    for _, r in team_series.drop_duplicates(subset=["date","game_id","team","opponent"]).iterrows():
-        lam_h = forecast_next(ets_models.get(r["team"])) if r["team"] in ets_models else np.nan
-        lam_a = forecast_next(ets_models.get(r["opponent"])) if r["opponent"] in ets_models else np.nan
-        lam_total = np.nansum([lam_h, lam_a])
-        rows.append({
-            "date": r["date"], "game_id": r["game_id"], "team": r["team"], "opponent": r["opponent"],
-            "player_id": None, "name": None,
-            "target": "total_goals",
-            "model_name": "ets_sum_team_goals",
-            "model_version": "0.3.0",
-            "distribution": "ets_sum",
-            "lambda_or_mu": float(lam_total) if lam_total==lam_total else 0.0,
-            "q10": 0.0, "q90": 0.0, "p_ge_k_json": "",
-            "run_id": run_id, "created_ts": datetime.utcnow()
-        })
-    preds_totals = pd.DataFrame(rows)
+    # Team totals: one-step ETS forecast per slate game (batched, persisted state); the
+    # stored state only advances on played games (YTD + fact_actuals before the slate)
+    ets = team_ets(team_goal_history(played))
+    games = (df_feat[["date","game_id","team","opponent"]].dropna()
+             .drop_duplicates(subset=["game_id"]).reset_index(drop=True))
+    tot = ets.forecast_totals(games["team"], games["opponent"])
+    preds_totals = games.assign(
+        player_id=None, name=None, target="total_goals",
+        model_name="ets_sum_team_goals", model_version="0.3.0", distribution="ets_sum",
+        lambda_or_mu=tot["mu"], q10=tot["q10"], q90=tot["q90"], p_ge_k_json="",
+        run_id=run_id, created_ts=datetime.utcnow(),
+    )
 
     all_preds = pd.concat([preds_points, preds_goals, preds_assists, preds_shots, preds_totals], ignore_index=True)
 
@@ -1,13 +1,13 @@
 from __future__ import annotations
+import os
 import typer
 from ..config import settings
 from ..data.load_ytd import load_ytd
 from ..data.persist import init_db
 from ..features.engineer import engineer_minimal
 from ..features.registry import PLAYER_FEATURES, TEAM_FEATURES
-from ..modeling.trainers import train_player_count, train_team_goals
 from ..modeling.targets import Target
-from ..modeling.io import save_model
+from ..modeling.scheduler import TrainJob, run_jobs
 
 app = typer.Typer(help="Training commands")
 def _check_features(df, required, where=""):
@@ -17,7 +17,14 @@ def _check_features(df, required, where=""):
 
 
 @app.command()
-def all(csv_path: str = typer.Option("data/NHL_2023_24.csv", help="Path to last season CSV")):
+def all(csv_path: str = typer.Option("data/NHL_2023_24.csv", help="Path to last season CSV"),
+        workers: int = typer.Option(None, help="Training processes (default: env WS_TRAIN_WORKERS or one per core)"),
+        shared: bool = typer.Option(os.getenv("WS_LGB_SHARED_DATASET", "1") != "0", "--shared-dataset/--per-target-dataset",
+                                    help="Bin the player feature matrix once (cached binary Dataset) for all targets")):
+    # LightGBM / joblib are imported here, not at module load: `ws` only pays for them when training
+    from ..modeling.trainers import train_player_count, train_team_goals
+    from ..modeling.io import save_model
+    from ..modeling.lgb_dataset import shared_dataset
     init_db()
     df = load_ytd(csv_path)
     df_feat = engineer_minimal(df)
@@ -29,16 +36,16 @@ def all(csv_path: str = typer.Option("data/NHL_2023_24.csv", help="Path to last
     _check_features(df_feat, TEAM_FEATURES, where="df_feat (engineered)")
 
     # --- Player-level models ---
-    for t in [Target.POINTS, Target.GOALS, Target.ASSISTS, Target.SHOTS]:
-        b = train_player_count(
-            df_feat,
-            PLAYER_FEATURES,
-            t.value,
-            sample_weight=None,
-            version=settings.MODEL_VERSION_TAG,
-        )
-        path = save_model(b)
-        typer.echo(f"Trained & saved {b.model_name} → {path}")
+    # one binned Dataset for all player targets; reused from cache when the features are unchanged
+    player_kw = dict(sample_weight=None, version=settings.MODEL_VERSION_TAG)
+    if shared:
+        ds_path, built = shared_dataset(df_feat, PLAYER_FEATURES)
+        typer.echo(f"{'Built' if built else 'Reusing'} shared LightGBM dataset → {ds_path}")
+        player_kw["dataset"] = ds_path
+    jobs = [
+        TrainJob(t.value, train_player_count, (df_feat, PLAYER_FEATURES, t.value), dict(player_kw), save=save_model)
+        for t in [Target.POINTS, Target.GOALS, Target.ASSISTS, Target.SHOTS]
+    ]
 
     # TEAM model — KEEP features
     keys = ["date","game_id","team","opponent","home_or_away"]
@@ -69,7 +76,13 @@ def all(csv_path: str = typer.Option("data/NHL_2023_24.csv", help="Path to last
     if missing:
         raise KeyError(f"Missing {missing} in team_df (train)")
     print(df_feat[["points","goals","assists","shots_on_goal"]].describe())
-    bteam = train_team_goals(team_df, TEAM_FEATURES, target="team_goals", version=settings.MODEL_VERSION_TAG)
-    path_team = save_model(bteam)
-    typer.echo(f"Trained & saved team goals model → {path_team}")
+    jobs.append(TrainJob("team_goals", train_team_goals, (team_df, TEAM_FEATURES),
+                         dict(target="team_goals", version=settings.MODEL_VERSION_TAG), save=save_model))
 
+    # independent models train in parallel processes; each saves as soon as it finishes
+    failed = 0
+    for r in run_jobs(jobs, workers=workers):
+        typer.echo(("Trained & saved " if not r.error else "") + r.summary())
+        failed += bool(r.error)
+    if failed:
+        raise typer.Exit(code=1)
@@ -6,14 +6,16 @@ from typing import Optional, Iterable
 import typer
 import pandas as pd
 import duckdb
-import requests
 
 from ..config import settings
 from ..data.load_ytd import load_ytd
-from ..features.engineer import engineer_minimal
+from ..data.sportsdata import get_client
+from ..features.engine import engineer_fast
 from ..features.registry import PLAYER_FEATURES
-from ..modeling.trainers_qrf import train_player_qrf
-from ..modeling.io_qrf import save_qrf
+from ..modeling.trainers_qrf import train_player_qrf, train_player_qrf_multi, update_player_qrf, bundle_from_loaded
+from ..modeling.io_qrf import save_qrf, multi_enabled, load_latest, load_latest_multi
+from ..modeling.scheduler import TrainJob, run_jobs
+from ..utils.trace import traced
 
 app = typer.Typer(help="Train Quantile Random Forest models for player targets")
 
@@ -162,9 +164,8 @@ def _load_current_from_duckdb(days: Optional[int] = 90) -> pd.DataFrame:
 
 def _fetch_actuals_for_dates(dates: Iterable[pd.Timestamp | str]) -> pd.DataFrame:
     """Pull actuals from SportsData.io for a date list; return wide schema."""
-    base = os.getenv("SPORTS_DATA_BASE", "https://api.sportsdata.io")
-    key = os.getenv("SPORTS_DATA_API_KEY", "")
-    if not key:
+    client = get_client()
+    if not client.key:
         # no key → nothing fetched
         return pd.DataFrame(columns=_REQUIRED_WIDE)
 
@@ -173,40 +174,35 @@ def _fetch_actuals_for_dates(dates: Iterable[pd.Timestamp | str]) -> pd.DataFram
         ts = pd.to_datetime(d, dayfirst=True, errors="coerce")
         if pd.isna(ts):
             continue
-        # try both formats; keep first non-empty
-        for fmt in ("%Y-%b-%d", "%Y-%m-%d"):
-            ds = ts.strftime(fmt)
-            url = f"{base}/api/nhl/fantasy/json/PlayerGameStatsByDate/{ds}?key={key}"
-            try:
-                r = requests.get(url, timeout=25)
-                if r.status_code != 200:
-                    continue
-                data = r.json()
-                if not isinstance(data, list) or len(data) == 0:
-                    continue
-                frames.append(_normalize_wide(pd.DataFrame(data)))
-                break  # got data for this date; next date
-            except Exception:
-                continue
+        try:
+            data = client.player_game_stats(ts)
+        except Exception:
+            # offline cache miss or API still failing after retries: skip the date
+            continue
+        if data:
+            frames.append(_normalize_wide(pd.DataFrame(data)))
 
     if not frames:
         return pd.DataFrame(columns=_REQUIRED_WIDE)
     return pd.concat(frames, ignore_index=True)
 
 
+@traced
 def _assemble_training_frame(
     ytd_csv: str,
     use_duckdb_days: int = 120,
     api_backfill_days: int = 30,
+    df_ytd: Optional[pd.DataFrame] = None,
 ) -> pd.DataFrame:
     """
     Build training frame = YTD (2023/24) + current-season actuals.
     Priority:
       1) Pull from DuckDB (last N days) if exists.
       2) If DuckDB missing/empty, fetch from API for last M days.
+    `df_ytd` is an already loaded YTD frame (not modified); loaded from `ytd_csv` when None.
     """
     # 1) Base: prior season CSV
-    df_ytd = load_ytd(ytd_csv)  # already returns wide with targets
+    df_ytd = load_ytd(ytd_csv) if df_ytd is None else df_ytd.copy(deep=False)  # already returns wide with targets
     # Normalize a bit (just in case)
     df_ytd["team"] = df_ytd["team"].astype(str).str.upper().str.strip()
     df_ytd["opponent"] = df_ytd["opponent"].astype(str).str.upper().str.strip()
@@ -244,12 +240,42 @@ def _train_one(df_feat: pd.DataFrame, target: str, version: str = "0.3.0") -> st
     return path
 
 
+def _incremental_default() -> bool:
+    return os.getenv("WS_QRF_INCREMENTAL", "0").lower() in ("1", "true", "yes")
+
+
+def _fit_or_update(df_feat: pd.DataFrame, target: Optional[str], version: str, incremental: bool,
+                   n_jobs: int = -1):
+    """(bundle, note): warm-start the latest saved model when possible, else a full fit.
+
+    target=None means the multi-output bundle over all targets.
+    """
+    if incremental:
+        d = (load_latest_multi(PLAYER_FEATURES) if target is None
+             else load_latest(f"rf_qrf_{target}", PLAYER_FEATURES))
+        if d and d.get("features") == PLAYER_FEATURES:
+            return update_player_qrf(bundle_from_loaded(d), df_feat, n_jobs=n_jobs)
+    if target is None:
+        return train_player_qrf_multi(df_feat, PLAYER_FEATURES, list(_TARGETS), version=version, n_jobs=n_jobs), "full fit"
+    return train_player_qrf(df_feat, PLAYER_FEATURES, target=target, version=version, n_jobs=n_jobs), "full fit"
+
+
+def _save_noted(res) -> str:
+    bundle, note = res
+    if note.endswith("kept"):
+        return f"unchanged [{note}]"
+    return f"{save_qrf(bundle)} [{note}]"
+
+
 @app.command()
 def all(
     ytd_csv: Optional[str] = typer.Option(None, help="Path to YTD CSV (defaults to env WS_YTD_CSV or data/NHL_2023_24.csv)"),
     version: str = typer.Option("0.3.0", help="Model version tag to embed in filenames"),
     use_duckdb_days: int = typer.Option(120, help="Pull recent actuals from DuckDB for this many days if present"),
     api_backfill_days: int = typer.Option(30, help="If DuckDB empty, fetch this many days from API"),
+    multi: Optional[bool] = typer.Option(None, "--multi/--per-target", help="One multi-output forest for all targets (default: env WS_QRF_MULTI)"),
+    workers: Optional[int] = typer.Option(None, help="Training processes for per-target forests (default: env WS_TRAIN_WORKERS or one per core)"),
+    incremental: Optional[bool] = typer.Option(None, "--incremental/--full", help="Warm-start the saved forests on new actuals (default: env WS_QRF_INCREMENTAL); drift guards force a full fit"),
 ):
     """
     Train QRF for points, goals, assists, shots_on_goal using:
@@ -267,14 +293,32 @@ def all(
     if df_raw.empty:
         raise typer.Exit(code=1)
 
-    # Feature engineering (your existing minimal pipeline)
-    df_feat = engineer_minimal(df_raw)
+    # Feature engineering (vectorized engine; parity with engineer_minimal)
+    df_feat = engineer_fast(df_raw)
+    return train_all(df_feat, version, multi, workers, incremental)
+
+
+@traced
+def train_all(df_feat: pd.DataFrame, version: str = "0.3.0", multi: Optional[bool] = None,
+              workers: Optional[int] = None, incremental: Optional[bool] = None) -> dict:
+    """Fit (or warm-start) and save the QRF models for every target from engineered rows; {target: saved}."""
+    incremental = _incremental_default() if incremental is None else incremental
+    if multi if multi is not None else multi_enabled():
+        path = _save_noted(_fit_or_update(df_feat, None, version, incremental))
+        typer.echo(f"Trained & saved multi-output QRF for {', '.join(_TARGETS)} → {path}")
+        return {tgt: path for tgt in _TARGETS}
 
     results = {}
-    for tgt in _TARGETS:
-        path = _train_one(df_feat, tgt, version=version)
-        results[tgt] = path
-        typer.echo(f"Trained & saved QRF for {tgt} → {path}")
+    jobs = [TrainJob(tgt, _fit_or_update, (df_feat, tgt, version, incremental), save=_save_noted)
+            for tgt in _TARGETS]
+    for r in run_jobs(jobs, workers=workers):
+        if r.error:
+            typer.echo(r.summary())
+            continue
+        results[r.name] = r.result
+        typer.echo(f"Trained & saved QRF for {r.name} → {r.result} ({r.timing()})")
+    if len(results) < len(_TARGETS):
+        raise typer.Exit(code=1)
     return results
 
 
@@ -301,7 +345,7 @@ def target(
     if df_raw.empty:
         raise typer.Exit(code=1)
 
-    df_feat = engineer_minimal(df_raw)
+    df_feat = engineer_fast(df_raw)
     path = _train_one(df_feat, name, version=version)
     typer.echo(f"Trained & saved QRF for {name} → {path}")
 
@@ -1,19 +1,33 @@
 from __future__ import annotations
 import os, typer, json
+import click
+from typer.core import TyperGroup
 import pandas as pd
-from ..config import settings
+from ..data.persist import connection, in_session
+from ..features.state import FeatureState, FEATURE_STATE_DIR
+from ..data.update_history import upsert_current_season
+from ..data.backfill import fetch_actuals_range
+from ..data import http_cache
+from ..data.sportsdata import get_client, STATS_BY_DATE
+from ..data.json_arrow import decode_table, records_to_table
+from ..utils.trace import traced
 
 try:
-    import requests
+    import pyarrow as pa
 except Exception:
-    requests = None
+    pa = None
+
 
-try:
-    import duckdb
-except Exception:
-    duckdb = None
-    
-app = typer.Typer(help="Update current-season history (actuals) into DuckDB")
+
+class _DateDefaultGroup(TyperGroup):
+    """`update_history <date>` (the original single-date form) runs `main <date>`."""
+
+    def parse_args(self, ctx: click.Context, args: list[str]) -> list[str]:
+        if args and not args[0].startswith("-") and args[0] not in self.commands:
+            args = ["main", *args]
+        return super().parse_args(ctx, args)
+
+app = typer.Typer(help="Update current-season history (actuals) into DuckDB", cls=_DateDefaultGroup)
 
 # SportsData.IO → canonical
 FIELD_MAP = {
@@ -31,6 +45,11 @@ FIELD_MAP = {
 }
 
 REQUIRED = ["date","game_id","team","opponent","player_id","name","points","goals","assists","shots_on_goal","minutes"]
+
+# Streaming decoder spec: FIELD_MAP fields straight into typed Arrow columns
+_KINDS = {"date": "date", "game_id": "int64", "player_id": "int64",
+          "team": "string", "opponent": "string", "name": "string"}
+ACTUALS_SPEC = {dst: ((src,), _KINDS.get(dst, "float64")) for src, dst in FIELD_MAP.items()}
 #REQUIRED = ["DateTime","GameID","Team","Opponent","PlayerID","Name","Points","Goals","Assists","ShotsOnGoal"]
 
 def _parse_date(date_str: str) -> pd.Timestamp:
@@ -43,59 +62,47 @@ def _parse_date(date_str: str) -> pd.Timestamp:
         raise ValueError(f"Unparseable date: {date_str}")
     return d.normalize()
 
-def _fetch_actuals(date_str_iso: str) -> list[dict]:
+def _parse_day(date_str: str) -> pd.Timestamp:
+    """YYYY-MM-DD first, then DD/MM/YYYY; NaT if neither parses."""
+    d = pd.to_datetime(date_str, format="%Y-%m-%d", errors="coerce")
+    if pd.isna(d):
+        d = pd.to_datetime(date_str, dayfirst=True, errors="coerce")
+    return d
+
+def _decode_actuals(body: bytes) -> "pa.Table":
+    return decode_table(body, ACTUALS_SPEC)
+
+@traced
+def _fetch_actuals(date_str_iso: str) -> "pa.Table":
+    """Fetch ACTUALS for a date (cached; date-token format handled by the client)."""
     print(f"In update_history _fetch_actuals: {date_str_iso}")
-    """Fetch ACTUALS for a date; try 'YYYY-Mon-DD' then 'YYYY-MM-DD'."""
-    base = os.getenv("SPORTS_DATA_BASE", "https://api.sportsdata.io")
-    key  = os.getenv("SPORTS_DATA_API_KEY", "")
-    if not key:
+    client = get_client()
+    if not client.key:
         raise RuntimeError("SPORTS_DATA_API_KEY missing!")
 
     d = pd.to_datetime(date_str_iso, dayfirst=True, errors="coerce")
     if pd.isna(d):
         raise typer.BadParameter(f"Unparseable date: {date_str_iso}")
+    return _decode_actuals(client.get_by_date_raw(STATS_BY_DATE, d))
 
-    # SportsData NHL often expects 'YYYY-Mon-DD' (e.g., 2025-Oct-07)
-    candidates = [d.strftime("%Y-%b-%d"), d.strftime("%Y-%m-%d")]
-    for ds in candidates:
-        url = f"{base}/api/nhl/fantasy/json/PlayerGameStatsByDate/{ds}?key={key}"
-        r = requests.get(url, timeout=30)
-        if r.status_code == 200:
-            try:
-                data = r.json()
-                if isinstance(data, dict):
-                    data = data.get("results") or data.get("data") or []
-                return data or []
-            except Exception:
-                pass
-    return []
-
-def _normalize(raw: list[dict]) -> pd.DataFrame:
-    if not raw:
+def _normalize(raw: "pa.Table | list[dict]") -> pd.DataFrame:
+    if not isinstance(raw, pa.Table):
+        raw = records_to_table(raw or [], ACTUALS_SPEC)
+    if raw.num_rows == 0:
         return pd.DataFrame(columns=REQUIRED)
-    df = pd.DataFrame(raw)
-
-    # rename
-    for src, dst in FIELD_MAP.items():
-        if src in df.columns and dst not in df.columns:
-            df = df.rename(columns={src: dst})
-
-    # ensure required cols exist
-    for c in REQUIRED:
-        if c not in df.columns:
-            df[c] = None
+    # date is already parsed (vectorized) and floored to the day by the decoder
+    df = raw.select(REQUIRED).to_pandas()
 
     # types
-    df["date"] = df["date"].apply(_parse_date)
     for c in ("game_id","player_id"):
-        df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
+        df[c] = df[c].astype("Int64")
     for c in ("team","opponent","name"):
         df[c] = df[c].astype(str).str.strip()
     for c in ("points","goals","assists","shots_on_goal"):
-        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).astype(float)
+        df[c] = df[c].fillna(0).astype(float)
 
     # drop rows missing identifiers
-    df = df[REQUIRED].dropna(subset=["date","game_id","team","opponent","player_id"])
+    df = df.dropna(subset=["date","game_id","team","opponent","player_id"])
     return df
 
 def _to_long(df: pd.DataFrame) -> pd.DataFrame:
@@ -115,35 +122,33 @@ def _to_long(df: pd.DataFrame) -> pd.DataFrame:
     
     return long
 
-@app.command()
-def main(date: str):
-    print(f"In update_history MAIN")
-    """Upsert actuals for a single date (accepts YYYY-MM-DD or DD/MM/YYYY)."""
-    d = _parse_date(date)
-    typer.echo(f"update_history DATE: {d}")
-    if pd.isna(d):
-        raise typer.BadParameter(f"Unparseable date: {date}")
-    #iso = d.strftime("%Y-%m-%d")
-
-    raw = _fetch_actuals(d)
-    print(f"Fetched {len(raw)} rows from API for {d}")
-    df = _normalize(raw)
-    print(f"Normalized rows: {len(df)}")
-    if not df.empty:
-        print("Sample:", df.head(3).to_dict(orient="records"))
+def _update_feature_state(df: pd.DataFrame, d: pd.Timestamp, path: str = FEATURE_STATE_DIR) -> None:
+    """Roll new actuals (through date `d`) into the feature state store (O(new rows))."""
+    state = FeatureState.load(path)
+    if state is None:
+        typer.echo("No feature state store; create one with: python -m white_shorts.cli.feature_state rebuild")
+        return
+    if state.as_of is not None and d <= state.as_of:
+        typer.echo(f"Feature state is already at {state.as_of.date()}; rebuild it to reflect {d.date()}")
+        return
+    if state.as_of is not None and not df.empty:
+        stale = df["date"] <= state.as_of
+        if stale.any():
+            typer.echo(f"Feature state is at {state.as_of.date()}; only rows after it are ingested (rebuild to reflect earlier dates)")
+            df = df.loc[~stale]
+    feats = state.ingest(df)
+    # `d` was fetched in full: the state covers it even when it had no games, so
+    # update_actuals can tell a day without games from a day never ingested
+    if state.as_of is None or d > state.as_of:
+        state.as_of = d
+    state.save(path)
+    typer.echo(f"Feature state updated → as of {state.as_of.date() if state.as_of is not None else '-'} ({len(feats)} rows)")
 
-    long = _to_long(df)
-    print(f"Long rows (targets expanded): {len(long)}")
-
-    con = duckdb.connect(settings.DUCKDB_PATH)
-    try:
-        #con.execute("""
-                       
-            #DROP TABLE fact_actuals;
-        #""")
-        
+@traced
+def _write_actuals(long: pd.DataFrame, dates: list[pd.Timestamp]) -> None:
+    """Replace fact_actuals rows for `dates` with `long`, all in one transaction."""
+    with connection() as con:
         con.execute("""
-                       
             CREATE TABLE IF NOT EXISTS fact_actuals (
               date DATE,
               game_id BIGINT,
@@ -153,40 +158,171 @@ def main(date: str):
               name VARCHAR,
               target VARCHAR,
               actual DOUBLE,
-              minutes DOUBLE      
+              minutes DOUBLE
             )
         """)
-        # Upsert by replacing existing rows for the (date, keys, target)
-        con.execute("""
-            DELETE FROM fact_actuals
-            WHERE date = ?
-        """, [pd.Timestamp(d).date()])
-        typer.echo(f"update_history CLOSING: {pd.Timestamp(d).date()}")
-        if not long.empty:
-            typer.echo(f"update_history PRE_DB_Execute")
-            con.execute("""
-                INSERT INTO fact_actuals
-                    SELECT
-                      CAST(date AS DATE)        AS date,
-                      CAST(game_id AS BIGINT)   AS game_id,
-                      UPPER(TRIM(team))         AS team,
-                      UPPER(TRIM(opponent))     AS opponent,
-                      CAST(player_id AS BIGINT) AS player_id,
-                      COALESCE(name,'')         AS name,
-                      target,
-                      CAST(actual AS DOUBLE)    AS actual,
-                      15    AS minutes,  
-                    FROM long;""")
-
-            typer.echo(f"update_history POST_DB_Execute")
-            # ensure physical write
-            con.execute("CHECKPOINT")
-            typer.echo(f"update_history POST_DB_CheckPoint")
-    finally:
-        typer.echo(f"update_history CLOSING")
-        con.close()
+        con.execute("BEGIN TRANSACTION")
+        try:
+            # Upsert by replacing existing rows for the dates
+            con.executemany("DELETE FROM fact_actuals WHERE date = ?",
+                            [[pd.Timestamp(d).date()] for d in dates])
+            if not long.empty:
+                con.register("long_actuals", long)
+                con.execute("""
+                    INSERT INTO fact_actuals
+                        SELECT
+                          CAST(date AS DATE)        AS date,
+                          CAST(game_id AS BIGINT)   AS game_id,
+                          UPPER(TRIM(team))         AS team,
+                          UPPER(TRIM(opponent))     AS opponent,
+                          CAST(player_id AS BIGINT) AS player_id,
+                          COALESCE(name,'')         AS name,
+                          target,
+                          CAST(actual AS DOUBLE)    AS actual,
+                          15    AS minutes,
+                        FROM long_actuals;""")
+                con.unregister("long_actuals")
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        # ensure physical write
+        con.execute("CHECKPOINT")
+
+def _state_gap(d: pd.Timestamp, path: str = FEATURE_STATE_DIR) -> list[pd.Timestamp]:
+    """Days after the feature state's as-of date and before `d`, i.e. never ingested into it."""
+    state = FeatureState.load(path)
+    if state is None or state.as_of is None or d <= state.as_of:
+        return []
+    return list(pd.date_range(state.as_of + pd.Timedelta(days=1), d - pd.Timedelta(days=1), freq="D"))
+
+def ingest_days(days: list[pd.Timestamp], concurrency: int = 4, rate: float = 4.0, retries: int = 3,
+                backoff: float = 0.5) -> tuple[pd.DataFrame, list[pd.Timestamp]]:
+    """Fetch `days` concurrently into fact_actuals (one transaction), the current season and the
+    feature state. Returns the wide rows and the failed days; the feature state stops before the first."""
+    typer.echo(f"Fetching {len(days)} day(s) {days[0].date()} → {days[-1].date()} "
+               f"(concurrency={concurrency}, rate={rate}/s)")
+    results = fetch_actuals_range(days, concurrency=concurrency, rate=rate, retries=retries, backoff=backoff,
+                                  decode=_decode_actuals)
+
+    ok_days, failed, tables = [], [], []
+    for d in days:
+        res = results.get(d)
+        if isinstance(res, Exception):
+            typer.echo(f"[warn] {d.date()}: {res}")
+            failed.append(d)
+            continue
+        ok_days.append(d)
+        tables.append(res)
+        typer.echo(f"  {d.date()}: {res.num_rows} rows")
+
+    # one vectorized normalize over every fetched day
+    df_all = _normalize(pa.concat_tables(tables)) if tables else pd.DataFrame(columns=REQUIRED)
+    long = _to_long(df_all)
+    if ok_days:
+        _write_actuals(long, ok_days)
+    typer.echo(f"Upserted actuals for {len(ok_days)} day(s): {len(long)} rows; failed: {len(failed)}")
+    typer.echo(http_cache.summary())
+
+    for _, df in df_all.groupby("date", sort=True):
+        upsert_current_season(df)
+    # the feature state only moves forward, so stop it before the first gap:
+    # a failed day re-fetched later must still be able to roll in incrementally
+    through = min(failed) - pd.Timedelta(days=1) if failed else max(ok_days, default=None)
+    gap = _state_gap(days[0])
+    if gap:
+        typer.echo(f"Feature state not advanced: {gap[0].date()} → {gap[-1].date()} were never ingested; "
+                   f"re-run `range --start {gap[0].date()}` to advance it")
+    elif through is not None and through >= days[0]:
+        _update_feature_state(df_all.loc[df_all["date"] <= through], through)
+    if failed and through is not None and through < max(ok_days, default=through):
+        typer.echo(f"Feature state held at {through.date()} (first failed day {min(failed).date()}); "
+                   f"re-run `range --start {min(failed).date()}` to advance it")
+    return df_all, failed
+
+@traced
+def update_actuals(d: pd.Timestamp) -> pd.DataFrame:
+    """Fetch one day's actuals and upsert them into fact_actuals, the current season and the feature state.
+
+    Days between the feature state's as-of date and `d` that were never ingested
+    (e.g. a failed earlier run) are fetched along with `d`; raises when any of them
+    still fails (after writing the ones that did), leaving the state before it.
+    A gap longer than WS_STATE_MAX_GAP_DAYS (e.g. a state left from last season)
+    is not caught up: `d` is ingested alone and the state is left for a rebuild.
+    """
+    gap = _state_gap(d)
+    max_gap = int(os.getenv("WS_STATE_MAX_GAP_DAYS", "14"))
+    hold_state = len(gap) > max_gap
+    if hold_state:
+        typer.echo(f"[warn] Feature state misses {len(gap)} day(s) before {d.date()} (WS_STATE_MAX_GAP_DAYS={max_gap}); "
+                   f"not updating it — rebuild with: python -m white_shorts.cli.feature_state rebuild")
+    elif gap:
+        typer.echo(f"Feature state misses {len(gap)} day(s) before {d.date()}; catching up from {gap[0].date()}")
+        df_all, failed = ingest_days(gap + [d])
+        if failed:
+            raise RuntimeError("actuals failed for " + ", ".join(str(f.date()) for f in failed)
+                               + f"; feature state not advanced past {min(failed).date()}")
+        return df_all.loc[df_all["date"] == d].reset_index(drop=True)
 
+    raw = _fetch_actuals(d)
+    print(f"Fetched {raw.num_rows} rows from API for {d}")
+    df = _normalize(raw)
+    print(f"Normalized rows: {len(df)}")
+    if not df.empty:
+        print("Sample:", df.head(3).to_dict(orient="records"))
+
+    long = _to_long(df)
+    print(f"Long rows (targets expanded): {len(long)}")
+
+    _write_actuals(long, [d])
     print(f"Upserted actuals for {d}: {len(long)} rows")
+    typer.echo(http_cache.summary())
+    typer.echo(get_client().metrics_summary())
+    if not df.empty:
+        # wide rows for this date replace only the date's partition
+        upsert_current_season(df)
+    if not hold_state:
+        _update_feature_state(df, d)
+    return df
+
+@app.command()
+@in_session
+def main(date: str):
+    """Upsert actuals for a single date (accepts YYYY-MM-DD or DD/MM/YYYY)."""
+    d = _parse_date(date)
+    typer.echo(f"update_history DATE: {d}")
+    if pd.isna(d):
+        raise typer.BadParameter(f"Unparseable date: {date}")
+    update_actuals(d)
+
+@app.command("range")
+@in_session
+def range_(
+    start: str = typer.Option(..., help="First date (YYYY-MM-DD or DD/MM/YYYY)"),
+    end: str = typer.Option(..., help="Last date, inclusive"),
+    concurrency: int = typer.Option(int(os.getenv("WS_FETCH_CONCURRENCY", "4")), help="Parallel requests"),
+    rate: float = typer.Option(float(os.getenv("WS_FETCH_RATE", "4")), help="Max requests per second (0 = unlimited)"),
+    retries: int = typer.Option(3, help="Retries per request on connection errors / 429 / 5xx"),
+    backoff: float = typer.Option(0.5, help="Base backoff seconds (doubles per retry)"),
+    include_today: bool = typer.Option(False, help="Also fetch today (actuals usually incomplete)"),
+):
+    """Backfill actuals for a date range: concurrent fetches, one fact_actuals transaction."""
+    s, e = _parse_day(start), _parse_day(end)
+    if pd.isna(s) or pd.isna(e) or s > e:
+        raise typer.BadParameter(f"Invalid range: start='{start}' end='{end}'")
+    days = list(pd.date_range(s.normalize(), e.normalize(), freq="D"))
+    today = pd.Timestamp.now("UTC").tz_localize(None).normalize()
+    if not include_today and today in days:
+        typer.echo(f"Skipping today ({today.date()}); actuals not finalized yet.")
+        days.remove(today)
+    if not days:
+        typer.echo("Nothing to fetch.")
+        return
+
+    _, failed = ingest_days(days, concurrency=concurrency, rate=rate, retries=retries, backoff=backoff)
+    if failed:
+        typer.echo("Failed dates: " + ", ".join(str(d.date()) for d in failed))
+        raise typer.Exit(code=1)
 
 if __name__ == "__main__":
     app()
@@ -0,0 +1,44 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+import pandas as pd
+from .sportsdata import SportsDataClient, STATS_BY_DATE
+
+# Concurrent, rate-limited fetching of PlayerGameStatsByDate for date ranges.
+# Workers share one SportsDataClient: one keep-alive pool sized to the worker
+# count, one token bucket, and its retry/backoff policy.
+
+
+def fetch_actuals_range(dates: Iterable[pd.Timestamp], *, concurrency: int = 4, rate: float = 4.0,
+                        retries: int = 3, backoff: float = 0.5, timeout: float = 30,
+                        base: str | None = None, key: str | None = None,
+                        client: SportsDataClient | None = None,
+                        decode: Callable[[bytes], Any] | None = None) -> dict[pd.Timestamp, Any]:
+    """Fetch many dates concurrently. Returns {date: records} with the exception for failed dates.
+
+    With `decode`, each raw body is decoded in the worker (e.g. json_arrow.decode_table)
+    and its result is returned instead of the parsed record list.
+    """
+    dates = [pd.Timestamp(d).normalize() for d in dates]
+    own = client is None
+    if own:
+        client = SportsDataClient(base=base, key=key, timeout=timeout, pool_size=max(1, concurrency),
+                                  rate=rate, retries=retries, backoff=backoff)
+    if not client.key:
+        raise RuntimeError("SPORTS_DATA_API_KEY missing!")
+
+    def one(d: pd.Timestamp):
+        try:
+            if decode is None:
+                return d, client.player_game_stats(d)
+            return d, decode(client.get_by_date_raw(STATS_BY_DATE, d))
+        except Exception as e:
+            return d, e
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            return dict(pool.map(one, dates))
+    finally:
+        if own:
+            print(client.metrics_summary())
+            client.close()
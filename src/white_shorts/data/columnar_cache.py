@@ -0,0 +1,120 @@
+from __future__ import annotations
+import os, json, hashlib
+from pathlib import Path
+from typing import Callable
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except Exception:
+    pa = None
+
+# Typed columnar cache for CSV loaders.
+#
+# A loader's *output* (after string casts, id cleaning and date parsing) is written
+# once as an uncompressed Arrow IPC file and served from a memory map afterwards.
+# Entries are keyed on the CSV's resolved path, size, mtime and content hash plus a
+# loader tag, so any edit to the CSV — or a change to the loader — rebuilds the entry.
+# size+mtime are checked first; the content hash is only recomputed when they move
+# (e.g. a `touch` or a checkout), which keeps warm loads from re-reading the CSV.
+
+CACHE_DIR = os.getenv("WS_CACHE_DIR", "data/cache")
+
+def cache_enabled() -> bool:
+    return pa is not None and os.getenv("WS_CSV_CACHE", "1") not in ("0", "false", "no")
+
+def content_hash(path: str | Path, chunk: int = 1 << 20) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _entry_paths(src: Path, tag: str, cache_dir: Path) -> tuple[Path, Path]:
+    key = hashlib.sha1(f"{src}|{tag}".encode("utf-8")).hexdigest()[:12]
+    stem = f"{src.stem}.{tag}.{key}"
+    return cache_dir / f"{stem}.arrow", cache_dir / f"{stem}.json"
+
+def _read_arrow(path: Path) -> pd.DataFrame:
+    with pa.memory_map(str(path), "r") as source:
+        table = pa_ipc.open_file(source).read_all()
+        df = table.to_pandas()
+    # numeric blocks come back consolidated (writable); only a column left as a
+    # read-only view of the map is copied, since callers mutate frames in place
+    for c in df.columns:
+        v = df[c].to_numpy(copy=False)
+        if isinstance(v, np.ndarray) and not v.flags.writeable:
+            df[c] = v.copy()
+    return df
+
+def _write_arrow(df: pd.DataFrame, path: Path) -> None:
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    tmp = path.with_suffix(".arrow.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa_ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+def cached_load(csv_path: str | Path, loader: Callable[[str | Path], pd.DataFrame], tag: str,
+                cache_dir: str | Path | None = None) -> pd.DataFrame:
+    """Return loader(csv_path), served from the columnar cache when the CSV is unchanged."""
+    if not cache_enabled():
+        return loader(csv_path)
+    src = Path(csv_path).resolve()
+    st = src.stat()
+    cdir = Path(cache_dir or CACHE_DIR)
+    data_path, meta_path = _entry_paths(src, tag, cdir)
+
+    meta = None
+    if meta_path.exists() and data_path.exists():
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except Exception:
+            meta = None
+
+    if meta is not None:
+        if meta.get("size") == st.st_size and meta.get("mtime_ns") == st.st_mtime_ns:
+            return _read_arrow(data_path)
+        if meta.get("size") == st.st_size:
+            digest = content_hash(src)
+            if meta.get("sha") == digest:
+                # same bytes, new mtime: refresh the stat key and serve the entry
+                meta["mtime_ns"] = st.st_mtime_ns
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump(meta, f, indent=2)
+                return _read_arrow(data_path)
+
+    df = loader(csv_path)
+    cdir.mkdir(parents=True, exist_ok=True)
+    try:
+        _write_arrow(df, data_path)
+        meta = {
+            "source": str(src),
+            "tag": tag,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha": content_hash(src),
+            "rows": int(len(df)),
+            "created_ts": pd.Timestamp.utcnow().isoformat(),
+        }
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+    except Exception as e:
+        print(f"[warn] failed to write columnar cache for {src}: {e}")
+    return df
+
+def clear(csv_path: str | Path | None = None, cache_dir: str | Path | None = None) -> int:
+    """Drop cache entries (all, or only those built from `csv_path`). Returns files removed."""
+    cdir = Path(cache_dir or CACHE_DIR)
+    if not cdir.exists():
+        return 0
+    pattern = f"{Path(csv_path).stem}.*" if csv_path else "*"
+    n = 0
+    for p in cdir.glob(pattern):
+        if p.suffix in (".arrow", ".json", ".tmp"):
+            p.unlink()
+            n += 1
+    return n
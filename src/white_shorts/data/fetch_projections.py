@@ -1,67 +1,49 @@
 ﻿from __future__ import annotations
 import os
-from sys import api_version
 import pandas as pd
-import requests
 import typer
+from .sportsdata import SportsDataClient, get_client
 
 
-API_KEY = os.getenv("SPORTSDATA_API_KEY", "")
+# legacy name kept working alongside SPORTS_DATA_API_KEY
+API_KEY = os.getenv("SPORTS_DATA_API_KEY") or os.getenv("SPORTSDATA_API_KEY", "")
 
-def _fmt_sportsdata_date(date_str: str) -> tuple[str, pd.Timestamp]:
-    import pandas as pd
+def _fmt_sportsdata_date(date_str: str) -> pd.Timestamp:
     typer.echo(f"raw date - pre API prep: {date_str}")
     d = pd.to_datetime(date_str, dayfirst=True, errors="coerce")
     if pd.isna(d):
         raise ValueError(f"Unparseable date: {date_str}")
-    # SportsData wants e.g. 2025-Oct-15
-    mon = d.strftime("%b")  # Oct
-    typer.echo(f"formated month (for API) part: {mon}")
-    api_token = f"{d.year}-{mon}-{d.day:02d}"
-    typer.echo(f"formated final date string for API: {api_token} and normalised: {d.normalize()}")
-    return api_token, d.normalize()
-
-
-
-def _get(url: str) -> list[dict]:
-    headers = {"Ocp-Apim-Subscription-Key": API_KEY} if API_KEY else {}
-    r = requests.get(url, headers=headers, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    return d.normalize()
 
 def fetch_player_projections_by_date(date_str: str) -> pd.DataFrame:
-    api_token, slate_dt = _fmt_sportsdata_date(date_str)
-    url = f"{base}/api/nhl/fantasy/json/PlayerGameStatsByDate/{api_token}?key={api_key}"
+    cols = ["date","game_id","team","opponent","player_id","name"]
     if not API_KEY:
-        return pd.DataFrame(columns=["date","game_id","team","opponent","player_id","name"])
-    base = "https://api.sportsdata.io/api/nhl"
-    urls = [
-        f"{base}/fantasy/json/PlayerGameProjectionStatsByDate/{date_str}",
-        f"{base}/fantasy/json/PlayerGameStatsByDate/{date_str}",
-    ]
+        return pd.DataFrame(columns=cols)
+    slate_dt = _fmt_sportsdata_date(date_str)
+    client = get_client() if get_client().key else SportsDataClient(key=API_KEY)
     data = None
-    for u in urls:
+    for fetch in (client.player_game_projections, client.player_game_stats):
         try:
-            data = _get(u)
-            if data is not None:
+            data = fetch(slate_dt)
+            if data:
                 break
         except Exception:
             continue
     if not data:
-        return pd.DataFrame(columns=["date","game_id","team","opponent","player_id","name"])
+        return pd.DataFrame(columns=cols)
     rows = []
-    for d in data:
+    for rec in data:
         rows.append({
-            "date": slate_dt, # f"{slate_dt.year}-{slate_dt.month}-{slate_dt.day:02d}",  # ← force slate date here too
-            "game_id": game_id,
-            "team": team,
-            "opponent": opp,
-            "player_id": pid,
-            "name": name
+            "date": slate_dt,  # ← force slate date
+            "game_id": rec.get("GameID") or rec.get("GameId"),
+            "team": rec.get("Team") or rec.get("TeamAbbreviation"),
+            "opponent": rec.get("Opponent") or rec.get("OpponentAbbreviation"),
+            "player_id": rec.get("PlayerID") or rec.get("PlayerId"),
+            "name": rec.get("Name") or rec.get("ShortName") or rec.get("PlayerName"),
         })
 
 
-    return pd.DataFrame(rows).drop_duplicates()
+    return pd.DataFrame(rows, columns=cols).drop_duplicates()
 
 def naive_projections_from_recent(recent_df: pd.DataFrame) -> pd.DataFrame:
     if recent_df.empty:
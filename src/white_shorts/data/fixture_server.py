@@ -0,0 +1,252 @@
+from __future__ import annotations
+import copy, json, random, re, threading, time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import pandas as pd
+from .sportsdata import DATE_FORMATS, PROJECTIONS_BY_DATE, STATS_BY_DATE, RateLimiter
+from .synthetic import SyntheticLeague, projection_records, stats_records
+
+# Local stand-in for the SportsData NHL by-date endpoints.
+#
+# Serves GET /api/nhl/fantasy/json/{PlayerGameStatsByDate|PlayerGameProjectionStatsByDate}/{date}
+# the way api.sportsdata.io does (key query parameter, '2025-OCT-07' date tokens,
+# [] for days without games), so every fetch path can run against it by pointing
+# SPORTS_DATA_BASE at the server. Responses come from, in order of precedence:
+#   fixture dirs   <dir>/<endpoint>/<YYYY-MM-DD>.json (bench synth / fixtures record)
+#   http caches    a WS_HTTP_CACHE_DIR recorded by earlier live runs
+#   synthetic      a SyntheticLeague generated at startup (data/synthetic.py):
+#                  stats for every played day, projections for played and future days
+# Faults are injected per request: latency (+ jitter), a random error rate, and a
+# per-key token-bucket rate limit answering 429 + Retry-After. GET /__stats
+# returns request counts by endpoint and status, bytes and latency.
+
+_ROUTE = re.compile(r"^/api/nhl/fantasy/json/(\w+)/([^/]+)$")
+ENDPOINTS = (STATS_BY_DATE, PROJECTIONS_BY_DATE)
+
+
+def parse_token(token: str, strict: bool = False) -> pd.Timestamp | None:
+    """Date token as the API accepts it ('2025-OCT-07'; also '2025-10-07' unless strict)."""
+    for fmt in DATE_FORMATS[:1] if strict else DATE_FORMATS:
+        try:
+            return pd.Timestamp(datetime.strptime(token, fmt))
+        except ValueError:
+            continue
+    return None
+
+
+class FixtureStore:
+    """(endpoint, date) -> response body, from fixture dirs, recorded http caches and/or a synthetic league."""
+
+    def __init__(self):
+        self._files: dict[tuple[str, str], Path] = {}
+        self._bodies: dict[tuple[str, str], bytes] = {}
+        self._lock = threading.Lock()
+        self._league: SyntheticLeague | None = None
+        self._days: dict[str, pd.DataFrame] = {}
+        self._last: pd.Timestamp | None = None
+        self._seed = 0
+
+    def add_dir(self, root: str | Path) -> int:
+        """Fixture files <root>/<endpoint>/<YYYY-MM-DD>.json. Returns the number of responses added."""
+        n = 0
+        for ep in ENDPOINTS:
+            for f in sorted(Path(root, ep).glob("*.json")):
+                self._files.setdefault((ep, f.stem), f)
+                n += 1
+        return n
+
+    def add_http_cache(self, root: str | Path) -> int:
+        """Responses recorded in an http_cache directory (index/<endpoint>-<scope>/<date>.json -> objects/)."""
+        n = 0
+        for idx in sorted(Path(root, "index").glob("*/*.json")):
+            try:
+                meta = json.loads(idx.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            obj = Path(root, "objects", meta.get("sha", "")[:2], f"{meta.get('sha')}.json")
+            if meta.get("endpoint") in ENDPOINTS and obj.exists():
+                self._files.setdefault((meta["endpoint"], meta["date"]), obj)
+                n += 1
+        return n
+
+    def add_synthetic(self, seasons: int = 1, end: str | pd.Timestamp | None = None, seed: int = 7) -> int:
+        """Generate `seasons` of league history ending on `end`; returns the number of game days."""
+        self._league, self._seed = SyntheticLeague(seed=seed), seed
+        hist = self._league.history(seasons, end)
+        self._days = {f"{d:%Y-%m-%d}": g for d, g in hist.groupby("date")}
+        self._last = hist["date"].max()
+        return len(self._days)
+
+    def dates(self, endpoint: str) -> list[str]:
+        days = {d for ep, d in self._files if ep == endpoint} | set(self._days)
+        return sorted(days)
+
+    def body(self, endpoint: str, d: pd.Timestamp) -> bytes:
+        key = (endpoint, f"{d:%Y-%m-%d}")
+        with self._lock:
+            hit = self._bodies.get(key)
+        if hit is not None:
+            return hit
+        body = self._load(endpoint, d, key)
+        with self._lock:
+            self._bodies[key] = body
+        return body
+
+    def _load(self, endpoint: str, d: pd.Timestamp, key: tuple[str, str]) -> bytes:
+        if key in self._files:
+            return self._files[key].read_bytes()
+        if self._league is None:
+            return b"[]"
+        day = self._days.get(key[1])
+        if endpoint == STATS_BY_DATE:
+            return json.dumps(stats_records(day)).encode() if day is not None else b"[]"
+        if day is not None:
+            return json.dumps(projection_records(day)).encode()
+        if d <= self._last:
+            return b"[]"                         # an off day inside the generated history
+        # a future night: rosters as of the end of the history, matchups seeded by the date
+        league = copy.copy(self._league)
+        league.rng = np.random.default_rng([self._seed, d.toordinal()])
+        return json.dumps(projection_records(league.slate(d))).encode()
+
+
+@dataclass
+class Faults:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0            # fraction of requests answered with error_status
+    error_status: int = 503
+    rate_limit: float = 0.0            # requests per second per API key (0 = unlimited)
+    burst: int = 1
+    retry_after: float = 1.0           # Retry-After seconds on 429
+    seed: int = 0
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, store: FixtureStore, faults: Faults | None = None, host: str = "127.0.0.1", port: int = 0,
+                 key: str | None = None, strict_dates: bool = False, verbose: bool = False):
+        super().__init__((host, port), _Handler)
+        self.store, self.faults = store, faults or Faults()
+        self.key, self.strict_dates, self.verbose = key, strict_dates, verbose
+        self._rng = random.Random(self.faults.seed)
+        self._limiters: dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict] = defaultdict(lambda: {"requests": 0, "bytes": 0, "total_s": 0.0,
+                                                           "max_s": 0.0, "status": defaultdict(int)})
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FixtureServer":
+        """Serve from a background thread (in-process load tests); stop with shutdown()."""
+        self._thread = threading.Thread(target=self.serve_forever, name="fixture-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self) -> None:
+        super().shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+
+    def random(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def latency(self) -> float:
+        f = self.faults
+        if f.latency_ms <= 0 and f.jitter_ms <= 0:
+            return 0.0
+        with self._lock:
+            return max(0.0, self._rng.gauss(f.latency_ms, f.jitter_ms)) / 1000.0
+
+    def limited(self, key: str) -> bool:
+        if self.faults.rate_limit <= 0:
+            return False
+        with self._lock:
+            lim = self._limiters.get(key)
+            if lim is None:
+                lim = self._limiters[key] = RateLimiter(self.faults.rate_limit, self.faults.burst)
+        return not lim.try_acquire()
+
+    def record(self, endpoint: str, status: int, nbytes: int, seconds: float) -> None:
+        with self._lock:
+            s = self._stats[endpoint]
+            s["requests"] += 1
+            s["bytes"] += nbytes
+            s["total_s"] += seconds
+            s["max_s"] = max(s["max_s"], seconds)
+            s["status"][str(status)] += 1
+
+    def stats(self) -> dict[str, dict]:
+        with self._lock:
+            return {ep: dict(s, status=dict(s["status"]), mean_s=s["total_s"] / s["requests"] if s["requests"] else 0.0)
+                    for ep, s in self._stats.items()}
+
+    def stats_summary(self) -> str:
+        parts = [f"{ep}: {s['requests']} req ({', '.join(f'{k}x{v}' for k, v in sorted(s['status'].items()))}), "
+                 f"mean {s['mean_s'] * 1000:.0f} ms, {s['bytes'] / 1e6:.1f} MB"
+                 for ep, s in sorted(self.stats().items())]
+        return "fixture server: " + ("; ".join(parts) if parts else "no requests")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FixtureServer
+    protocol_version = "HTTP/1.1"            # keep-alive, like the real API behind the client's pool
+
+    def do_GET(self) -> None:
+        t0 = time.perf_counter()
+        url = urlsplit(self.path)
+        if url.path == "/__stats":
+            return self._send(200, json.dumps(self.server.stats()).encode(), None, t0)
+        m = _ROUTE.match(url.path)
+        if m is None or m.group(1) not in ENDPOINTS:
+            return self._send(404, b'{"HttpStatusCode":404,"Description":"Not found"}', m and m.group(1), t0)
+        endpoint, token = m.groups()
+        key = (parse_qs(url.query).get("key") or [""])[0]
+        srv, f = self.server, self.server.faults
+        if not key or (srv.key is not None and key != srv.key):
+            return self._send(401, b'{"HttpStatusCode":401,"Code":1,"Description":"Access denied due to '
+                                   b'missing or invalid subscription key."}', endpoint, t0)
+        if srv.limited(key):
+            return self._send(429, b'{"HttpStatusCode":429,"Description":"Rate limit exceeded."}', endpoint, t0,
+                              {"Retry-After": f"{f.retry_after:g}"})
+        delay = srv.latency()
+        if delay:
+            time.sleep(delay)
+        if f.error_rate > 0 and srv.random() < f.error_rate:
+            return self._send(f.error_status, b'{"HttpStatusCode":%d,"Description":"Injected error"}' % f.error_status,
+                              endpoint, t0)
+        d = parse_token(token, srv.strict_dates)
+        if d is None:
+            return self._send(404, b'{"HttpStatusCode":404,"Description":"Invalid date"}', endpoint, t0)
+        self._send(200, srv.store.body(endpoint, d), endpoint, t0)
+
+    def _send(self, status: int, body: bytes, endpoint: str | None, t0: float, headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+        if endpoint is not None:
+            self.server.record(endpoint, status, len(body), time.perf_counter() - t0)
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
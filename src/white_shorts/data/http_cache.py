@@ -0,0 +1,163 @@
+from __future__ import annotations
+import os, json, time, uuid, hashlib, threading
+from pathlib import Path
+from typing import Any, Callable
+import pandas as pd
+
+# On-disk response cache for SportsData endpoints.
+#
+# Bodies are stored content-addressed (objects/<sha[:2]>/<sha>.json); a small index
+# entry per (base, endpoint, date) points at the body and records when it was
+# fetched. Dates at least WS_HTTP_CACHE_FINAL_DAYS old are final and never
+# refetched; newer dates are served for WS_HTTP_CACHE_TTL seconds. With
+# WS_HTTP_OFFLINE=1 any cached entry is served and a miss raises OfflineCacheMiss
+# instead of touching the network. Keys use the calendar date, not the URL token,
+# so the '%Y-%b-%d' / '%Y-%m-%d' probing in the fetchers shares one entry.
+
+HTTP_CACHE_DIR = os.getenv("WS_HTTP_CACHE_DIR", "data/cache/http")
+TTL_SECONDS = float(os.getenv("WS_HTTP_CACHE_TTL", "900"))
+FINAL_AFTER_DAYS = int(os.getenv("WS_HTTP_CACHE_FINAL_DAYS", "2"))
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "expired": 0, "stores": 0, "offline_misses": 0}
+
+
+class OfflineCacheMiss(RuntimeError):
+    """Raised in offline mode when a response is not in the cache."""
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() not in ("0", "false", "no", "")
+
+def enabled() -> bool:
+    return _flag("WS_HTTP_CACHE", "1")
+
+def offline() -> bool:
+    return _flag("WS_HTTP_OFFLINE", "0")
+
+def _bump(key: str) -> None:
+    with _lock:
+        _stats[key] += 1
+
+def stats() -> dict[str, int]:
+    with _lock:
+        return dict(_stats)
+
+def reset_stats() -> None:
+    with _lock:
+        for k in _stats:
+            _stats[k] = 0
+
+def summary() -> str:
+    s = stats()
+    return (f"http cache: {s['hits']} hit / {s['misses']} miss / {s['expired']} expired"
+            + (f" / {s['offline_misses']} offline miss" if s["offline_misses"] else ""))
+
+def is_final(d: pd.Timestamp) -> bool:
+    """Past dates old enough that their stats can no longer change."""
+    today = pd.Timestamp.now("UTC").tz_localize(None).normalize()
+    return (today - pd.Timestamp(d).normalize()).days >= FINAL_AFTER_DAYS
+
+
+def _index_path(root: Path, base: str, endpoint: str, d: pd.Timestamp) -> Path:
+    scope = hashlib.sha1(f"{base}|{endpoint}".encode("utf-8")).hexdigest()[:8]
+    return root / "index" / f"{endpoint}-{scope}" / f"{pd.Timestamp(d).strftime('%Y-%m-%d')}.json"
+
+def _object_path(root: Path, sha: str) -> Path:
+    return root / "objects" / sha[:2] / f"{sha}.json"
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _read_entry(root: Path, idx: Path) -> tuple[dict, bytes] | None:
+    try:
+        with open(idx, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(_object_path(root, meta["sha"]), "rb") as f:
+            return meta, f.read()
+    except (OSError, ValueError, KeyError):
+        return None
+
+def store(endpoint: str, d: pd.Timestamp, body: bytes, base: str | None = None,
+          cache_dir: str | Path | None = None) -> str:
+    """Write the raw response `body` for (endpoint, date). Returns the body hash."""
+    root = Path(cache_dir or HTTP_CACHE_DIR)
+    base = base or os.getenv("SPORTS_DATA_BASE", "https://api.sportsdata.io")
+    sha = hashlib.sha256(body).hexdigest()
+    obj = _object_path(root, sha)
+    if not obj.exists():
+        _atomic_write(obj, body)
+    meta = {"endpoint": endpoint, "date": pd.Timestamp(d).strftime("%Y-%m-%d"), "sha": sha,
+            "fetched_at": time.time(), "final": is_final(d)}
+    _atomic_write(_index_path(root, base, endpoint, d), json.dumps(meta, indent=2).encode("utf-8"))
+    _bump("stores")
+    return sha
+
+def cached_bytes(endpoint: str, d: pd.Timestamp, fetch: Callable[[], bytes | None], base: str | None = None,
+                 cache_dir: str | Path | None = None) -> bytes | None:
+    """Return the cached raw body for (endpoint, date), calling `fetch()` on a miss.
+
+    `fetch` returns the response body, or None for "nothing usable" (not cached).
+    """
+    if not enabled() and not offline():
+        return fetch()
+    root = Path(cache_dir or HTTP_CACHE_DIR)
+    base = base or os.getenv("SPORTS_DATA_BASE", "https://api.sportsdata.io")
+    entry = _read_entry(root, _index_path(root, base, endpoint, d))
+
+    if entry is not None:
+        meta, body = entry
+        # only bodies fetched after the date was final are immutable
+        fresh = meta.get("final") or (time.time() - float(meta.get("fetched_at", 0))) < TTL_SECONDS
+        if fresh or offline():
+            _bump("hits")
+            return body
+        _bump("expired")
+    elif offline():
+        _bump("offline_misses")
+        raise OfflineCacheMiss(f"{endpoint} {pd.Timestamp(d).date()} not cached (WS_HTTP_OFFLINE=1)")
+    else:
+        _bump("misses")
+
+    body = fetch()
+    if body is not None:
+        try:
+            store(endpoint, d, body, base=base, cache_dir=root)
+        except OSError as e:
+            print(f"[warn] failed to write http cache for {endpoint} {pd.Timestamp(d).date()}: {e}")
+    return body
+
+def cached_json(endpoint: str, d: pd.Timestamp, fetch: Callable[[], Any], base: str | None = None,
+                cache_dir: str | Path | None = None) -> Any:
+    """cached_bytes for fetchers that return parsed JSON (None = not cached)."""
+    def fetch_body():
+        data = fetch()
+        return None if data is None else json.dumps(data, separators=(",", ":")).encode("utf-8")
+    body = cached_bytes(endpoint, d, fetch_body, base=base, cache_dir=cache_dir)
+    return None if body is None else json.loads(body)
+
+def clear(endpoint: str | None = None, cache_dir: str | Path | None = None) -> int:
+    """Drop index entries (all, or one endpoint) and unreferenced bodies. Returns files removed."""
+    root = Path(cache_dir or HTTP_CACHE_DIR)
+    if not root.exists():
+        return 0
+    n = 0
+    for p in (root / "index").glob(f"{endpoint or '*'}-*/*.json"):
+        p.unlink()
+        n += 1
+    live = set()
+    for p in (root / "index").glob("*/*.json"):
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                live.add(json.load(f)["sha"])
+        except (OSError, ValueError, KeyError):
+            continue
+    for p in (root / "objects").glob("*/*.json"):
+        if p.stem not in live:
+            p.unlink()
+            n += 1
+    return n
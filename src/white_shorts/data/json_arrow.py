@@ -0,0 +1,96 @@
+from __future__ import annotations
+import json, re
+from typing import Any, Iterable, Iterator
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except Exception:
+    pa = None
+
+# Streaming JSON -> typed Arrow columns for SportsData payloads.
+#
+# A full-slate response is a JSON array of ~100-field records of which we keep a
+# dozen. Instead of json.loads() materializing every record (and then a second
+# round of per-row dicts), the array is decoded one element at a time and only
+# the requested fields are appended to per-column buffers; each record dict is
+# dropped as soon as its fields are copied. Columns are then built as typed Arrow
+# arrays in one call each, and date columns are parsed with vectorized strptime.
+
+_WS = re.compile(r"[\s,]*")
+
+# Column spec: output name -> (source keys tried in order, like `a or b`, Arrow type name)
+Spec = dict[str, tuple[tuple[str, ...], str]]
+
+
+def iter_records(body: bytes | str) -> Iterator[dict]:
+    """Yield the records of a JSON array body one at a time ({results|data: [...]} bodies are unwrapped)."""
+    text = body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body
+    i = _WS.match(text, 0).end()
+    if i >= len(text):
+        return
+    if text[i] != "[":
+        obj = json.loads(text)
+        if isinstance(obj, dict):
+            obj = obj.get("results") or obj.get("data") or []
+        yield from (obj or [])
+        return
+    dec = json.JSONDecoder()
+    i += 1
+    n = len(text)
+    while True:
+        i = _WS.match(text, i).end()
+        if i >= n or text[i] == "]":
+            return
+        rec, i = dec.raw_decode(text, i)
+        yield rec
+
+
+def _pick(rec: dict, keys: tuple[str, ...]) -> Any:
+    v = None
+    for k in keys:
+        v = rec.get(k)
+        if v:
+            break
+    return v
+
+
+def _array(values: list, kind: str) -> "pa.Array":
+    if kind == "string":
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+    if kind in ("int64", "float64"):
+        try:
+            return pa.array(values, type=pa.float64()).cast(pa.int64() if kind == "int64" else pa.float64())
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            num = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+            if kind == "int64":
+                return pa.array(num.round().astype("Int64"), type=pa.int64(), from_pandas=True)
+            return pa.array(num.astype(float), type=pa.float64(), from_pandas=True)
+    if kind == "date":
+        return parse_dates(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+    raise ValueError(f"unknown column kind: {kind}")
+
+
+def parse_dates(arr: "pa.Array") -> "pa.Array":
+    """'YYYY-MM-DDTHH:MM:SS' or 'YYYY-MM-DD' strings -> timestamp[ns] floored to the day (null if neither)."""
+    full = pc.strptime(arr, format="%Y-%m-%dT%H:%M:%S", unit="ns", error_is_null=True)
+    day = pc.strptime(arr, format="%Y-%m-%d", unit="ns", error_is_null=True)
+    return pc.floor_temporal(pc.coalesce(full, day), unit="day")
+
+
+def records_to_table(records: Iterable[dict], spec: Spec) -> "pa.Table":
+    """Build a typed Arrow table with one column per spec entry."""
+    if pa is None:
+        raise RuntimeError("pyarrow not installed; cannot build Arrow columns")
+    cols: dict[str, list] = {name: [] for name in spec}
+    keys = [(cols[name], src) for name, (src, _) in spec.items()]
+    for rec in records:
+        for buf, src in keys:
+            buf.append(_pick(rec, src))
+    return pa.table({name: _array(cols[name], kind) for name, (_, kind) in spec.items()})
+
+
+def decode_table(body: bytes | str, spec: Spec) -> "pa.Table":
+    """Stream-decode a JSON array body straight into a typed Arrow table."""
+    return records_to_table(iter_records(body), spec)
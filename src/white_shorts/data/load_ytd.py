@@ -2,8 +2,10 @@ from __future__ import annotations
 import pandas as pd
 from pathlib import Path
 from ..utils.validation import REQUIRED_YTD_COLUMNS, ensure_columns
+from .columnar_cache import cached_load
+from ..utils.trace import traced
 
-def load_ytd(csv_path: str | Path) -> pd.DataFrame:
+def _read_ytd_csv(csv_path: str | Path) -> pd.DataFrame:
     df = pd.read_csv(csv_path)
     ensure_columns(df, REQUIRED_YTD_COLUMNS)
 
@@ -24,3 +26,10 @@ def load_ytd(csv_path: str | Path) -> pd.DataFrame:
         pd.to_numeric(df["home_or_away"], errors="coerce").fillna(0).clip(0,1).astype(int)
     )
     return df
+
+@traced
+def load_ytd(csv_path: str | Path, use_cache: bool = True) -> pd.DataFrame:
+    # Typed result is cached as Arrow under WS_CACHE_DIR; bump the tag if _read_ytd_csv changes
+    if use_cache:
+        return cached_load(csv_path, _read_ytd_csv, tag="load_ytd-v1")
+    return _read_ytd_csv(csv_path)
@@ -1,8 +1,15 @@
 from __future__ import annotations
+import click
 import duckdb
+import functools
+import typer
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator
 import pandas as pd
+import pyarrow as pa
 from ..config import settings
+from ..utils.trace import span, traced
 
 PRED_COLS = [
     "target", "date", "game_id", "team", "opponent",
@@ -21,20 +28,18 @@ def _connect() -> duckdb.DuckDBPyConnection:
     Path(settings.PARQUET_DIR).mkdir(parents=True, exist_ok=True)
     return duckdb.connect(settings.DUCKDB_PATH)
 
-def _sanitize_for_duckdb(df: pd.DataFrame) -> pd.DataFrame:
-    out = df.copy()
-    # date as DATE
-    if "date" in out.columns:
-        out["date"] = pd.to_datetime(out["date"], errors="coerce").dt.date
-    # created_ts as tz-naive TIMESTAMP
-    if "created_ts" in out.columns:
-        out["created_ts"] = pd.to_datetime(out["created_ts"], errors="coerce")
-        if pd.api.types.is_datetime64tz_dtype(out["created_ts"]):
-            out["created_ts"] = out["created_ts"].dt.tz_convert("UTC").dt.tz_localize(None)
-    return out
-
 def init_db() -> None:
+    if _active is not None:
+        _init_tables(_active.con)
+        _active.manager.invalidate()
+        return
     con = _connect()
+    try:
+        _init_tables(con)
+    finally:
+        con.close()
+
+def _init_tables(con: duckdb.DuckDBPyConnection) -> None:
     con.execute("""
         CREATE TABLE IF NOT EXISTS fact_predictions AS SELECT * FROM (
             SELECT
@@ -70,39 +75,198 @@ def init_db() -> None:
                 TIMESTAMP '1970-01-01 00:00:00' AS created_ts
         ) WHERE 1=0;
     """)
-    con.close()
-
-def _ordered_cols_for_table(con: duckdb.DuckDBPyConnection, table: str) -> list[str]:
-    # Read schema in defined order; PRAGMA table_info returns rows with 'cid'
-    info = con.execute(f"PRAGMA table_info('{table}')").fetchdf()
-    return info.sort_values("cid")["name"].tolist()
-
-def _align_df_to_table(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
-    out = df.copy()
-    # ensure all expected cols exist (fill with NA/empty)
-    for c in cols:
-        if c not in out.columns:
-            out[c] = pd.NA
-    # drop any extras not in table
-    out = out[cols]
-    return out
 
-def append(table: str, df: pd.DataFrame) -> None:
-    if df.empty:
+# ---------- long-lived connection + buffered writer ----------
+#
+# A run opens one DuckDBManager (one connection, table schemas read once and
+# cached) and writes through a BufferedWriter: frames passed to append() are
+# converted column-by-column to Arrow, cast to the table's types and buffered;
+# flush() concatenates each table's buffer and inserts it with a single
+# INSERT ... BY NAME. Use `with persist.session() as db:` for a whole CLI run;
+# the module-level append() writes through the active session when there is one
+# and otherwise falls back to a one-shot connection.
+
+_ARROW_TYPES = {
+    "VARCHAR": pa.string(), "DOUBLE": pa.float64(), "FLOAT": pa.float32(), "BIGINT": pa.int64(),
+    "INTEGER": pa.int32(), "BOOLEAN": pa.bool_(), "DATE": pa.date32(), "TIMESTAMP": pa.timestamp("us"),
+}
+
+
+class DuckDBManager:
+    """One DuckDB connection for a run, with cached table schemas."""
+
+    def __init__(self, path: str | None = None):
+        self.path = path or settings.DUCKDB_PATH
+        self._con: duckdb.DuckDBPyConnection | None = None
+        self._schemas: dict[str, list[tuple[str, str]]] = {}
+
+    @property
+    def con(self) -> duckdb.DuckDBPyConnection:
+        if self._con is None:
+            if self.path == settings.DUCKDB_PATH:
+                self._con = _connect()
+            else:
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                self._con = duckdb.connect(self.path)
+        return self._con
+
+    def schema(self, table: str) -> list[tuple[str, str]]:
+        """[(column, DuckDB type)] in table order; read once per table per run."""
+        if table not in self._schemas:
+            rows = self.con.execute(
+                "SELECT column_name, data_type FROM information_schema.columns "
+                "WHERE table_name = ? ORDER BY ordinal_position", [table]).fetchall()
+            if not rows:
+                raise ValueError(f"table {table} does not exist")
+            self._schemas[table] = rows
+        return self._schemas[table]
+
+    def invalidate(self, table: str | None = None) -> None:
+        """Forget cached schemas (after DDL)."""
+        if table is None:
+            self._schemas.clear()
+        else:
+            self._schemas.pop(table, None)
+
+    def close(self) -> None:
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+
+
+def _arrow_column(s: pd.Series, name: str, typ: pa.DataType) -> pa.Array:
+    if name == "date" or typ == pa.date32():
+        s = pd.to_datetime(s, errors="coerce")
+        return pa.array(s.dt.date, type=pa.date32(), from_pandas=True)
+    if name == "created_ts" or pa.types.is_timestamp(typ):
+        s = pd.to_datetime(s, errors="coerce")
+        if isinstance(s.dtype, pd.DatetimeTZDtype):
+            s = s.dt.tz_convert("UTC").dt.tz_localize(None)
+        return pa.array(s, from_pandas=True).cast(typ)
+    try:
+        arr = pa.array(s, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # mixed object column (e.g. ids as int and str): go through strings
+        arr = pa.array(s.map(lambda v: v if pd.isna(v) else str(v)), type=pa.string(), from_pandas=True)
+    return arr if arr.type == typ else arr.cast(typ, safe=False)
+
+
+def to_arrow(df: pd.DataFrame, schema: list[tuple[str, str]]) -> pa.Table:
+    """Arrow table in the table's column order and types; missing columns are null, extras dropped."""
+    n = len(df)
+    cols, names = [], []
+    for name, dtype in schema:
+        typ = _ARROW_TYPES.get(dtype.upper(), pa.string())
+        cols.append(_arrow_column(df[name], name, typ) if name in df.columns else pa.nulls(n, type=typ))
+        names.append(name)
+    return pa.Table.from_arrays(cols, names=names)
+
+
+class BufferedWriter:
+    """Accumulates frames per table and inserts each table's buffer as one Arrow batch."""
+
+    def __init__(self, manager: DuckDBManager, max_rows: int = 250_000):
+        self.manager = manager
+        self.max_rows = max_rows
+        self._buffers: dict[str, list[pa.Table]] = {}
+        self._rows: dict[str, int] = {}
+
+    @property
+    def con(self) -> duckdb.DuckDBPyConnection:
+        return self.manager.con
+
+    def append(self, table: str, df: pd.DataFrame) -> None:
+        if df is None or df.empty:
+            return
+        batch = to_arrow(df, self.manager.schema(table))
+        self._buffers.setdefault(table, []).append(batch)
+        self._rows[table] = self._rows.get(table, 0) + batch.num_rows
+        if self._rows[table] >= self.max_rows:
+            self.flush(table)
+
+    def pending(self) -> dict[str, int]:
+        return dict(self._rows)
+
+    def flush(self, table: str | None = None) -> int:
+        """Insert buffered rows (all tables, or one). Returns rows written."""
+        written = 0
+        for t in ([table] if table else list(self._buffers)):
+            batches = self._buffers.pop(t, [])
+            self._rows.pop(t, None)
+            if not batches:
+                continue
+            data = pa.concat_tables(batches)
+            con = self.con
+            with span("duckdb.insert", rows_in=data.num_rows, table=t) as s:
+                con.register("_ws_batch", data)
+                try:
+                    con.execute(f"INSERT INTO {t} BY NAME SELECT * FROM _ws_batch")
+                finally:
+                    con.unregister("_ws_batch")
+                s.set(rows_out=data.num_rows)
+            written += data.num_rows
+        return written
+
+    def discard(self) -> None:
+        self._buffers.clear()
+        self._rows.clear()
+
+
+_active: BufferedWriter | None = None
+
+# typer.Exit / click's Exit carry an exit code, not a failure: keep what was written
+_CLEAN_EXITS = (click.exceptions.Exit, typer.Exit)
+
+
+@contextmanager
+def session(path: str | None = None, max_rows: int = 250_000) -> Iterator[BufferedWriter]:
+    """One connection + buffered writer for a whole run; flushes on clean exit (incl. typer.Exit), discards on error."""
+    global _active
+    manager = DuckDBManager(path)
+    writer = BufferedWriter(manager, max_rows=max_rows)
+    prev, _active = _active, writer
+    try:
+        yield writer
+        writer.flush()
+    except _CLEAN_EXITS:
+        writer.flush()
+        raise
+    except BaseException:
+        writer.discard()
+        raise
+    finally:
+        _active = prev
+        manager.close()
+
+
+def in_session(fn):
+    """Decorator: run a CLI command inside one persist session."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with session():
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def connection() -> Iterator[duckdb.DuckDBPyConnection]:
+    """The active session's connection, or a one-shot connection outside a session."""
+    if _active is not None:
+        yield _active.con
         return
     con = _connect()
     try:
-        clean = _sanitize_for_duckdb(df)
-        # Determine expected columns from schema
-        table_cols = _ordered_cols_for_table(con, table)
-        # Align DataFrame to table schema order
-        aligned = _align_df_to_table(clean, table_cols)
-
-        con.register("_df", aligned)
-        # Insert BY NAME (no SELECT *): this avoids positional mismatches
-        col_list = ", ".join([f'"{c}"' for c in table_cols])
-        con.execute(f"INSERT INTO {table} ({col_list}) SELECT {col_list} FROM _df")
+        yield con
     finally:
-        try: con.unregister("_df")
-        except: pass
         con.close()
+
+
+@traced("persist.append")
+def append(table: str, df: pd.DataFrame) -> None:
+    if df.empty:
+        return
+    if _active is not None:
+        _active.append(table, df)
+        return
+    with session() as db:
+        db.append(table, df)
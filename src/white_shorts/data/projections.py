@@ -1,11 +1,7 @@
 from __future__ import annotations
-import os, typer
+import typer
 import pandas as pd
-
-try:
-    import requests
-except Exception:
-    requests = None
+from .sportsdata import get_client
 
 def _parse_date(date_str: str) -> pd.Timestamp:
     #try:
@@ -17,13 +13,6 @@ def _parse_date(date_str: str) -> pd.Timestamp:
         raise ValueError(f"Unparseable date: {date_str}")
     return d.normalize()
 
-def _sportsdata_token(d: pd.Timestamp) -> str:
-    mon = d.strftime("%b")
-    typer.echo(f"API Token DATE: {d}")
-    token = f"{d.year}-{mon}-{d.day:02d}"
-    typer.echo(f"API Token: {token}.")
-    return token
-
 def fetch_projections_by_date(date_str: str) -> pd.DataFrame:
     typer.echo(f"fetch_projections_by_date: {date_str}")
     """Authoritative slate from SportsData.io PlayerGameProjectionStatsByDate.
@@ -32,21 +21,12 @@ def fetch_projections_by_date(date_str: str) -> pd.DataFrame:
     Requires env: SPORTS_DATA_API_KEY
     Optional: SPORTS_DATA_BASE
     """
-    if requests is None:
-        raise RuntimeError("requests not installed; cannot fetch projections")
-
-    api_key = os.getenv("SPORTS_DATA_API_KEY")
-    if not api_key:
+    client = get_client()
+    if not client.key:
         raise RuntimeError("SPORTS_DATA_API_KEY is not set")
 
-    base = os.getenv("SPORTS_DATA_BASE", "https://api.sportsdata.io")
     d = _parse_date(date_str)
-    token = _sportsdata_token(d)
-    url = f"{base}/api/nhl/fantasy/json/PlayerGameProjectionStatsByDate/{token}?key={api_key}"
-
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    js = r.json()
+    js = client.player_game_projections(d)
 
     rows = []
     for rec in js:
@@ -63,6 +43,6 @@ def fetch_projections_by_date(date_str: str) -> pd.DataFrame:
             "player_id": None if pid is None else str(pid),
             "name": name,
         })
-    df = pd.DataFrame(rows)
+    df = pd.DataFrame(rows, columns=["date","game_id","team","opponent","player_id","name"])
     df = df.dropna(subset=["player_id","team"]).reset_index(drop=True)
     return df
@@ -0,0 +1,222 @@
+from __future__ import annotations
+import os, json, time, random, threading
+from collections import defaultdict
+import pandas as pd
+from . import http_cache
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except Exception:
+    requests = None
+
+# One HTTP client for SportsData.io.
+#
+# A keep-alive Session with a sized connection pool (so repeated calls reuse the
+# TLS connection), timeouts, optional token-bucket rate limiting, retries with
+# exponential backoff + jitter on connection errors / 429 / 5xx (honouring
+# Retry-After), and per-endpoint latency metrics. By-date endpoints go through
+# http_cache and remember which date-token format the API accepted, so later
+# calls stop probing the other one.
+
+DEFAULT_BASE = "https://api.sportsdata.io"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+DATE_FORMATS = ("%Y-%b-%d", "%Y-%m-%d")  # SportsData NHL usually wants 2025-Oct-07
+
+STATS_BY_DATE = "PlayerGameStatsByDate"
+PROJECTIONS_BY_DATE = "PlayerGameProjectionStatsByDate"
+
+
+class RateLimiter:
+    """Thread-safe token bucket: `rate` acquisitions per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Take a token if one is available (0.0), else return the seconds until one is."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return 0.0
+            return (1.0 - self.tokens) / self.rate
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while (wait := self._take()) > 0:
+            time.sleep(wait)
+
+    def try_acquire(self) -> bool:
+        """Non-blocking acquire: False when the bucket is empty."""
+        return self.rate <= 0 or self._take() == 0.0
+
+
+def _retry_after(resp, default: float) -> float:
+    try:
+        return max(0.0, float(resp.headers.get("Retry-After", default)))
+    except (TypeError, ValueError):
+        return default
+
+
+class SportsDataClient:
+    """Pooled, thread-safe SportsData client (NHL fantasy JSON endpoints)."""
+
+    # date-token format confirmed by any client in this process
+    _date_format: str | None = None
+
+    def __init__(self, base: str | None = None, key: str | None = None, timeout: float = 30,
+                 pool_size: int = 8, rate: float = 0.0, retries: int = 2, backoff: float = 0.5):
+        if requests is None:
+            raise RuntimeError("requests not installed; cannot reach SportsData")
+        self.base = (base or os.getenv("SPORTS_DATA_BASE", DEFAULT_BASE)).rstrip("/")
+        self.key = key if key is not None else os.getenv("SPORTS_DATA_API_KEY", "")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.limiter = RateLimiter(rate, burst=pool_size) if rate > 0 else None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self._metrics: dict[str, dict[str, float]] = defaultdict(
+            lambda: {"requests": 0, "errors": 0, "total_s": 0.0, "max_s": 0.0})
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "SportsDataClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---------- metrics ----------
+    def _record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            m = self._metrics[endpoint]
+            m["requests"] += 1
+            m["errors"] += 0 if ok else 1
+            m["total_s"] += seconds
+            m["max_s"] = max(m["max_s"], seconds)
+
+    def metrics(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            out = {}
+            for ep, m in self._metrics.items():
+                out[ep] = dict(m, mean_s=m["total_s"] / m["requests"] if m["requests"] else 0.0)
+            return out
+
+    def metrics_summary(self) -> str:
+        parts = [f"{ep}: {int(m['requests'])} req, mean {m['mean_s'] * 1000:.0f} ms, max {m['max_s'] * 1000:.0f} ms"
+                 + (f", {int(m['errors'])} err" if m["errors"] else "")
+                 for ep, m in sorted(self.metrics().items())]
+        return "sportsdata: " + ("; ".join(parts) if parts else "no requests")
+
+    # ---------- HTTP ----------
+    def get_raw(self, endpoint: str, path: str) -> bytes | None:
+        """GET {base}/api/nhl/fantasy/json/{endpoint}/{path} -> response body.
+
+        None on 404 (e.g. a rejected date token); raises on any other 4xx and
+        after exhausting retries on 429 / 5xx / connection errors.
+        """
+        if not self.key:
+            raise RuntimeError("SPORTS_DATA_API_KEY missing!")
+        url = f"{self.base}/api/nhl/fantasy/json/{endpoint}/{path}"
+        last_err: Exception | None = None
+        for attempt in range(self.retries + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            wait = self.backoff * (2 ** attempt)
+            t0 = time.perf_counter()
+            try:
+                r = self.session.get(url, params={"key": self.key}, timeout=self.timeout)
+            except requests.RequestException as e:
+                self._record(endpoint, time.perf_counter() - t0, False)
+                # keep the API key (query string) out of logs
+                last_err = RuntimeError(f"{type(e).__name__} for {url}")
+            else:
+                self._record(endpoint, time.perf_counter() - t0, r.status_code == 200)
+                if r.status_code == 200:
+                    return r.content
+                if r.status_code == 404:
+                    return None
+                if r.status_code not in RETRY_STATUS:
+                    raise RuntimeError(f"HTTP {r.status_code} for {url}")
+                last_err = RuntimeError(f"HTTP {r.status_code} for {url}")
+                wait = _retry_after(r, wait)
+            if attempt < self.retries:
+                time.sleep(wait + random.uniform(0, self.backoff))
+        raise last_err or RuntimeError(f"failed: {url}")
+
+    def get_json(self, endpoint: str, path: str):
+        body = self.get_raw(endpoint, path)
+        return None if body is None else json.loads(body)
+
+    def _by_date_uncached(self, endpoint: str, d: pd.Timestamp) -> bytes | None:
+        known = SportsDataClient._date_format
+        formats = [known] + [f for f in DATE_FORMATS if f != known] if known else list(DATE_FORMATS)
+        empty = None
+        for fmt in formats:
+            body = self.get_raw(endpoint, d.strftime(fmt))
+            if body is None:
+                continue
+            if not _is_empty(body) or fmt == known:
+                # a non-empty answer confirms the format; a confirmed format's empty answer is final
+                SportsDataClient._date_format = fmt
+                return body
+            empty = empty or body
+        # only a real (empty) 200 body is worth caching; 404s for every token are not
+        return empty
+
+    def get_by_date_raw(self, endpoint: str, date) -> bytes:
+        """Raw JSON body for a by-date endpoint (cached; b"[]" when the API has nothing for the date)."""
+        d = pd.Timestamp(date).normalize()
+        fetch = lambda: self._by_date_uncached(endpoint, d)
+        return http_cache.cached_bytes(endpoint, d, fetch, base=self.base) or b"[]"
+
+    def get_by_date(self, endpoint: str, date) -> list[dict]:
+        """Records for a by-date endpoint (cached; [] when the API has nothing for the date)."""
+        data = json.loads(self.get_by_date_raw(endpoint, date))
+        if isinstance(data, dict):
+            data = data.get("results") or data.get("data") or []
+        return data or []
+
+    def player_game_stats(self, date) -> list[dict]:
+        return self.get_by_date(STATS_BY_DATE, date)
+
+    def player_game_projections(self, date) -> list[dict]:
+        return self.get_by_date(PROJECTIONS_BY_DATE, date)
+
+
+def _is_empty(body: bytes) -> bool:
+    s = body.strip()
+    if s in (b"", b"[]", b"null"):
+        return True
+    if s[:1] == b"{":
+        try:
+            obj = json.loads(s)
+        except ValueError:
+            return False
+        return not (obj.get("results") or obj.get("data"))
+    return False
+
+
+_default: SportsDataClient | None = None
+_default_lock = threading.Lock()
+
+def get_client() -> SportsDataClient:
+    """Process-wide client built from the SPORTS_DATA_* env vars."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = SportsDataClient()
+        return _default
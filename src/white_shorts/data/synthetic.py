@@ -0,0 +1,263 @@
+from __future__ import annotations
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from ..utils.validation import REQUIRED_YTD_COLUMNS
+
+# Deterministic synthetic NHL data for benchmarks and offline runs.
+#
+# A league of `teams` clubs with persistent rosters (21 skaters + 2 goalies,
+# some turnover between seasons) plays ~`games_per_team` games per team over a
+# 186-day season. Outcomes come from per-player latent rates (shot rate,
+# shooting %, assist weight, ice time) and per-team attack / defence strength,
+# so the rolling features carry signal the way real history does: shots are
+# Poisson, goals Binomial(shots, pct), assists share the team's goals, and the
+# dressed goalie carries the opponent's goals as goal_tending_goals_against.
+# The same (seed, teams, games_per_team) always gives the same rows.
+#
+# history() returns frames in the YTD CSV schema; slate() a day's full rosters
+# in the projections schema; stats_records() / projection_records() the same
+# rows as SportsData PlayerGameStatsByDate / PlayerGameProjectionStatsByDate
+# JSON. write_dataset() lays out a YTD CSV, the current-season Parquet dataset,
+# a slate and per-day API payloads (servable by data/fixture_server.py) under one
+# directory.
+
+TEAMS = ["ANA", "BOS", "BUF", "CAR", "CBJ", "CGY", "CHI", "COL", "DAL", "DET", "EDM", "FLA", "LA", "MIN",
+         "MTL", "NJ", "NSH", "NYI", "NYR", "OTT", "PHI", "PIT", "SEA", "SJ", "STL", "TB", "TOR", "UTA",
+         "VAN", "VGK", "WPG", "WSH"]
+_FIRST = ["Adam", "Brady", "Cale", "Dylan", "Elias", "Filip", "Gabriel", "Jack", "Jesper", "Kirill",
+          "Leon", "Mikko", "Nathan", "Owen", "Quinn", "Roope", "Sidney", "Tage", "Victor", "Zach"]
+_LAST = ["Aho", "Barkov", "Cirelli", "Dahlin", "Eichel", "Forsberg", "Granlund", "Hughes", "Josi", "Kane",
+         "Larkin", "Marner", "Nylander", "Oshie", "Pettersson", "Reinhart", "Stamkos", "Tkachuk", "Vrana",
+         "Werenski", "Zibanejad", "Rantanen", "Point", "Kempe", "Hintz", "Svechnikov", "Thomas", "Suzuki"]
+
+SKATERS, GOALIES, DRESSED = 21, 2, 18
+SEASON_DAYS = 186
+PLAYER_ID0 = 30_000_000
+GAME_ID0 = 20_000
+
+
+def team_codes(n: int) -> list[str]:
+    """NHL abbreviations, suffixed (BOS2, ...) for leagues wider than 32 teams."""
+    return [TEAMS[i % 32] + (str(i // 32 + 1) if i >= 32 else "") for i in range(n)]
+
+
+def player_name(pid: int) -> str:
+    i = int(pid) - PLAYER_ID0
+    name = f"{_FIRST[i % len(_FIRST)]} {_LAST[(i // len(_FIRST)) % len(_LAST)]}"
+    gen = i // (len(_FIRST) * len(_LAST))
+    return f"{name} {gen + 1}" if gen else name
+
+
+def _names(pid: np.ndarray) -> np.ndarray:
+    uniq, inv = np.unique(pid, return_inverse=True)
+    return np.array([player_name(p) for p in uniq], dtype=object)[inv]
+
+
+class SyntheticLeague:
+    def __init__(self, teams: int = 32, games_per_team: int = 82, seed: int = 7):
+        self.n_teams, self.games_per_team = teams, games_per_team
+        self.codes = np.array(team_codes(teams), dtype=object)
+        self.rng = np.random.default_rng(seed)
+        self.attack = self.rng.normal(1.0, 0.08, teams)
+        self.defence = self.rng.normal(1.0, 0.08, teams)
+        # per-player latent rates, grown as players join
+        self.shot_rate = np.empty(0)
+        self.pct = np.empty(0)
+        self.assist_w = np.empty(0)
+        self.toi = np.empty(0)
+        self.rosters = np.stack([self._new_players(SKATERS + GOALIES) for _ in range(teams)])
+        self.next_game = GAME_ID0
+
+    def _new_players(self, n: int) -> np.ndarray:
+        start = len(self.shot_rate)
+        r = self.rng
+        self.shot_rate = np.concatenate([self.shot_rate, r.gamma(2.5, 0.9, n)])
+        self.pct = np.concatenate([self.pct, r.beta(2.2, 22.0, n)])
+        self.assist_w = np.concatenate([self.assist_w, r.gamma(2.0, 0.5, n)])
+        self.toi = np.concatenate([self.toi, np.clip(r.normal(16.0, 3.0, n), 8.0, 25.0)])
+        return np.arange(start, start + n)
+
+    def _offseason(self) -> None:
+        """Roster turnover (3 skaters, sometimes a goalie per team) and drift of everyone's rates."""
+        for t in range(self.n_teams):
+            out = self.rng.choice(SKATERS, 3, replace=False)
+            self.rosters[t, out] = self._new_players(3)
+            if self.rng.random() < 0.2:
+                self.rosters[t, SKATERS + self.rng.integers(GOALIES)] = self._new_players(1)[0]
+        self.shot_rate *= self.rng.lognormal(0.0, 0.1, len(self.shot_rate))
+        self.attack = 0.7 * self.attack + 0.3 * self.rng.normal(1.0, 0.08, self.n_teams)
+        self.defence = 0.7 * self.defence + 0.3 * self.rng.normal(1.0, 0.08, self.n_teams)
+
+    def _schedule(self, dates: pd.DatetimeIndex) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(date, home, away) per game; each team plays on a given day with p = games_per_team / SEASON_DAYS."""
+        p = min(1.0, self.games_per_team / SEASON_DAYS)
+        day, home, away = [], [], []
+        for d in dates:
+            k = self.rng.binomial(self.n_teams, p) // 2
+            perm = self.rng.permutation(self.n_teams)[:2 * k]
+            day.append(np.full(k, d.value))
+            home.append(perm[0::2])
+            away.append(perm[1::2])
+        return (np.concatenate(day).astype("datetime64[ns]"), np.concatenate(home).astype(int),
+                np.concatenate(away).astype(int))
+
+    def _play(self, day: np.ndarray, home: np.ndarray, away: np.ndarray) -> pd.DataFrame:
+        r, g = self.rng, len(home)
+        game_id = self.next_game + np.arange(g)
+        self.next_game += g
+        # one row per team-game: home sides first, then away sides (np.roll by g swaps them)
+        team, opp = np.concatenate([home, away]), np.concatenate([away, home])
+        is_home = np.repeat([1, 0], g)
+
+        pick = np.argsort(r.random((2 * g, SKATERS)), axis=1)[:, :DRESSED]        # healthy scratches
+        sk = np.take_along_axis(self.rosters[team, :SKATERS], pick, axis=1)
+        toi = np.clip(r.normal(self.toi[sk], 2.0), 6.0, 28.0)
+        rate = (self.shot_rate[sk] * toi / 17.0 * (self.attack[team] / self.defence[opp])[:, None]
+                * np.where(is_home, 1.04, 1.0)[:, None])
+        shots = r.poisson(rate)
+        goals = r.binomial(shots, self.pct[sk])
+        team_goals = goals.sum(axis=1)
+        share = self.assist_w[sk] / self.assist_w[sk].sum(axis=1, keepdims=True)
+        assists = r.poisson(share * team_goals[:, None] * 1.7)
+        goalie = self.rosters[team, SKATERS + (r.random(2 * g) > 0.65).astype(int)]
+
+        def cols(sk_vals, g_vals):
+            return np.concatenate([sk_vals, np.asarray(g_vals).reshape(-1, 1)], axis=1).ravel()
+
+        zeros = np.zeros(2 * g, dtype=int)
+        pid = cols(sk, goalie) + PLAYER_ID0
+        goals_all = cols(goals, zeros)
+        assists_all = cols(assists, r.poisson(0.02, 2 * g))
+        rows = DRESSED + 1
+        return pd.DataFrame({
+            "game_id": np.repeat(np.concatenate([game_id, game_id]), rows),
+            "team": np.repeat(self.codes[team], rows),
+            "opponent": np.repeat(self.codes[opp], rows),
+            "player_id": pid,
+            "name": _names(pid),
+            "date": np.repeat(np.concatenate([day, day]), rows),
+            "minutes": cols(np.rint(toi).astype(int), np.full(2 * g, 60)),
+            "points": (goals_all + assists_all).astype(float),
+            "goals": goals_all,
+            "assists": assists_all,
+            "home_or_away": np.repeat(is_home, rows),
+            "shots_on_goal": cols(shots, zeros),
+            "power_play_assists": r.binomial(assists_all, 0.2),
+            "power_play_goals": r.binomial(goals_all, 0.2),
+            "goal_tending_goals_against": cols(np.zeros_like(goals), np.roll(team_goals, g)),
+        })
+
+    def history(self, seasons: int = 1, end: str | pd.Timestamp | None = None) -> pd.DataFrame:
+        """`seasons` seasons of games in the YTD schema, one a year, the last one ending on `end` (default today)."""
+        end = pd.Timestamp(end or pd.Timestamp.today()).normalize()
+        frames = []
+        for k in range(seasons):
+            if k:
+                self._offseason()
+            last = end - pd.DateOffset(years=seasons - 1 - k)
+            frames.append(self._play(*self._schedule(pd.date_range(end=last, periods=SEASON_DAYS, freq="D"))))
+        df = pd.concat(frames, ignore_index=True)
+        return df[REQUIRED_YTD_COLUMNS]
+
+    def slate(self, date: str | pd.Timestamp, full_league: bool = True) -> pd.DataFrame:
+        """Projections-schema slate for `date`: every rostered player of the teams playing.
+
+        full_league=True schedules all teams (a 16-game night for 32 teams), otherwise a regular-season draw.
+        """
+        d = pd.Timestamp(date).normalize()
+        if full_league:
+            perm = self.rng.permutation(self.n_teams)[: self.n_teams // 2 * 2]
+            home, away = perm[0::2], perm[1::2]
+        else:
+            _, home, away = self._schedule(pd.DatetimeIndex([d]))
+        g = len(home)
+        game_id = self.next_game + np.arange(g)
+        self.next_game += g
+        team, opp = np.concatenate([home, away]), np.concatenate([away, home])
+        n = SKATERS + GOALIES
+        pid = self.rosters[team].ravel() + PLAYER_ID0
+        return pd.DataFrame({
+            "date": d,
+            "game_id": np.repeat(np.concatenate([game_id, game_id]), n),
+            "team": np.repeat(self.codes[team], n).astype(str),
+            "opponent": np.repeat(self.codes[opp], n).astype(str),
+            "player_id": pid.astype(str),
+            "name": _names(pid),
+        })
+
+
+def stats_records(df: pd.DataFrame) -> list[dict]:
+    """YTD-schema rows as SportsData PlayerGameStatsByDate records (the fields update_history reads)."""
+    out = pd.DataFrame({
+        "GameID": df["game_id"].astype("int64"),
+        "Day": pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%dT00:00:00"),
+        "DateTime": pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%dT19:00:00"),
+        "Team": df["team"], "Opponent": df["opponent"],
+        "PlayerID": pd.to_numeric(df["player_id"]).astype("int64"), "Name": df["name"],
+        "HomeOrAway": np.where(df["home_or_away"].astype(int) == 1, "HOME", "AWAY"),
+        "Minutes": df["minutes"], "Goals": df["goals"], "Assists": df["assists"], "Points": df["points"],
+        "ShotsOnGoal": df["shots_on_goal"], "PowerPlayGoals": df["power_play_goals"],
+        "PowerPlayAssists": df["power_play_assists"], "GoalsAgainst": df["goal_tending_goals_against"],
+    })
+    return json.loads(out.to_json(orient="records"))
+
+
+def projection_records(slate: pd.DataFrame) -> list[dict]:
+    """Slate rows as SportsData PlayerGameProjectionStatsByDate records."""
+    out = pd.DataFrame({
+        "GameID": slate["game_id"].astype("int64"),
+        "Day": pd.to_datetime(slate["date"]).dt.strftime("%Y-%m-%dT00:00:00"),
+        "DateTime": pd.to_datetime(slate["date"]).dt.strftime("%Y-%m-%dT19:00:00"),
+        "Team": slate["team"], "Opponent": slate["opponent"],
+        "PlayerID": pd.to_numeric(slate["player_id"]).astype("int64"), "Name": slate["name"],
+    })
+    return json.loads(out.to_json(orient="records"))
+
+
+def write_dataset(out_dir: str | Path, seasons: int = 1, current_days: int = 30, slate_teams: int = 32,
+                  seed: int = 7, end: str | pd.Timestamp | None = None) -> dict:
+    """Write a synthetic data directory and return a manifest of what was written.
+
+    out_dir/ytd.csv                     all but the last `current_days` days of history (YTD CSV)
+    out_dir/current_season/             those days, hive-partitioned like data/current_season.parquet
+    out_dir/slates/slate_<date>.parquet the day after `end`: a full night of a `slate_teams`-team league
+    out_dir/sportsdata/<endpoint>/<date>.json
+                                        the current days as PlayerGameStatsByDate payloads and the slate as a
+                                        PlayerGameProjectionStatsByDate payload (the layout fixture_server serves)
+    """
+    from .sportsdata import PROJECTIONS_BY_DATE, STATS_BY_DATE
+    from .update_history import upsert_current_season
+
+    out = Path(out_dir)
+    end = pd.Timestamp(end or pd.Timestamp.today()).normalize()
+    league = SyntheticLeague(seed=seed)
+    hist = league.history(seasons, end)
+    cut = end - pd.Timedelta(days=current_days)
+    past, current = hist[hist["date"] <= cut], hist[hist["date"] > cut]
+
+    out.mkdir(parents=True, exist_ok=True)
+    past.assign(date=past["date"].dt.strftime("%Y-%m-%d")).to_csv(out / "ytd.csv", index=False)
+    current_root = upsert_current_season(current, str(out / "current_season.parquet")) if len(current) else None
+    api = out / "sportsdata"
+    (api / STATS_BY_DATE).mkdir(parents=True, exist_ok=True)
+    (api / PROJECTIONS_BY_DATE).mkdir(parents=True, exist_ok=True)
+    for d, day in current.groupby("date"):
+        (api / STATS_BY_DATE / f"{d:%Y-%m-%d}.json").write_text(json.dumps(stats_records(day)))
+
+    sd = end + pd.Timedelta(days=1)
+    wide = league if slate_teams == league.n_teams else SyntheticLeague(teams=slate_teams, seed=seed + 1)
+    slate = wide.slate(sd)
+    (out / "slates").mkdir(exist_ok=True)
+    slate_file = out / "slates" / f"slate_{sd.year}-{sd.month}-{sd.day:02d}.parquet"   # cli.fetch_slate.slate_path
+    slate.to_parquet(slate_file, index=False)
+    (api / PROJECTIONS_BY_DATE / f"{sd:%Y-%m-%d}.json").write_text(json.dumps(projection_records(slate)))
+
+    manifest = {"seed": seed, "seasons": seasons, "end": f"{end:%Y-%m-%d}", "current_days": current_days,
+                "slate_teams": slate_teams, "ytd_csv": str(out / "ytd.csv"), "ytd_rows": len(past),
+                "current_season": current_root, "current_rows": len(current),
+                "actuals_days": int(current["date"].nunique()), "slate": str(slate_file), "slate_rows": len(slate),
+                "slate_date": f"{sd:%Y-%m-%d}", "sportsdata": str(api)}
+    (out / "manifest.json").write_text(json.dumps(manifest, indent=1))
+    return manifest
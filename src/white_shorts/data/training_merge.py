@@ -2,14 +2,19 @@ from __future__ import annotations
 import os
 import pandas as pd
 from .update_history import load_current_season
+from .columnar_cache import cached_load
+
+def _read_ytd_weighted(ytd_csv: str) -> pd.DataFrame:
+    ytd = pd.read_csv(ytd_csv)
+    ytd["player_id"] = ytd["player_id"].astype(str)
+    ytd["date"] = pd.to_datetime(ytd["date"], dayfirst=True, errors="coerce")
+    return ytd
 
 def build_weighted_training(ytd_csv: str = "data/NHL_YTD.csv",
                             current_parquet: str | None = None,
                             w_last_season: float = 0.5,
                             w_current: float = 1.0) -> tuple[pd.DataFrame, pd.Series]:
-    ytd = pd.read_csv(ytd_csv)
-    ytd["player_id"] = ytd["player_id"].astype(str)
-    ytd["date"] = pd.to_datetime(ytd["date"], dayfirst=True, errors="coerce")
+    ytd = cached_load(ytd_csv, _read_ytd_weighted, tag="training_merge-v1")
 
     cur = load_current_season(current_parquet or os.getenv("WS_CURRENT_SEASON_PARQUET", "data/current_season.parquet"))
     if cur is None or cur.empty:
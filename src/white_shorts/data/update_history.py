@@ -1,104 +1,205 @@
 from __future__ import annotations
-import os
+import os, shutil, uuid
+from pathlib import Path
 import pandas as pd
+from .sportsdata import get_client, STATS_BY_DATE
+from .json_arrow import decode_table
+from ..utils.trace import traced
 
 try:
-    import requests
+    import pyarrow as pa
+    import pyarrow.dataset as ds
 except Exception:
-    requests = None
+    pa = None
 
 CURRENT_SEASON_PATH = os.getenv("WS_CURRENT_SEASON_PARQUET", "data/current_season.parquet")
 
 def _parse_date(date_str: str) -> pd.Timestamp:
     return pd.to_datetime(date_str, dayfirst=True, errors="coerce").normalize()
 
-def _sportsdata_token(d: pd.Timestamp) -> str:
-    mon = d.strftime("%b")
-    return f"{d.year}-{mon}-{d.day:02d}"
+# PlayerGameStatsByDate fields -> (source keys, first truthy wins; Arrow column kind)
+_STATS_SPEC = {
+    "game_id": (("GameID", "GameId"), "float64"),
+    "team": (("Team", "TeamAbbreviation"), "string"),
+    "opponent": (("Opponent", "OpponentAbbreviation"), "string"),
+    "player_id": (("PlayerID", "PlayerId"), "string"),
+    "name": (("Name", "ShortName", "PlayerName"), "string"),
+    "minutes": (("Minutes",), "float64"),
+    "points": (("FantasyPoints", "Points"), "float64"),
+    "goals": (("Goals",), "float64"),
+    "assists": (("Assists",), "float64"),
+    "shots_on_goal": (("ShotsOnGoal", "Shots"), "float64"),
+    "home_or_away": (("HomeOrAway",), "string"),
+    "power_play_assists": (("PowerPlayAssists",), "float64"),
+    "power_play_goals": (("PowerPlayGoals",), "float64"),
+    "goal_tending_goals_against": (("GoalsAgainst",), "float64"),
+}
 
 def fetch_player_stats_by_date(date_str: str) -> pd.DataFrame:
     """Fetch PlayerGameStatsByDate (actuals)."""
-    if requests is None:
-        raise RuntimeError("requests not installed; cannot fetch actuals")
-
-    api_key = os.getenv("SPORTS_DATA_API_KEY")
-    if not api_key:
+    client = get_client()
+    if not client.key:
         raise RuntimeError("SPORTS_DATA_API_KEY is not set")
 
-    base = os.getenv("SPORTS_DATA_BASE", "https://api.sportsdata.io")
     d = _parse_date(date_str)
-    token = _sportsdata_token(d)
-    url = f"{base}/api/nhl/fantasy/json/PlayerGameStatsByDate/{token}?key={api_key}"
-
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    js = r.json()
-
-    rows = []
-    for rec in js:
-        rows.append({
-            "date": d,
-            "game_id": pd.to_numeric(rec.get("GameID") or rec.get("GameId"), errors="coerce"),
-            "team": rec.get("Team") or rec.get("TeamAbbreviation"),
-            "opponent": rec.get("Opponent") or rec.get("OpponentAbbreviation"),
-            "player_id": str(rec.get("PlayerID") or rec.get("PlayerId")) if rec.get("PlayerID") or rec.get("PlayerId") else None,
-            "name": rec.get("Name") or rec.get("ShortName") or rec.get("PlayerName"),
-            "minutes": rec.get("Minutes"),
-            "points": rec.get("FantasyPoints") or rec.get("Points"),
-            "goals": rec.get("Goals"),
-            "assists": rec.get("Assists"),
-            "shots_on_goal": rec.get("ShotsOnGoal") or rec.get("Shots"),
-            "home_or_away": 1 if rec.get("HomeOrAway") in ("HOME","Home","H") else 0,
-            "power_play_assists": rec.get("PowerPlayAssists"),
-            "power_play_goals": rec.get("PowerPlayGoals"),
-            "goal_tending_goals_against": rec.get("GoalsAgainst"),
-        })
-    df = pd.DataFrame(rows).dropna(subset=["player_id","team"])
+    body = client.get_by_date_raw(STATS_BY_DATE, d)
+    df = decode_table(body, _STATS_SPEC).to_pandas()
+    df.insert(0, "date", d)
+    df["home_or_away"] = df["home_or_away"].isin(["HOME", "Home", "H"]).astype(int)
+    df = df.dropna(subset=["player_id","team"])
     df["player_id"] = df["player_id"].astype(str)
     df["team"] = df["team"].astype(str)
     df["opponent"] = df["opponent"].astype(str)
     return df
 
-def upsert_current_season(df_new: pd.DataFrame, path: str = CURRENT_SEASON_PATH) -> str:
-    if os.path.exists(path):
-        try:
-            df_cur = pd.read_parquet(path)
-        except Exception:
-            df_cur = pd.DataFrame()
-    else:
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        df_cur = pd.DataFrame()
-
-    key_cols = ["date","game_id","player_id"]
-    for c in key_cols:
-        if c == "date":
-            df_new[c] = pd.to_datetime(df_new[c], errors="coerce").dt.normalize()
-        elif c == "game_id":
-            df_new[c] = pd.to_numeric(df_new[c], errors="coerce")
-        else:
-            df_new[c] = df_new[c].astype(str)
-
-    if not df_cur.empty:
-        for c in key_cols:
-            if c == "date":
-                df_cur[c] = pd.to_datetime(df_cur[c], errors="coerce").dt.normalize()
-            elif c == "game_id":
-                df_cur[c] = pd.to_numeric(df_cur[c], errors="coerce")
-            else:
-                df_cur[c] = df_cur[c].astype(str)
-
-        idx = pd.MultiIndex.from_frame(df_new[key_cols])
-        mask = ~pd.MultiIndex.from_frame(df_cur[key_cols]).isin(idx)
-        df_cur = df_cur[mask]
-
-        df_out = pd.concat([df_cur, df_new], ignore_index=True)
-    else:
-        df_out = df_new.copy()
-
-    df_out.to_parquet(path, index=False)
-    return path
-
-def load_current_season(path: str = CURRENT_SEASON_PATH) -> pd.DataFrame:
-    if not os.path.exists(path):
-        return pd.DataFrame()
-    return pd.read_parquet(path)
+def _dataset_root(path: str | Path) -> Path:
+    """Dataset directory for a configured path ('data/current_season.parquet' -> 'data/current_season')."""
+    p = Path(path)
+    return p.with_suffix("") if p.suffix == ".parquet" else p
+
+def season_of(d: pd.Timestamp) -> int:
+    """NHL season label = calendar year the season starts in (Oct-Jun)."""
+    return d.year if d.month >= 7 else d.year - 1
+
+def _partition_dir(root: Path, d: pd.Timestamp) -> Path:
+    return root / f"season={season_of(d)}" / f"date={d:%Y-%m-%d}"
+
+def _normalize_keys(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.normalize()
+    df["game_id"] = pd.to_numeric(df["game_id"], errors="coerce")
+    df["player_id"] = df["player_id"].astype(str)
+    return df
+
+def _write_partition_file(part: pd.DataFrame, pdir: Path) -> Path:
+    pdir.mkdir(parents=True, exist_ok=True)
+    name = f"part-{pd.Timestamp.utcnow():%Y%m%d%H%M%S%f}-{uuid.uuid4().hex[:8]}.parquet"
+    tmp = pdir / f".{name}.tmp"
+    # partition keys live in the directory names, not in the files
+    part.drop(columns=["date", "season"], errors="ignore").to_parquet(tmp, index=False)
+    final = pdir / name
+    os.replace(tmp, final)
+    return final
+
+def _migrate_legacy(path: str | Path) -> int:
+    """Split the legacy single-file parquet into date partitions (dates already partitioned win).
+
+    The file is renamed *.parquet.migrated afterwards, so this runs once. Returns rows migrated.
+    """
+    legacy = Path(path)
+    if legacy.suffix != ".parquet" or not legacy.is_file():
+        return 0
+    root = _dataset_root(path)
+    df = _normalize_keys(pd.read_parquet(legacy)).dropna(subset=["date"])
+    n = 0
+    for d, part in df.groupby("date"):
+        pdir = _partition_dir(root, d)
+        if pdir.exists() and any(pdir.glob("*.parquet")):
+            continue
+        _write_partition_file(part, pdir)
+        n += len(part)
+    os.replace(legacy, legacy.with_suffix(".parquet.migrated"))
+    return n
+
+@traced
+def upsert_current_season(df_new: pd.DataFrame, path: str = CURRENT_SEASON_PATH, mode: str = "replace") -> str:
+    """Write rows into the hive-partitioned season dataset (season=YYYY/date=YYYY-MM-DD).
+
+    mode="replace": each date present in df_new replaces its partition; other dates are untouched.
+    mode="append" : add a part file next to the existing ones (late/partial rows); duplicates
+                    on (date, game_id, player_id) are resolved by `compact_current_season`.
+    """
+    if mode not in ("replace", "append"):
+        raise ValueError(f"mode must be 'replace' or 'append', got {mode!r}")
+    root = _dataset_root(path)
+    # the first write after upgrading moves the legacy single file into the dataset,
+    # so loaders never see a partition directory that hides the rest of the season
+    _migrate_legacy(path)
+    df = _normalize_keys(df_new).dropna(subset=["date"])
+    for d, part in df.groupby("date"):
+        pdir = _partition_dir(root, d)
+        old = sorted(pdir.glob("*.parquet")) if mode == "replace" and pdir.exists() else []
+        _write_partition_file(part, pdir)
+        for f in old:
+            f.unlink()
+    return str(root)
+
+def _partitioning():
+    return ds.partitioning(pa.schema([("season", pa.int32()), ("date", pa.string())]), flavor="hive")
+
+def _date_filter(start, end):
+    flt = None
+    if start is not None:
+        flt = ds.field("date") >= pd.Timestamp(start).strftime("%Y-%m-%d")
+    if end is not None:
+        f_end = ds.field("date") <= pd.Timestamp(end).strftime("%Y-%m-%d")
+        flt = f_end if flt is None else (flt & f_end)
+    return flt
+
+def load_current_season(path: str = CURRENT_SEASON_PATH, start=None, end=None,
+                        columns: list[str] | None = None) -> pd.DataFrame:
+    """Load current-season rows, pruning date partitions and projecting columns at read time."""
+    root = _dataset_root(path)
+    if not root.is_dir():
+        # legacy single-file layout
+        if not os.path.isfile(path):
+            return pd.DataFrame()
+        df = pd.read_parquet(path, columns=columns)
+        if "date" in df.columns and (start is not None or end is not None):
+            dt = pd.to_datetime(df["date"], errors="coerce")
+            keep = pd.Series(True, index=df.index)
+            if start is not None: keep &= dt >= pd.Timestamp(start)
+            if end is not None: keep &= dt <= pd.Timestamp(end)
+            df = df[keep].reset_index(drop=True)
+        return df
+
+    flt = _date_filter(start, end)
+    base = ds.dataset(root, format="parquet", partitioning=_partitioning(), exclude_invalid_files=True)
+    frags = list(base.get_fragments(filter=flt))
+    if not frags:
+        return pd.DataFrame(columns=columns or [])
+    # files written on different days can differ in columns/types; unify over the pruned set only
+    schema = pa.unify_schemas([f.physical_schema for f in frags] + [_partitioning().schema],
+                              promote_options="permissive")
+    dset = ds.dataset([f.path for f in frags], schema=schema, format="parquet",
+                      partitioning=_partitioning(), partition_base_dir=str(root))
+    cols = None if columns is None else [c for c in columns if c in schema.names]
+    df = dset.to_table(columns=cols, filter=flt).to_pandas()
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"])
+    if columns is None:
+        df = df.drop(columns=["season"], errors="ignore")
+    return df
+
+def compact_current_season(path: str = CURRENT_SEASON_PATH, migrate_legacy: bool = True) -> dict:
+    """Merge multi-file partitions into one deduplicated file each and drop empty partitions.
+
+    If the legacy single-file parquet exists (and migrate_legacy), its rows are split into
+    partitions first (dates already partitioned win) and the file is renamed *.parquet.migrated.
+    """
+    root = _dataset_root(path)
+    stats = {"partitions": 0, "merged": 0, "files_removed": 0,
+             "migrated_rows": _migrate_legacy(path) if migrate_legacy else 0}
+
+    if not root.is_dir():
+        return stats
+    key_cols = ["date", "game_id", "player_id"]
+    for pdir in sorted(root.glob("season=*/date=*")):
+        files = sorted(pdir.glob("*.parquet"))
+        stats["partitions"] += 1
+        if not files:
+            shutil.rmtree(pdir)
+            continue
+        if len(files) == 1:
+            continue
+        d = pd.Timestamp(pdir.name.split("=", 1)[1])
+        # part files sort by write timestamp, so keep="last" is last-write-wins
+        part = pd.concat([pd.read_parquet(f) for f in files], ignore_index=True)
+        part["date"] = d
+        part = _normalize_keys(part).drop_duplicates(subset=key_cols, keep="last")
+        _write_partition_file(part, pdir)
+        for f in files:
+            f.unlink()
+        stats["merged"] += 1
+        stats["files_removed"] += len(files)
+    return stats
@@ -1,5 +1,6 @@
 from __future__ import annotations
 import pandas as pd
+from ..utils.trace import traced
 
 TEAM_FEATURES = [
   "home_or_away","days_off_team","team_gf_5","team_ga_5",
@@ -73,6 +74,7 @@ def add_goalie_signal(df: pd.DataFrame) -> pd.DataFrame:
     out["opp_goalie_ga_smooth"] = out["opp_goalie_ga_smooth"].fillna(0.0)
     return out
 
+@traced
 def engineer_minimal(df: pd.DataFrame) -> pd.DataFrame:
     out = add_days_off(df)
     out = add_rolling(out)
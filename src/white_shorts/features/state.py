@@ -0,0 +1,220 @@
+from __future__ import annotations
+import os, json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from .engine import WINDOW, _rolling_mean, _group_starts, _days_since_prev
+from .engineer import TEAM_FEATURES
+from .registry import PLAYER_FEATURES
+
+# Persisted rolling state for engineer_minimal-style features.
+#
+# Every feature engineer_minimal produces is a function of the last WINDOW rows
+# of one of three ordered sequences: rows per player, rows per team and rows per
+# opponent. The store keeps exactly those tail rows (plus the latest feature
+# snapshot per (player_id, team)), so a new day of actuals is featurized by
+# prepending the stored tails to the new rows and running the same kernels as
+# engine.engineer_fast — O(new rows), never the full history.
+
+FEATURE_STATE_DIR = os.getenv("WS_FEATURE_STATE_DIR", "data/feature_state")
+
+_PLAYER_VALS = ["points", "goals", "assists", "shots_on_goal"]
+_SNAP_COLS = ["player_id", "team", "date"] + list(dict.fromkeys(PLAYER_FEATURES + TEAM_FEATURES))
+
+_TAILS = {
+    # name -> (group key, value columns)
+    "players": ("player_id", _PLAYER_VALS),
+    "teams": ("team", ["gf", "ga"]),
+    "opponents": ("opponent", ["gtga"]),
+}
+
+
+class StaleStateError(ValueError):
+    """Raised when rows are not strictly newer than the store's as-of date."""
+
+
+def _prep(df: pd.DataFrame) -> pd.DataFrame:
+    out = pd.DataFrame(index=pd.RangeIndex(len(df)))
+    out["date"] = pd.to_datetime(df["date"].to_numpy(), errors="coerce", dayfirst=True)
+    for c in ("player_id", "team", "opponent"):
+        s = df[c] if c in df.columns else pd.Series(pd.NA, index=df.index)
+        s = s.reset_index(drop=True)
+        out[c] = s.astype(str).where(s.notna())      # also nullable Int64 ids (fact_actuals)
+    for c in _PLAYER_VALS + ["minutes", "home_or_away", "goal_tending_goals_against"]:
+        if c in df.columns:
+            out[c] = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            out[c] = np.nan
+    return out
+
+
+def _day_sums(rows: pd.DataFrame, key: str) -> np.ndarray:
+    ok = rows[key].notna() & rows["date"].notna()
+    sums = rows.loc[ok].groupby([key, "date"])["points"].transform("sum")
+    return sums.reindex(rows.index).to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _extend(tail: pd.DataFrame, new: pd.DataFrame, key: str, ties: list[str],
+            vals: list[str]) -> tuple[pd.DataFrame, dict[str, np.ndarray], pd.DataFrame]:
+    """Append `new` rows behind the stored `tail` of each group.
+
+    Returns the new rows in sequence order, their rolling means / days-since-previous
+    (aligned to `new.index`), and the updated tail.
+    """
+    fresh = new.loc[new[key].notna() & new["date"].notna(), [key, "date"] + ties + vals].copy()
+    fresh["_new"] = True
+    fresh["_pos"] = fresh.index
+    fresh = fresh.sort_values([key, "date"] + ties + ["_pos"], kind="mergesort", na_position="last")
+    old = tail.loc[tail[key].isin(fresh[key].unique())].copy()
+    old["_new"] = False
+    old["_pos"] = -1
+    seq = pd.concat([old, fresh], ignore_index=True)
+    seq = seq.sort_values(key, kind="mergesort").reset_index(drop=True)
+
+    codes = pd.factorize(seq[key])[0]
+    starts = _group_starts(codes)
+    dates = seq["date"]
+    nat = dates.isna().to_numpy()
+    dates_ns = dates.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+
+    is_new = seq["_new"].to_numpy()
+    pos = seq.loc[is_new, "_pos"].to_numpy()
+    feats: dict[str, np.ndarray] = {}
+    days = np.full(len(new), 7.0)
+    days[new.index.get_indexer(pos)] = _days_since_prev(dates_ns, nat, starts)[is_new]
+    feats["days"] = days
+    for v in vals:
+        res = np.full(len(new), np.nan)
+        res[new.index.get_indexer(pos)] = _rolling_mean(seq[v].to_numpy(dtype=np.float64), starts)[is_new]
+        feats[v] = res
+
+    new_tail = (seq.groupby(key, sort=False).tail(WINDOW)[[key, "date"] + vals])
+    keep = tail.loc[~tail[key].isin(fresh[key].unique())]
+    new_tail = pd.concat([keep, new_tail], ignore_index=True)
+    return fresh, feats, new_tail
+
+
+def unusable_reason(state: "FeatureState | None", played_through: pd.Timestamp | None,
+                    slate_date: pd.Timestamp) -> str | None:
+    """Why `state` cannot supply the snapshots for a slate on `slate_date` (None when it can).
+
+    `played_through` is the last date of the played history the predictor would
+    otherwise engineer from; a state behind it is missing games.
+    """
+    if state is None:
+        return "no feature state store"
+    if state.as_of is None:
+        return "feature state is empty"
+    if played_through is not None and pd.notna(played_through) and state.as_of < played_through:
+        return (f"feature state as of {state.as_of.date()} is older than the played history "
+                f"({played_through.date()}); rebuild with: python -m white_shorts.cli.feature_state rebuild")
+    if state.as_of >= slate_date:
+        return f"feature state as of {state.as_of.date()} already includes the {slate_date.date()} slate"
+    return None
+
+
+class FeatureState:
+    """Last-WINDOW row buffers per player, team and opponent plus per-player snapshots."""
+
+    def __init__(self, tails: dict[str, pd.DataFrame] | None = None,
+                 snapshots: pd.DataFrame | None = None, as_of: pd.Timestamp | None = None):
+        self.tails = tails or {
+            name: pd.DataFrame({key: pd.Series(dtype=object), "date": pd.Series(dtype="datetime64[ns]"),
+                                **{v: pd.Series(dtype=float) for v in vals}})
+            for name, (key, vals) in _TAILS.items()
+        }
+        self.snapshots = snapshots if snapshots is not None else pd.DataFrame(columns=_SNAP_COLS)
+        self.as_of = as_of
+
+    # ---------- featurization ----------
+    def _featurize(self, df: pd.DataFrame) -> tuple[pd.DataFrame, dict[str, pd.DataFrame]]:
+        rows = _prep(df)
+        if self.as_of is not None and (rows["date"].dropna() <= self.as_of).any():
+            raise StaleStateError(
+                f"rows dated on/before the feature state as-of {self.as_of.date()}; rebuild the state instead"
+            )
+
+        rows["gf"] = _day_sums(rows, "team")
+        rows["ga"] = _day_sums(rows, "opponent")
+        rows["gtga"] = rows["goal_tending_goals_against"]
+
+        # Same tie-breaks as the chained stable sorts in engineer_minimal:
+        # players by date; teams by date, player_id; opponents by date, team, player_id.
+        _, f_p, t_p = _extend(self.tails["players"], rows, "player_id", [], _PLAYER_VALS)
+        _, f_t, t_t = _extend(self.tails["teams"], rows, "team", ["player_id"], ["gf", "ga"])
+        _, f_o, t_o = _extend(self.tails["opponents"], rows, "opponent", ["team", "player_id"], ["gtga"])
+
+        out = rows[["date", "player_id", "team", "opponent", "minutes", "home_or_away"]].copy()
+        out["days_off"] = f_p["days"]
+        for c in _PLAYER_VALS:
+            out[f"rolling_{c}_5"] = f_p[c]
+        out["days_off_team"] = f_t["days"]
+        out["team_gf_5"] = f_t["gf"]
+        out["team_ga_5"] = f_t["ga"]
+        out["opp_team_gf_5"] = out["team_ga_5"]
+        out["opp_team_ga_5"] = out["team_gf_5"]
+        out["opp_goalie_ga_smooth"] = np.nan_to_num(f_o["gtga"], nan=0.0)
+        out[TEAM_FEATURES] = out[TEAM_FEATURES].fillna(0.0)
+        out.index = df.index
+        return out, {"players": t_p, "teams": t_t, "opponents": t_o}
+
+    def last_features(self, features: list[str] = PLAYER_FEATURES) -> pd.DataFrame:
+        """Latest engineered row per (player_id, team): the `last_feat` snapshot slates are scored on."""
+        return self.snapshots[["player_id", "team"] + list(features)]
+
+    def ingest(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Featurize and commit rows that are strictly newer than `as_of`. Returns their features."""
+        if df is None or df.empty:
+            return pd.DataFrame(columns=_SNAP_COLS)
+        feats, tails = self._featurize(df)
+        self.tails = tails
+
+        snap = feats.dropna(subset=["player_id", "team"])[_SNAP_COLS]
+        merged = pd.concat([self.snapshots, snap], ignore_index=True) if len(self.snapshots) else snap
+        self.snapshots = (merged.sort_values("date", kind="mergesort")
+                                .groupby(["player_id", "team"], as_index=False).tail(1)
+                                .reset_index(drop=True))
+        max_date = feats["date"].max()
+        if pd.notna(max_date) and (self.as_of is None or max_date > self.as_of):
+            self.as_of = max_date
+        return feats
+
+    @classmethod
+    def build(cls, history: pd.DataFrame, chunk_days: int | None = None) -> "FeatureState":
+        """Build from a full history. One batch by default; `chunk_days` ingests in date slices."""
+        state = cls()
+        if history is None or history.empty:
+            return state
+        if not chunk_days:
+            state.ingest(history)
+            return state
+        dates = pd.to_datetime(history["date"], errors="coerce", dayfirst=True)
+        history = history.loc[dates.notna()]
+        dates = dates.loc[dates.notna()]
+        for _, chunk in history.groupby((dates - dates.min()).dt.days // int(chunk_days), sort=True):
+            state.ingest(chunk)
+        return state
+
+    # ---------- persistence ----------
+    def save(self, path: str | Path = FEATURE_STATE_DIR) -> str:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name, tail in self.tails.items():
+            tail.to_parquet(path / f"{name}.parquet", index=False)
+        self.snapshots.to_parquet(path / "snapshots.parquet", index=False)
+        meta = {"as_of": None if self.as_of is None else str(self.as_of.date()), "window": WINDOW}
+        with open(path / "state.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        return str(path)
+
+    @classmethod
+    def load(cls, path: str | Path = FEATURE_STATE_DIR) -> "FeatureState | None":
+        path = Path(path)
+        if not (path / "state.json").exists():
+            return None
+        with open(path / "state.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        tails = {name: pd.read_parquet(path / f"{name}.parquet") for name in _TAILS}
+        snaps = pd.read_parquet(path / "snapshots.parquet")
+        as_of = pd.Timestamp(meta["as_of"]) if meta.get("as_of") else None
+        return cls(tails=tails, snapshots=snaps, as_of=as_of)
@@ -0,0 +1,148 @@
+from __future__ import annotations
+import json, os, shutil
+from pathlib import Path
+import numpy as np
+from .qrf_forest import QuantileForest, _LeafIndex
+from .forest_kernel import FlatForest
+
+# Compact, memory-mappable QRF artifacts.
+#
+# A joblib dump of a full-depth forest pickles sklearn's 64-byte node structs
+# plus the QRF index, and every process unpickles all of it at startup. An
+# artifact here is a directory of uncompressed .npy blocks (int32 children /
+# features, float32 thresholds and leaf tables) plus a JSON manifest. Opening
+# it with mmap_mode="r" costs a few page faults; the OS page cache shares the
+# pages between the API, CLI runs and backfill workers. Serving walks the flat
+# arrays with forest_kernel's block traversal, so sklearn is not needed; the
+# thresholds are floored to float32, so decisions are bit-identical to the
+# original trees.
+#
+# Variants: quantize=True stores PMF weights as uint16 and leaf means as float16
+# (~2-3x smaller index); max_trees keeps only the first N trees (bootstrap trees
+# are exchangeable, so this is a random sub-forest).
+
+FORMAT = "ws-qrf-compact/1"
+SUFFIX = ".qrf"
+
+
+class CompactQuantileForest(QuantileForest):
+    """QuantileForest served from artifact arrays (usually memory-mapped)."""
+
+    def __init__(self, flat: FlatForest, outputs: list[_LeafIndex], targets: list[str] | None):
+        self.forest = None
+        self.flat = flat
+        self.outputs = outputs
+        self.targets = targets
+        self.n_trees = len(flat.roots)
+        self.node_offsets = np.concatenate([flat.roots, [flat.n_nodes]])
+
+    def _leaves(self, X: np.ndarray, t0: int = 0, t1: int | None = None) -> np.ndarray:
+        return self.flat.apply(X)
+
+
+class _QuantizedIndex(_LeafIndex):
+    """_LeafIndex over uint16 weights / float16 leaf means."""
+
+    def pmf(self, leaves: np.ndarray) -> np.ndarray:
+        return super().pmf(leaves) / 65535.0
+
+
+def _prune_index(idx: _LeafIndex, n_nodes: int) -> dict[str, np.ndarray]:
+    if idx.table is not None:
+        leaf_row = idx.leaf_row[:n_nodes]
+        used = np.unique(leaf_row)
+        # renumber the rows still referenced (the empty row stays last)
+        remap = np.full(idx.table.shape[1], -1, dtype=np.int64)
+        remap[used] = np.arange(len(used))
+        empty = idx.table.shape[1] - 1
+        keep = used if used[-1] == empty else np.append(used, empty)
+        remap[empty] = len(keep) - 1
+        return {"leaf_row": remap[leaf_row].astype(np.int32), "table": idx.table[:, keep]}
+    ptr = idx.leaf_ptr[:n_nodes + 1]
+    end = int(ptr[-1])
+    return {"codes": idx.codes[:end], "weights": idx.weights[:end], "leaf_ptr": ptr}
+
+
+def save_artifact(bundle, path: str | Path, quantize: bool = False, max_trees: int | None = None) -> str:
+    """Write `bundle` (a QuantileForest bundle) as a compact artifact directory."""
+    qf = bundle.model
+    if not isinstance(qf, QuantileForest) or qf.forest is None:
+        raise TypeError("compact artifacts need a leaf-mode QuantileForest bundle")
+    n_trees = min(qf.n_trees, max_trees or qf.n_trees)
+    n_nodes = int(qf.node_offsets[n_trees])
+    flat = FlatForest.from_sklearn(qf.forest, n_trees)
+
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    arrays = {"children": flat.children, "feature": flat.feature,
+              "threshold": flat.threshold, "roots": flat.roots}
+    outputs = []
+    for j, idx in enumerate(qf.outputs):
+        parts = _prune_index(idx, n_nodes)
+        parts["leaf_value"] = idx.leaf_value[:n_nodes].astype(np.float16 if quantize else np.float32)
+        if quantize:
+            w = "table" if "table" in parts else "weights"
+            parts[w] = np.round(parts[w].astype(np.float64) * 65535).astype(np.uint16)
+        for k, a in parts.items():
+            arrays[f"out{j}_{k}"] = a
+        outputs.append({"values": idx.values.tolist(), "dense": "table" in parts})
+    for k, a in arrays.items():
+        np.save(tmp / f"{k}.npy", np.ascontiguousarray(a))
+    manifest = {
+        "format": FORMAT,
+        "features": list(bundle.features),
+        "target": bundle.target,
+        "targets": getattr(bundle, "targets", None) or qf.targets,
+        "model_name": bundle.model_name,
+        "model_version": bundle.model_version,
+        "n_trees": n_trees,
+        "quantized": bool(quantize),
+        "outputs": outputs,
+    }
+    (tmp / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    if path.exists():
+        shutil.rmtree(path)
+    os.replace(tmp, path)
+    return str(path)
+
+
+def load_artifact(path: str | Path, mmap: bool = True) -> dict:
+    """Open an artifact; returns the same dict shape as io_qrf.load_latest."""
+    path = Path(path)
+    manifest = json.loads((path / "manifest.json").read_text())
+    if manifest.get("format") != FORMAT:
+        raise ValueError(f"{path}: unknown artifact format {manifest.get('format')!r}")
+    mode = "r" if mmap else None
+    a = lambda name: np.load(path / f"{name}.npy", mmap_mode=mode)
+    flat = FlatForest(a("children"), a("feature"), a("threshold"), np.asarray(a("roots")))
+    cls = _QuantizedIndex if manifest["quantized"] else _LeafIndex
+    outputs = []
+    for j, spec in enumerate(manifest["outputs"]):
+        idx = cls.__new__(cls)
+        idx.values = np.asarray(spec["values"], dtype=np.float64)
+        idx.leaf_value = a(f"out{j}_leaf_value")
+        if spec["dense"]:
+            idx.leaf_row, idx.table = a(f"out{j}_leaf_row"), a(f"out{j}_table")
+            idx.codes = idx.weights = idx.leaf_ptr = None
+        else:
+            idx.leaf_row = idx.table = None
+            idx.codes, idx.weights, idx.leaf_ptr = a(f"out{j}_codes"), a(f"out{j}_weights"), a(f"out{j}_leaf_ptr")
+        outputs.append(idx)
+    model = CompactQuantileForest(flat, outputs, manifest.get("targets"))
+    return {
+        "model": model,
+        "features": manifest["features"],
+        "target": manifest["target"],
+        "targets": manifest.get("targets"),
+        "model_name": manifest["model_name"],
+        "model_version": manifest["model_version"],
+    }
+
+
+def artifact_bytes(path: str | Path) -> int:
+    path = Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.iterdir())
+    return path.stat().st_size
@@ -0,0 +1,157 @@
+from __future__ import annotations
+import os, time
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from ..features.engine import engineer_fast
+from ..features.registry import PLAYER_FEATURES
+from .scheduler import TrainJob
+from ..utils.trace import traced
+
+# Walk-forward backtests with point-in-time features.
+#
+# engineer_minimal features describe a row *including* its own game (rolling
+# means, team/opponent day sums, minutes), so scoring rows with them leaks the
+# result. Production trains on those same-game engineered rows (train_qrf,
+# predict_from_slate._load_or_train) but serves the latest engineered snapshot
+# of each (player_id, team), and the backtest replays exactly that: each fold
+# fits on the engineer_fast rows dated before it, and scores rows whose
+# features are the snapshot of the player's previous game (merge_asof,
+# strictly earlier date), plus the fields known before puck drop
+# (home_or_away, days since the previous game). The engineered frame is
+# causal, so one engineer_fast pass over the season yields both the training
+# rows of every fold and the as-of features of every day.
+#
+# Folds: after `warmup_days`, test days are grouped into blocks of
+# `retrain_every` days. Each fold trains on all rows dated before its first day
+# and scores each of its days; folds are independent and run through the
+# scheduler's process pool. Each fold reads the shared frames from Arrow files
+# instead of being pickled its own copy.
+
+BACKTEST_DIR = os.getenv("WS_BACKTEST_DIR", "data/backtest")
+TARGETS = ("points", "goals", "assists", "shots_on_goal")
+PREGAME = ["home_or_away", "days_off"]           # known before the game, taken from the row itself
+_KEYS = ["date", "game_id", "team", "opponent", "player_id"]
+
+
+@traced
+def season_features(hist: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """(train, pit) for `hist`: engineer_fast rows as production trains on them, and the
+    same rows with PLAYER_FEATURES as of the start of their day (as slates are scored)."""
+    feat = engineer_fast(hist)
+    feat["player_id"] = feat["player_id"].astype(str)
+    feat["team"] = feat["team"].astype(str)
+    feat = feat.dropna(subset=["date"]).sort_values("date", kind="mergesort")
+    targets = [t for t in TARGETS if t in feat.columns]
+    train = feat[["date"] + PLAYER_FEATURES + targets].reset_index(drop=True)
+    snap_cols = [c for c in PLAYER_FEATURES if c not in PREGAME]
+    snap = feat[["player_id", "team", "date"] + snap_cols].rename(columns={"date": "asof_date"})
+    rows = feat[_KEYS + PREGAME + targets]
+    pit = pd.merge_asof(rows, snap, left_on="date", right_on="asof_date", by=["player_id", "team"],
+                        allow_exact_matches=False)
+    pit[snap_cols] = pit[snap_cols].fillna(0.0)   # first game of a player: stub features, as in predict
+    return train, pit.reset_index(drop=True)
+
+
+@dataclass
+class Fold:
+    season: str
+    fold: int
+    start: pd.Timestamp
+    end: pd.Timestamp                             # inclusive
+    days: int
+
+
+def plan_folds(dates: pd.Series, season: str, warmup_days: int = 21, retrain_every: int = 7,
+               max_days: int | None = None) -> list[Fold]:
+    days = np.sort(pd.to_datetime(dates).dropna().unique())
+    if len(days) == 0:
+        return []
+    test = days[days >= days[0] + np.timedelta64(warmup_days, "D")]
+    if max_days:
+        test = test[:max_days]
+    folds = []
+    for i in range(0, len(test), max(1, retrain_every)):
+        block = test[i:i + retrain_every]
+        folds.append(Fold(season, len(folds), pd.Timestamp(block[0]), pd.Timestamp(block[-1]), len(block)))
+    return folds
+
+
+def _pinball(y: np.ndarray, q: np.ndarray, level: float) -> float:
+    d = y - q
+    return float(np.mean(np.maximum(level * d, (level - 1) * d)))
+
+
+def _fit_predict(model: str, train: pd.DataFrame, test: pd.DataFrame, targets: list[str],
+                 trees: int, n_jobs: int) -> tuple[dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]], float, float]:
+    """target -> (mean, q10, q90) for `test`, plus (fit seconds, predict seconds)."""
+    out = {}
+    if model == "qrf":
+        from .trainers_qrf import train_player_qrf_multi, qrf_predict_multi
+        t0 = time.perf_counter()
+        bundle = train_player_qrf_multi(train, PLAYER_FEATURES, targets, n_estimators=trees, n_jobs=n_jobs)
+        t1 = time.perf_counter()
+        for t, (mean, q) in qrf_predict_multi(bundle, test, [0.10, 0.90]).items():
+            out[t] = (mean, q[:, 0], q[:, 1])
+        return out, t1 - t0, time.perf_counter() - t1
+    if model == "lgbm":
+        from .trainers import train_player_count
+        from .poisson import poisson_quantiles_array
+        fit = pred = 0.0
+        X = test[PLAYER_FEATURES].fillna(0)
+        for t in targets:
+            t0 = time.perf_counter()
+            b = train_player_count(train, PLAYER_FEATURES, t, n_jobs=n_jobs)
+            t1 = time.perf_counter()
+            lam = np.asarray(b.model.predict(X), dtype=np.float64)
+            q = poisson_quantiles_array(lam)
+            out[t] = (lam, q[:, 0], q[:, 1])
+            fit, pred = fit + t1 - t0, pred + time.perf_counter() - t1
+        return out, fit, pred
+    raise ValueError(f"unknown backtest model {model!r} (qrf, lgbm)")
+
+
+def run_fold(fold: Fold, train_path: str, features_path: str, model: str = "qrf",
+             targets: tuple[str, ...] = TARGETS, trees: int = 200, n_jobs: int = 1) -> pd.DataFrame:
+    """Train on engineered rows before the fold, score each of its days on point-in-time
+    features; one metrics row per (date, target)."""
+    train = pd.read_feather(train_path)
+    train = train[train["date"] < fold.start].dropna(subset=list(targets))
+    pit = pd.read_feather(features_path)
+    test = pit[(pit["date"] >= fold.start) & (pit["date"] <= fold.end)].dropna(subset=list(targets))
+    if train.empty or test.empty:
+        return pd.DataFrame()
+    preds, fit_s, pred_s = _fit_predict(model, train, test, list(targets), trees, n_jobs)
+    dates = test["date"].to_numpy()
+    rows = []
+    for t, (mean, q10, q90) in preds.items():
+        y = test[t].to_numpy(dtype=np.float64)
+        for d in np.unique(dates):
+            m = dates == d
+            yd, md = y[m], mean[m]
+            rows.append({
+                "season": fold.season, "model": model, "target": t, "date": pd.Timestamp(d), "fold": fold.fold,
+                "n": int(m.sum()), "mae": float(np.mean(np.abs(yd - md))),
+                "rmse": float(np.sqrt(np.mean((yd - md) ** 2))), "bias": float(np.mean(md - yd)),
+                "coverage_80": float(np.mean((yd >= q10[m]) & (yd <= q90[m]))),
+                "pinball_10": _pinball(yd, q10[m], 0.10), "pinball_90": _pinball(yd, q90[m], 0.90),
+                "train_rows": len(train), "fit_seconds": fit_s, "predict_seconds": pred_s,
+                "rows_per_sec": len(test) / max(pred_s, 1e-9),
+            })
+    return pd.DataFrame(rows)
+
+
+def fold_jobs(folds: list[Fold], train_path: str, features_path: str, model: str,
+              targets: tuple[str, ...] = TARGETS, trees: int = 200) -> list[TrainJob]:
+    return [TrainJob(f"{f.season}#{f.fold} {f.start.date()}..{f.end.date()}", run_fold,
+                     (f, train_path, features_path), dict(model=model, targets=tuple(targets), trees=trees))
+            for f in folds]
+
+
+def write_features(frame: pd.DataFrame, work_dir: str | Path, name: str) -> str:
+    path = Path(work_dir) / f"{name}.arrow"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    frame.to_feather(path)
+    return str(path)
+
@@ -1,17 +1,79 @@
 from __future__ import annotations
+import os, json
 from dataclasses import dataclass
+from pathlib import Path
 import numpy as np
 import pandas as pd
+from scipy.stats import norm
+from ..utils.trace import traced
 try:
     from statsmodels.tsa.holtwinters import ExponentialSmoothing
     _SM_OK = True
 except Exception:
     _SM_OK = False
 
+# Batched damped-trend ETS for per-team goal totals.
+#
+# Model: additive damped trend (ETS(A,Ad,N), what fit_team_ets asks statsmodels
+# for), in error-correction form
+#     yhat_t = l + phi * b,   e_t = y_t - yhat_t
+#     l <- yhat_t + alpha * e_t,   b <- phi * b + alpha * beta * e_t
+# Fitting minimises the one-step SSE over a fixed (alpha, beta, phi) grid for
+# every team at once: team series are left-aligned into a (teams, games) matrix
+# and each time step advances all (team, grid point) states with one array op,
+# so ~30 teams x ~600 grid points is a few dozen vectorized steps, not 30
+# optimizer runs. The chosen parameters, the final (level, trend) and the
+# running SSE are persisted (WS_ETS_STATE_DIR); a new day of games only advances
+# those states with the stored parameters. Forecasts are true one-step
+# forecasts l + phi * b with normal intervals from the one-step residual sd.
+
+ETS_STATE_DIR = os.getenv("WS_ETS_STATE_DIR", "data/ets_state")
+
+_ALPHAS = np.concatenate([[0.005, 0.01, 0.02, 0.03], np.round(np.arange(0.05, 1.0, 0.05), 2)])
+_BETAS = np.array([0.0, 0.05, 0.1, 0.2, 0.3, 0.5])      # fraction of alpha (keeps beta* <= alpha)
+_PHIS = np.array([0.8, 0.85, 0.9, 0.95, 0.98])
+_COLS = ["team", "alpha", "beta", "phi", "level", "trend", "sse", "n_err", "n_games", "last_date"]
+
+
+def _grid() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    a, b, p = np.meshgrid(_ALPHAS, _BETAS, _PHIS, indexing="ij")
+    return a.ravel(), b.ravel(), p.ravel()
+
+
+def _pad(series: pd.DataFrame, teams: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """(teams, max_games) matrix of team_goals, left-aligned in date order, NaN padded; plus lengths."""
+    s = series[series["team"].isin(teams)].sort_values(["team", "date"], kind="mergesort")
+    pos = s.groupby("team").cumcount().to_numpy()
+    row = pd.Categorical(s["team"], categories=teams).codes
+    n = np.bincount(row, minlength=len(teams))
+    Y = np.full((len(teams), int(n.max()) if len(n) else 0), np.nan)
+    Y[row, pos] = s["team_goals"].to_numpy(dtype=np.float64)
+    return Y, n
+
+
+def _run(Y: np.ndarray, n: np.ndarray, level, trend, alpha, beta, phi, t0: int = 0):
+    """Advance states over columns t0.. of Y; arrays broadcast as (teams, grid). Returns (level, trend, sse, n_err)."""
+    level, trend = np.array(level, dtype=np.float64), np.array(trend, dtype=np.float64)
+    sse = np.zeros(np.broadcast(level, alpha).shape)
+    n_err = np.zeros(len(Y), dtype=np.int64)
+    ab = alpha * beta
+    for t in range(t0, Y.shape[1]):
+        y = Y[:, t, None]
+        live = (t < n)[:, None]
+        yhat = level + phi * trend
+        e = np.where(live, y - yhat, 0.0)
+        sse += e * e
+        level = np.where(live, yhat + alpha * e, level)
+        trend = np.where(live, phi * trend + ab * e, trend)
+        n_err += live[:, 0]
+    return level, trend, sse, n_err
+
+
 @dataclass
 class ETSTotals:
     team: str
     fitted: np.ndarray
+    forecast: float | None = None
 
 def fit_team_ets(df_team_series: pd.DataFrame, team: str) -> ETSTotals:
     y = df_team_series["team_goals"].astype(float).values
@@ -20,7 +82,165 @@ def fit_team_ets(df_team_series: pd.DataFrame, team: str) -> ETSTotals:
         return ETSTotals(team=team, fitted=fitted)
     model = ExponentialSmoothing(y, trend="add", damped_trend=True, seasonal=None)
     fit = model.fit(optimized=True)
-    return ETSTotals(team=team, fitted=fit.fittedvalues)
+    return ETSTotals(team=team, fitted=fit.fittedvalues, forecast=float(fit.forecast(1)[0]))
 
 def forecast_next(fit: ETSTotals) -> float:
+    if fit.forecast is not None:
+        return fit.forecast
     return float(fit.fitted[-1]) if len(fit.fitted) else float("nan")
+
+
+class TeamETS:
+    """Per-team ETS(A,Ad,N) parameters and states for every team, fitted and updated in batch."""
+
+    def __init__(self, params: pd.DataFrame | None = None, as_of: pd.Timestamp | None = None,
+                 fitted_on: pd.Timestamp | None = None, min_games: int = 5):
+        self.params = params if params is not None else pd.DataFrame(columns=_COLS)
+        self.params = self.params.set_index("team", drop=False) if len(self.params) else self.params
+        self.as_of = as_of
+        self.fitted_on = fitted_on
+        self.min_games = min_games
+
+    @staticmethod
+    def _series(history: pd.DataFrame) -> pd.DataFrame:
+        s = history[["team", "date", "team_goals"]].dropna().copy()
+        s["team"] = s["team"].astype(str)
+        s["date"] = pd.to_datetime(s["date"], errors="coerce")
+        return s.dropna(subset=["date"])
+
+    @classmethod
+    def fit(cls, history: pd.DataFrame, min_games: int = 5) -> "TeamETS":
+        """Grid-search parameters for all teams with >= min_games games (team_goal_history frame)."""
+        eng = cls(min_games=min_games)
+        eng.params = eng._fit_teams(cls._series(history), None)
+        eng.as_of = eng.params["last_date"].max() if len(eng.params) else None
+        eng.fitted_on = eng.as_of
+        return eng
+
+    def _fit_teams(self, s: pd.DataFrame, teams: list[str] | None) -> pd.DataFrame:
+        counts = s.groupby("team").size()
+        ok = counts[counts >= self.min_games].index
+        teams = sorted(ok if teams is None else set(teams) & set(ok))
+        if not teams:
+            return pd.DataFrame(columns=_COLS)
+        Y, n = _pad(s, teams)
+        alpha, beta, phi = _grid()
+        # initial level: mean of the first min_games games; one-step errors from game 2 on
+        level0 = np.nanmean(Y[:, :self.min_games], axis=1, keepdims=True)
+        level, trend, sse, n_err = _run(Y, n, level0, 0.0, alpha, beta, phi, t0=1)
+        best = np.argmin(sse, axis=1)
+        rows = np.arange(len(teams))
+        last = s[s["team"].isin(teams)].groupby("team")["date"].max()
+        out = pd.DataFrame({
+            "team": teams, "alpha": alpha[best], "beta": beta[best], "phi": phi[best],
+            "level": level[rows, best], "trend": trend[rows, best], "sse": sse[rows, best],
+            "n_err": n_err, "n_games": n, "last_date": last.reindex(teams).to_numpy(),
+        })
+        return out.set_index("team", drop=False)
+
+    def update(self, history: pd.DataFrame) -> "TeamETS":
+        """Advance known teams by their games after `last_date`; fit teams not seen before."""
+        s = self._series(history)
+        p = self.params
+        if len(p):
+            last = s["team"].map(p["last_date"])
+            new = s[last.notna() & (s["date"] > last)]
+            teams = sorted(new["team"].unique())
+            if teams:
+                Y, n = _pad(new, teams)
+                q = p.loc[teams]
+                a, b, ph = (q[c].to_numpy()[:, None] for c in ("alpha", "beta", "phi"))
+                level, trend, sse, n_err = _run(Y, n, q["level"].to_numpy()[:, None],
+                                                q["trend"].to_numpy()[:, None], a, b, ph)
+                p = p.copy()
+                p.loc[teams, "level"] = level[:, 0]
+                p.loc[teams, "trend"] = trend[:, 0]
+                p.loc[teams, "sse"] = q["sse"].to_numpy() + sse[:, 0]
+                p.loc[teams, "n_err"] = q["n_err"].to_numpy() + n_err
+                p.loc[teams, "n_games"] = q["n_games"].to_numpy() + n
+                p.loc[teams, "last_date"] = new.groupby("team")["date"].max().reindex(teams).to_numpy()
+        unseen = sorted(set(s["team"].unique()) - set(p.index))
+        if unseen:
+            fresh = self._fit_teams(s, unseen)
+            p = pd.concat([p, fresh]) if len(p) else fresh
+        self.params = p
+        if len(p):
+            self.as_of = p["last_date"].max()
+        return self
+
+    def forecast(self, teams, q_low: float = 0.10, q_high: float = 0.90) -> pd.DataFrame:
+        """One-step forecast (mu, sd, q_low / q_high interval) for every team; NaN for unknown teams."""
+        teams = pd.Index(pd.Series(teams, dtype=object).astype(str))
+        p = self.params.reindex(teams)
+        mu = (p["level"] + p["phi"] * p["trend"]).to_numpy(dtype=np.float64)
+        sd = np.sqrt(p["sse"].to_numpy(dtype=np.float64) / np.maximum(p["n_err"].to_numpy(dtype=np.float64) - 1, 1))
+        return pd.DataFrame({
+            "team": teams, "mu": mu, "sd": sd,
+            "q10": np.maximum(mu + norm.ppf(q_low) * sd, 0.0),
+            "q90": np.maximum(mu + norm.ppf(q_high) * sd, 0.0),
+        })
+
+    def forecast_totals(self, team, opponent, q_low: float = 0.10, q_high: float = 0.90) -> pd.DataFrame:
+        """Game totals team + opponent per row; variances add, a missing side counts as 0."""
+        a, b = self.forecast(team, q_low, q_high), self.forecast(opponent, q_low, q_high)
+        mu = np.nan_to_num(a["mu"].to_numpy()) + np.nan_to_num(b["mu"].to_numpy())
+        sd = np.sqrt(np.nan_to_num(a["sd"].to_numpy()) ** 2 + np.nan_to_num(b["sd"].to_numpy()) ** 2)
+        return pd.DataFrame({
+            "mu": mu, "sd": sd,
+            "q10": np.maximum(mu + norm.ppf(q_low) * sd, 0.0),
+            "q90": np.maximum(mu + norm.ppf(q_high) * sd, 0.0),
+        })
+
+    # ---------- persistence ----------
+    def save(self, path: str | Path = ETS_STATE_DIR) -> str:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        self.params.reset_index(drop=True).to_parquet(path / "teams.parquet", index=False)
+        meta = {"as_of": None if self.as_of is None else str(pd.Timestamp(self.as_of).date()),
+                "fitted_on": None if self.fitted_on is None else str(pd.Timestamp(self.fitted_on).date()),
+                "min_games": self.min_games}
+        with open(path / "state.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        return str(path)
+
+    @classmethod
+    def load(cls, path: str | Path = ETS_STATE_DIR) -> "TeamETS | None":
+        path = Path(path)
+        if not (path / "state.json").exists():
+            return None
+        with open(path / "state.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        ts = lambda k: pd.Timestamp(meta[k]) if meta.get(k) else None
+        return cls(pd.read_parquet(path / "teams.parquet"), ts("as_of"), ts("fitted_on"),
+                   int(meta.get("min_games", 5)))
+
+
+@traced
+def team_ets(history: pd.DataFrame, path: str | Path | None = None,
+             refit_days: int | None = None) -> TeamETS:
+    """Stored team ETS advanced to `history` (a team_goal_history frame) and saved back.
+
+    Parameters are re-estimated from scratch when there is no stored state, when
+    the history no longer reaches back past it (rebuilt / different season) or
+    once the last fit is `refit_days` (WS_ETS_REFIT_DAYS, default 7) old.
+    """
+    path = path or os.getenv("WS_ETS_STATE_DIR", ETS_STATE_DIR)
+    refit_days = int(os.getenv("WS_ETS_REFIT_DAYS", "7")) if refit_days is None else refit_days
+    eng = TeamETS.load(path)
+    dates = pd.to_datetime(history["date"], errors="coerce")
+    stale = (eng is None or eng.fitted_on is None or not len(eng.params)
+             or dates.max() < eng.as_of
+             or (dates.max() - eng.fitted_on).days >= refit_days)
+    eng = TeamETS.fit(history) if stale else eng.update(history)
+    eng.save(path)
+    return eng
+
+def team_goal_history(hist: pd.DataFrame) -> pd.DataFrame:
+    """Per-game team goal totals from raw player rows (same frame the engineered history yields)."""
+    h = hist[["date", "game_id", "team", "opponent", "points"]].copy()
+    h["date"] = pd.to_datetime(h["date"], errors="coerce", dayfirst=True)
+    h["home_or_away"] = hist["home_or_away"].fillna(0.0) if "home_or_away" in hist.columns else 0.0
+    keys = ["date", "game_id", "team", "opponent", "home_or_away"]
+    return (h.groupby(keys, as_index=False)["points"]
+             .sum().rename(columns={"points": "team_goals"})
+             .sort_values("date"))
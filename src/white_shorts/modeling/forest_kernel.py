@@ -0,0 +1,197 @@
+from __future__ import annotations
+import os, warnings
+import numpy as np
+
+# Array-compiled forest inference with a memory ceiling.
+#
+# A fitted sklearn forest is flattened into one global node-id space: an
+# interleaved children array (children[2 * i] = left, children[2 * i + 1] =
+# right, leaves point at themselves), int32 split features, float32 thresholds
+# and float64 node values. Traversal walks a block of trees for every row of a
+# float32 feature block at once: each step is one gather of the split feature
+# and threshold, one compare and one gather of the next node. Leaves loop to
+# themselves, so finished cells need no masking; the live set is compacted only
+# once a good share of cells has reached a leaf.
+#
+# When the kernel is built from a live sklearn forest, leaf ids come from the
+# forest's own compiled apply() per chunk (faster than any numpy traversal and
+# threaded over trees); the flat walk serves forests that exist only as arrays
+# (compact artifacts).
+#
+# Prediction runs in row chunks sized from a memory ceiling (WS_FOREST_MEM_MB)
+# and per-cell cost, so the (rows x trees) working set never grows with the
+# batch. Mean and any set of quantiles come from one np.partition over all the
+# order statistics the quantile levels need (same "linear" definition as
+# np.quantile), instead of a full per-tree matrix and one np.quantile per level.
+#
+# Thresholds are rounded down to float32: for float32 inputs (sklearn casts X
+# to float32 too) x <= t64 holds exactly when x <= floor32(t64).
+
+MEM_MB = float(os.getenv("WS_FOREST_MEM_MB", "256"))
+TREE_BLOCK = 8
+_COMPACT_AT = 0.7          # compact the live set once fewer than 70% of cells moved
+
+
+def memory_ceiling(mem_mb: float | None = None) -> int:
+    return int((mem_mb if mem_mb is not None else MEM_MB) * 2**20)
+
+
+def chunk_rows_for(n_trees: int, bytes_per_cell: int, mem_mb: float | None = None,
+                   extra_per_row: int = 0) -> int:
+    """Rows per chunk so that rows x trees x bytes_per_cell (+ extra_per_row) fits the ceiling."""
+    per_row = max(1, n_trees * bytes_per_cell + extra_per_row)
+    return max(1, memory_ceiling(mem_mb) // per_row)
+
+
+def floor_f32(x: np.ndarray) -> np.ndarray:
+    f = np.asarray(x).astype(np.float32)
+    up = f.astype(np.float64) > x
+    f[up] = np.nextafter(f[up], np.float32(-np.inf))
+    return f
+
+
+def compile_children(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Interleaved child table from -1-terminated left/right arrays (leaves loop to themselves)."""
+    ids = np.arange(len(left), dtype=np.int32)
+    leaf = left < 0
+    children = np.empty(2 * len(left), dtype=np.int32)
+    children[0::2] = np.where(leaf, ids, left)
+    children[1::2] = np.where(leaf, ids, right)
+    return children
+
+
+def partition_quantiles(v: np.ndarray, qs: np.ndarray) -> np.ndarray:
+    """np.quantile(v, qs, axis=1).T ("linear") from a single partition pass; v is modified."""
+    n = v.shape[1]
+    pos = np.asarray(qs, dtype=np.float64) * (n - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, n - 1)
+    v.partition(np.unique(np.concatenate([lo, hi])), axis=1)
+    a, b = v[:, lo], v[:, hi]
+    t = pos - lo
+    d = b - a
+    # numpy's _lerp: interpolate from whichever end is closer
+    return np.where(t >= 0.5, b - d * (1 - t), a + d * t)
+
+
+class FlatForest:
+    """Forest structure as flat arrays in one global node-id space (leaf ids match QuantileForest)."""
+
+    def __init__(self, children, feature, threshold, roots):
+        self.children = children                     # int32 (2 * n_nodes,), leaves point at themselves
+        self.feature, self.threshold = feature, threshold
+        self.roots = roots                           # global id of each tree's root
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, forest, n_trees: int | None = None) -> "FlatForest":
+        trees = [e.tree_ for e in forest.estimators_[:n_trees]]
+        offsets = np.concatenate([[0], np.cumsum([t.node_count for t in trees])])
+        left, right = [], []
+        for t, off in zip(trees, offsets):
+            leaf = t.children_left < 0
+            left.append(np.where(leaf, -1, t.children_left + off))
+            right.append(np.where(leaf, -1, t.children_right + off))
+        return cls(compile_children(np.concatenate(left), np.concatenate(right)),
+                   np.concatenate([t.feature for t in trees]).astype(np.int32),
+                   floor_f32(np.concatenate([t.threshold for t in trees])),
+                   offsets[:-1].astype(np.int64))
+
+    def _walk(self, xf: np.ndarray, n: int, d: int, roots: np.ndarray) -> np.ndarray:
+        """Leaf ids for n rows (flat row-major float32 block) x the given trees, shape (n * len(roots),)."""
+        idx_t = np.int64 if n * d >= 2**31 else np.int32
+        node = np.tile(roots.astype(np.int32), n)
+        base = np.repeat(np.arange(n, dtype=idx_t) * d, len(roots))
+        out = np.empty(node.size, dtype=np.int32)
+        live = np.arange(node.size)
+        children, feature, threshold = self.children, self.feature, self.threshold
+        while live.size:
+            step = node << 1
+            # leaf features are negative sentinels: the gather is harmless, the node loops to itself
+            step += xf[base + feature[node]] > threshold[node]
+            nxt = children[step]
+            moved = nxt != node
+            node = nxt
+            if np.count_nonzero(moved) < _COMPACT_AT * moved.size:
+                done = ~moved
+                out[live[done]] = node[done]
+                live, node, base = live[moved], node[moved], base[moved]
+        return out
+
+    def apply(self, X: np.ndarray, tree_block: int = TREE_BLOCK) -> np.ndarray:
+        """Global leaf ids, shape (rows, trees)."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n, d = X.shape
+        n_trees = len(self.roots)
+        xf = X.ravel()
+        out = np.empty((n, n_trees), dtype=np.int64)
+        for t0 in range(0, n_trees, tree_block):
+            t1 = min(t0 + tree_block, n_trees)
+            out[:, t0:t1] = self._walk(xf, n, d, self.roots[t0:t1]).reshape(n, t1 - t0)
+        return out
+
+
+class ForestKernel(FlatForest):
+    """FlatForest plus node values: mean and quantiles of per-tree predictions in bounded memory."""
+
+    # per (row, tree) cell: int64 leaf id + shifted copy, gathered float64 value + row-major copy
+    BYTES_PER_CELL = 32
+
+    def __init__(self, children, feature, threshold, roots, value, forest=None):
+        super().__init__(children, feature, threshold, roots)
+        self.value = value                           # float64 (n_nodes,), prediction at each leaf
+        self.forest = forest                         # source sklearn forest (compiled apply), if any
+
+    @classmethod
+    def from_sklearn(cls, forest, n_trees: int | None = None, output: int = 0) -> "ForestKernel":
+        flat = FlatForest.from_sklearn(forest, n_trees)
+        value = np.concatenate([e.tree_.value[:, output, 0] for e in forest.estimators_[:n_trees]])
+        full = n_trees is None or n_trees >= len(forest.estimators_)
+        return cls(flat.children, flat.feature, flat.threshold, flat.roots, value.astype(np.float64),
+                   forest if full else None)
+
+    def _sklearn_apply(self, X: np.ndarray) -> np.ndarray:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # fitted with feature names, served arrays
+            return self.forest.apply(X)                   # (rows, trees), column-major
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """Global leaf ids, shape (rows, trees)."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if self.forest is None:
+            return self.apply(X)
+        return np.ascontiguousarray(self._sklearn_apply(X), dtype=np.int64) + self.roots
+
+    def tree_values(self, X: np.ndarray) -> np.ndarray:
+        """Per-tree predictions, shape (rows, trees) float64, row-major."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if self.forest is None:
+            return self.value[self.apply(X)]
+        # gather tree by tree (each tree's values stay in cache), then one transpose
+        # copy; row-major keeps the per-row mean summation order of the per-tree path
+        vt = self.value[self._sklearn_apply(X).T + self.roots[:, None]]
+        return np.ascontiguousarray(vt.T)
+
+    def chunk_rows(self, mem_mb: float | None = None) -> int:
+        return chunk_rows_for(len(self.roots), self.BYTES_PER_CELL, mem_mb)
+
+    def predict(self, X, qs=(), mem_mb: float | None = None,
+                chunk_rows: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """(mean over trees, quantiles over trees of shape (rows, len(qs))) in row chunks."""
+        X = X.to_numpy() if hasattr(X, "to_numpy") else X
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        n = len(X)
+        mean = np.empty(n, dtype=np.float64)
+        q = np.empty((n, len(qs)), dtype=np.float64)
+        step = chunk_rows or self.chunk_rows(mem_mb)
+        for r0 in range(0, n, step):
+            r1 = min(r0 + step, n)
+            v = self.tree_values(X[r0:r1])
+            mean[r0:r1] = v.mean(axis=1)
+            if len(qs):
+                q[r0:r1] = partition_quantiles(v, qs)
+        return mean, q
@@ -6,8 +6,7 @@ from pathlib import Path
 import joblib
 from .trainers import ModelBundle
 import hashlib
-from .io_meta import write_model_meta
-from .metadata import infer_train_meta, write_meta
+from . import registry
 
 # Normalize WS_MODELS_DIR (handles backslashes, trailing slashes, etc.)
 DEFAULT_DIR = Path(os.getenv("WS_MODELS_DIR", "models")).expanduser()
@@ -22,37 +21,18 @@ def save_model(bundle: ModelBundle, name: str | None = None, dir: Path | None =
     dir = Path(dir or DEFAULT_DIR)
     dir.mkdir(parents=True, exist_ok=True)
     sig = feature_sig(bundle.features)
-    fname = name or f"{bundle.model_name}_{sig}_{bundle.model_version}.joblib"
+    fname = name or f"{registry.artifact_stem(bundle.model_name, sig, bundle.model_version)}.joblib"
     path = dir / fname
+    tmp = path.with_name(f".{fname}.tmp")
     joblib.dump({
         "model": bundle.model,
         "features": bundle.features,
         "target": bundle.target,
         "model_name": bundle.model_name,
         "model_version": bundle.model_version,
-    }, path)
-    try:
-        #-----------------------------------------------------------------
-        meta = infer_train_meta(
-        bundle=bundle,
-        train_df=train_df,  # the frame you trained on (or a representative sample)
-        extras={"rows_last_season": int(n_last), "rows_current": int(n_cur)},
-    )
-    
-        write_meta(fname.replace(".joblib", ".meta.json"), meta)
-        #-----------------------------------------------------------------
-        write_model_meta(
-            path,
-            model_name=bundle.model_name,
-            model_version=bundle.model_version,
-            target=bundle.target,
-            features=bundle.features,
-            train_rows_last_season=getattr(bundle, "train_rows_last_season", None),
-            train_rows_current=getattr(bundle, "train_rows_current", None),
-            train_cutoff_max_date=str(getattr(bundle, "train_cutoff_max_date", "")) or None,
-        )
-    except Exception as e:
-        print(f"[warn] failed to write model meta: {e}")
+    }, tmp)
+    os.replace(tmp, path)
+    registry.register(bundle, path, sig, fmt="joblib")
     return str(path)
 
 def load_model(name_or_path: str, dir: Path | None = None) -> dict:
@@ -61,18 +41,25 @@ def load_model(name_or_path: str, dir: Path | None = None) -> dict:
     or an absolute/relative path (e.g. 'models\\lgbm_poisson_points_0.3.0.joblib').
     """
     p = Path(name_or_path)
-    if p.exists():                      # full path given -> use as-is
-        return joblib.load(p)
-    base = Path(dir or DEFAULT_DIR)     # filename only -> join with models dir
-    return joblib.load(base / name_or_path)
+    if not p.exists():                  # filename only -> join with models dir
+        p = Path(dir or DEFAULT_DIR) / name_or_path
+    return registry.cache.get(p, joblib.load)
 
 def latest_model_path(prefix: str, features: list[str], dir: Path | None = None) -> str | None:
+    """Active registered model for (prefix, feature signature), or None.
+
+    Models saved before the registry existed are adopted once: when the slot has
+    never been registered, the newest file with exactly this feature signature is
+    registered and served from then on. Nothing trained on other features is used.
+    """
     dir = Path(dir or DEFAULT_DIR)
     sig = feature_sig(features)
-    # Prefer exact sig
+    found = registry.resolve(dir, prefix, sig)
+    if found or registry.active(dir, prefix, sig) is not None:
+        return found
     candidates = sorted(dir.glob(f"{prefix}_{sig}_*.joblib"), key=lambda p: p.stat().st_mtime, reverse=True)
-    if candidates:
-        return str(candidates[0])
-    # Fallback to any prefix (kept for dev), but this may be mismatched
-    fallback = sorted(dir.glob(f"{prefix}_*.joblib"), key=lambda p: p.stat().st_mtime, reverse=True)
-    return str(fallback[0]) if fallback else None
\ No newline at end of file
+    if not candidates:
+        return None
+    registry.adopt(candidates[0], prefix, sig, fmt="joblib")
+    print(f"[registry] adopted unregistered model {candidates[0].name}")
+    return str(candidates[0])
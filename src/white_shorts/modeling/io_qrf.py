@@ -1,8 +1,9 @@
 from __future__ import annotations
 from pathlib import Path
 import os, hashlib, joblib
-from .io_meta import write_model_meta
-from ..modeling.metadata import infer_train_meta, write_meta
+from . import registry
+from .artifacts import SUFFIX as ARTIFACT_SUFFIX, save_artifact, load_artifact
+from .qrf_forest import QuantileForest
 
 DEFAULT_DIR = Path(os.getenv("WS_MODELS_DIR", "models")).expanduser()
 
@@ -10,46 +11,87 @@ def _sig(features: list[str]) -> str:
     s = "|".join(features)
     return hashlib.sha1(s.encode("utf-8")).hexdigest()[:8]
 
-def save_qrf(bundle) -> str:
+def save_qrf(bundle, fmt: str | None = None) -> str:
+    """fmt (env WS_QRF_FORMAT): "joblib" (default), "compact" (mmap-able .qrf dir) or "quantized"."""
     DEFAULT_DIR.mkdir(parents=True, exist_ok=True)
-    fname = f"{bundle.model_name}_{_sig(bundle.features)}_{bundle.model_version}.joblib"
+    fmt = fmt or os.getenv("WS_QRF_FORMAT", "joblib")
+    stem = registry.artifact_stem(bundle.model_name, _sig(bundle.features), bundle.model_version)
+    if fmt in ("compact", "quantized") and isinstance(bundle.model, QuantileForest):
+        path = save_artifact(bundle, DEFAULT_DIR / f"{stem}{ARTIFACT_SUFFIX}", quantize=fmt == "quantized")
+        registry.register(bundle, path, _sig(bundle.features), fmt=fmt)
+        return path
+    fname = f"{stem}.joblib"
     path = DEFAULT_DIR / fname
+    tmp = path.with_name(f".{fname}.tmp")
     joblib.dump({
         "model": bundle.model,
         "features": bundle.features,
         "target": bundle.target,
+        "targets": getattr(bundle, "targets", None),
         "model_name": bundle.model_name,
         "model_version": bundle.model_version,
-    }, path)
-    try:
-        #-----------------------------------------------------------------
-        meta = infer_train_meta(
-        bundle=bundle,
-        train_df=train_df,  # the frame you trained on (or a representative sample)
-        extras={"rows_last_season": int(n_last), "rows_current": int(n_cur)},
-    )
-    
-        write_meta(fname.replace(".joblib", ".meta.json"), meta)
-        #-----------------------------------------------------------------
-        write_model_meta(
-            path,
-            model_name=bundle.model_name,
-            model_version=bundle.model_version,
-            target=bundle.target,
-            features=bundle.features,
-            train_rows_last_season=getattr(bundle, "train_rows_last_season", None),
-            train_rows_current=getattr(bundle, "train_rows_current", None),
-            train_cutoff_max_date=str(getattr(bundle, "train_cutoff_max_date", "")) or None,
-        )
-    except Exception as e:
-        print(f"[warn] failed to write model meta: {e}")
+    }, tmp)
+    os.replace(tmp, path)
+    registry.register(bundle, path, _sig(bundle.features), fmt="joblib")
     return str(path)
 
+def _candidates(pattern: str) -> list[Path]:
+    """joblib files and compact artifact dirs matching `pattern`, newest first."""
+    found = list(DEFAULT_DIR.glob(f"{pattern}.joblib")) + list(DEFAULT_DIR.glob(f"{pattern}{ARTIFACT_SUFFIX}"))
+    return sorted(found, key=lambda p: p.stat().st_mtime, reverse=True)
+
+def _resolve(prefix: str, sig: str) -> str | None:
+    """Active registered model for (prefix, sig).
+
+    Models saved before the registry existed are adopted once: when the slot has
+    never been registered, the newest file with exactly this feature signature is
+    registered and served from then on. Nothing trained on other features is used.
+    """
+    found = registry.resolve(DEFAULT_DIR, prefix, sig)
+    if found or registry.active(DEFAULT_DIR, prefix, sig) is not None:
+        return found
+    cand = _candidates(f"{prefix}_{sig}_*")
+    if not cand:
+        return None
+    registry.adopt(cand[0], prefix, sig, fmt="compact" if cand[0].is_dir() else "joblib")
+    print(f"[registry] adopted unregistered model {cand[0].name}")
+    return str(cand[0])
+
+def _load_uncached(path: str) -> dict:
+    p = Path(path)
+    return load_artifact(p) if p.is_dir() else joblib.load(p)
+
+def load_path(path: str | Path) -> dict:
+    """Load a saved QRF bundle dict (via the in-process LRU); compact artifacts are memory-mapped."""
+    return registry.cache.get(path, _load_uncached)
+
+def latest_path(prefix: str, features: list[str]) -> str | None:
+    """Active registered model for this feature signature (None if there is none)."""
+    DEFAULT_DIR.mkdir(parents=True, exist_ok=True)
+    return _resolve(prefix, _sig(features))
+
 def load_latest(prefix: str, features: list[str]) -> dict | None:
+    path = latest_path(prefix, features)
+    return load_path(path) if path else None
+
+MULTI_PREFIX = "rf_qrf_multi"
+
+def multi_enabled() -> bool:
+    """WS_QRF_MULTI=1: train/serve one multi-output forest instead of a forest per target."""
+    return os.getenv("WS_QRF_MULTI", "0").lower() in ("1", "true", "yes")
+
+def load_latest_multi(features: list[str], target: str | None = None) -> dict | None:
+    """Latest multi-output bundle for `features`; with `target`, a per-target view of it.
+
+    The bundle is loaded once per process (model cache), so serving every target costs one load.
+    """
     DEFAULT_DIR.mkdir(parents=True, exist_ok=True)
-    sig = _sig(features)
-    cand = sorted(DEFAULT_DIR.glob(f"{prefix}_{sig}_*.joblib"), key=lambda p: p.stat().st_mtime, reverse=True)
-    if cand:
-        return joblib.load(cand[0])
-    cand = sorted(DEFAULT_DIR.glob(f"{prefix}_*.joblib"), key=lambda p: p.stat().st_mtime, reverse=True)
-    return joblib.load(cand[0]) if cand else None
+    path = _resolve(MULTI_PREFIX, _sig(features))
+    d = load_path(path) if path else None
+    if not d or d.get("features") != features or not d.get("targets"):
+        return None
+    if target is None:
+        return d
+    if target not in d["targets"]:
+        return None
+    return dict(d, target=target, output=d["targets"].index(target))
@@ -0,0 +1,68 @@
+from __future__ import annotations
+import hashlib, json, os
+from pathlib import Path
+import pandas as pd
+import lightgbm as lgb
+from .registry import data_fingerprint
+from ..utils.trace import traced
+
+# Shared binned LightGBM datasets.
+#
+# The four player-count models train on the same feature matrix, and LightGBM's
+# Dataset construction (bin boundaries per feature + the binned matrix) is the
+# same for all of them: binning never looks at the label. The matrix is binned
+# once and written with save_binary; every target's job loads the binary file
+# (a straight read, no re-binning) and attaches its own label and weights.
+# Files are keyed on the feature content fingerprint, the binning parameters
+# and the LightGBM version, so re-running `train all` on unchanged features
+# skips construction entirely. The path (not the Dataset) is what gets passed
+# to the trainer, so it also crosses process-pool boundaries for free.
+
+LGB_CACHE_DIR = Path(os.getenv("WS_CACHE_DIR", "data/cache")) / "lgb"
+KEEP = int(os.getenv("WS_LGB_DATASET_KEEP", "4"))
+
+# Construction-time parameters; must match the training parameters they share
+# (min_data_in_leaf drives feature_pre_filter).
+BIN_PARAMS = {"max_bin": 255, "bin_construct_sample_cnt": 200000, "min_data_in_leaf": 20,
+              "feature_pre_filter": True, "verbosity": -1}
+
+
+def dataset_key(df: pd.DataFrame, features: list[str], params: dict | None = None) -> str:
+    spec = json.dumps({"params": params or BIN_PARAMS, "lgb": lgb.__version__, "features": list(features)},
+                      sort_keys=True)
+    return f"{data_fingerprint(df, list(features))}_{hashlib.sha1(spec.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _prune(cache_dir: Path, keep: int) -> None:
+    files = sorted(cache_dir.glob("*.bin"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for p in files[keep:]:
+        p.unlink(missing_ok=True)
+
+
+@traced
+def shared_dataset(df: pd.DataFrame, features: list[str], cache_dir: str | Path | None = None,
+                   params: dict | None = None) -> tuple[str, bool]:
+    """Binary binned Dataset for df[features] (label-free). Returns (path, built_now)."""
+    cache_dir = Path(cache_dir or LGB_CACHE_DIR)
+    path = cache_dir / f"{dataset_key(df, features, params)}.bin"
+    if path.exists():
+        os.utime(path)                      # keep recently used files out of the prune
+        return str(path), False
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    ds = lgb.Dataset(df[features].fillna(0), params=dict(params or BIN_PARAMS), free_raw_data=True)
+    ds.construct()
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    ds.save_binary(str(tmp))
+    os.replace(tmp, path)
+    _prune(cache_dir, KEEP)
+    return str(path), True
+
+
+def load_dataset(path: str | Path, label, weight=None, params: dict | None = None) -> lgb.Dataset:
+    """Load a shared binary Dataset and attach one target's label / weights."""
+    ds = lgb.Dataset(str(path), params=dict(params or BIN_PARAMS))
+    ds.construct()
+    ds.set_label(label)
+    if weight is not None:
+        ds.set_weight(weight)
+    return ds
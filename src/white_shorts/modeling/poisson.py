@@ -1,5 +1,8 @@
 from __future__ import annotations
 import json
+from functools import lru_cache
+import numpy as np
+from scipy.special import gammainccinv
 from scipy.stats import poisson
 
 def poisson_quantiles(lmbda: float, q_low: float = 0.10, q_high: float = 0.90) -> tuple[float,float]:
@@ -18,3 +21,84 @@ def p_ge_k_array(lmbda: float, k_max: int = 10) -> list[float]:
 
 def p_ge_k_json(lmbda: float, k_max: int = 10) -> str:
     return json.dumps(p_ge_k_array(lmbda, k_max))
+
+# ---------- array kernels (all rows in one call) ----------
+#
+# Quantiles: the Poisson CDF at k falls monotonically in lambda, and
+# CDF(k; lam) = Q(k + 1, lam) (regularized upper incomplete gamma), so the q-th
+# quantile jumps from k to k + 1 exactly at lam*_k = gammainccinv(k + 1, q).
+# The quantile of every row is then one searchsorted over those breakpoints:
+# no per-row ppf and no CDF matrix.
+#
+# P(X >= k): the PMF by the recurrence p_k = p_{k-1} * lam / k, cumulated over
+# k for all rows at once; or read from a precomputed CDF table over a lambda
+# grid with linear interpolation (PoissonCDFTable, ~1e-7 abs error at the
+# default step).
+
+def _mu(lmbda) -> np.ndarray:
+    return np.maximum(np.asarray(lmbda, dtype=np.float64), 1e-8)
+
+@lru_cache(maxsize=32)
+def _breakpoints(q: float, k_hi: int) -> np.ndarray:
+    return gammainccinv(np.arange(1, k_hi + 1, dtype=np.float64), q)
+
+def poisson_quantiles_array(lmbda, qs=(0.10, 0.90)) -> np.ndarray:
+    """Poisson quantiles (same as poisson.ppf) for every row and level, shape (n_rows, len(qs))."""
+    mu = _mu(lmbda).ravel()
+    out = np.empty((len(mu), len(qs)), dtype=np.float64)
+    finite = mu[np.isfinite(mu)]
+    hi = float(finite.max()) if len(finite) else 0.0
+    k_hi = int(np.ceil(hi + 12 * np.sqrt(hi) + 20))
+    for j, q in enumerate(qs):
+        out[:, j] = np.searchsorted(_breakpoints(float(q), k_hi), mu, side="left")
+    out[np.isnan(mu)] = np.nan
+    return out
+
+def poisson_cdf_matrix(lmbda, k_max: int) -> np.ndarray:
+    """CDF(k; lam) for k = 0..k_max, shape (n_rows, k_max + 1)."""
+    mu = _mu(lmbda).ravel()
+    pmf = np.empty((len(mu), k_max + 1), dtype=np.float64)
+    pmf[:, 0] = np.exp(-mu)
+    for k in range(1, k_max + 1):
+        np.multiply(pmf[:, k - 1], mu / k, out=pmf[:, k])
+    return np.minimum(np.cumsum(pmf, axis=1), 1.0)
+
+class PoissonCDFTable:
+    """CDF(k; lam) precomputed on lam = 0, step, ..., lam_max for k = 0..k_max."""
+
+    def __init__(self, lam_max: float = 20.0, step: float = 1e-3, k_max: int = 20):
+        self.step, self.lam_max, self.k_max = step, lam_max, k_max
+        grid = np.arange(0.0, lam_max + 2 * step, step)
+        self.table = poisson_cdf_matrix(grid, k_max)
+
+    def cdf(self, lmbda, k_max: int) -> np.ndarray:
+        mu = _mu(lmbda).ravel()
+        if k_max > self.k_max or (len(mu) and not np.all(mu <= self.lam_max)):
+            return poisson_cdf_matrix(mu, k_max)           # outside the table (or NaN): exact path
+        pos = mu / self.step
+        i = np.minimum(pos.astype(np.int64), len(self.table) - 2)
+        w = (pos - i)[:, None]
+        lo, hi = self.table[i, :k_max + 1], self.table[i + 1, :k_max + 1]
+        return lo + w * (hi - lo)
+
+@lru_cache(maxsize=1)
+def default_cdf_table() -> PoissonCDFTable:
+    return PoissonCDFTable()
+
+def p_ge_k_matrix(lmbda, k_max: int = 10, table: PoissonCDFTable | None = None) -> np.ndarray:
+    """P(X >= k) for k = 0..k_max and every row (same as p_ge_k_array), shape (n_rows, k_max + 1)."""
+    mu = _mu(lmbda).ravel()
+    out = np.ones((len(mu), k_max + 1), dtype=np.float64)
+    if k_max > 0:
+        cdf = table.cdf(mu, k_max - 1) if table is not None else poisson_cdf_matrix(mu, k_max - 1)
+        out[:, 1:] = 1.0 - cdf
+    return out
+
+def p_ge_k_json_array(lmbda, k_max: int = 10, table: PoissonCDFTable | None = None) -> list[str]:
+    """JSON list of P(X >= k) per row, for the p_ge_k_json column."""
+    mat = p_ge_k_matrix(lmbda, k_max, table)
+    finite = np.isfinite(mat).all(axis=1).tolist()
+    # float repr is exactly what json.dumps writes for finite floats; rows with a
+    # NaN/inf go through json.dumps itself (NaN / Infinity, as the per-row path)
+    return [f"[{', '.join(map(repr, row))}]" if ok else json.dumps(row)
+            for row, ok in zip(mat.tolist(), finite)]
@@ -1,8 +1,13 @@
 ﻿from __future__ import annotations
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from .poisson import poisson_quantiles, p_ge_k_json
+from .poisson import poisson_quantiles_array, p_ge_k_json_array, default_cdf_table
+
+def _cdf_table():
+    # WS_POISSON_TABLE=1: P(X>=k) from the precomputed lambda-grid CDF table (~1e-7 abs error)
+    return default_cdf_table() if os.getenv("WS_POISSON_TABLE", "0") == "1" else None
 
 def _normalize_target(val) -> str:
     # Accept enums or strings and emit canonical lowercase strings
@@ -27,7 +32,7 @@ def predict_player_counts(model_bundle, df_features: pd.DataFrame, run_id: str,
         lam = np.clip(lam, 0, 12)
 
 
-    q10, q90 = zip(*[poisson_quantiles(float(l)) for l in lam]) if len(lam) else ([], [])
+    q = poisson_quantiles_array(lam, (0.10, 0.90))
 
     out = df_features[["date","game_id","team","opponent","player_id","name"]].copy()
     out["target"] = _normalize_target(target)           # ← normalize here
@@ -35,9 +40,9 @@ def predict_player_counts(model_bundle, df_features: pd.DataFrame, run_id: str,
     out["model_version"] = model_bundle.model_version
     out["distribution"] = "poisson"
     out["lambda_or_mu"] = lam
-    out["q10"] = list(map(float, q10)) if q10 else []
-    out["q90"] = list(map(float, q90)) if q90 else []
-    out["p_ge_k_json"] = [p_ge_k_json(float(l), 10) for l in lam]
+    out["q10"] = q[:, 0]
+    out["q90"] = q[:, 1]
+    out["p_ge_k_json"] = p_ge_k_json_array(lam, 10, _cdf_table())
     out["run_id"] = run_id
     out["created_ts"] = datetime.utcnow()
     return out
@@ -50,7 +55,7 @@ def predict_match_totals(home_bundle, away_bundle, df_match_rows: pd.DataFrame,
     lam_h = home_bundle.model.predict(Xh)
     lam_a = away_bundle.model.predict(Xa)
     lam_total = lam_h + lam_a
-    q10, q90 = zip(*[poisson_quantiles(float(l)) for l in lam_total]) if len(lam_total) else ([], [])
+    q = poisson_quantiles_array(lam_total, (0.10, 0.90))
 
     out = df_match_rows[["date","game_id","team","opponent"]].copy()
     out["player_id"] = None
@@ -60,9 +65,9 @@ def predict_match_totals(home_bundle, away_bundle, df_match_rows: pd.DataFrame,
     out["model_version"] = home_bundle.model_version
     out["distribution"] = "poisson"
     out["lambda_or_mu"] = lam_total
-    out["q10"] = list(map(float, q10)) if q10 else []
-    out["q90"] = list(map(float, q90)) if q90 else []
-    out["p_ge_k_json"] = [p_ge_k_json(float(l), 15) for l in lam_total]
+    out["q10"] = q[:, 0]
+    out["q90"] = q[:, 1]
+    out["p_ge_k_json"] = p_ge_k_json_array(lam_total, 15, _cdf_table())
     out["run_id"] = run_id
     out["created_ts"] = pd.Timestamp.utcnow().to_pydatetime()
     return out
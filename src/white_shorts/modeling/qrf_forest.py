@@ -0,0 +1,217 @@
+from __future__ import annotations
+import warnings
+import numpy as np
+from .forest_kernel import chunk_rows_for
+
+# Meinshausen (2006) quantile regression forest on top of a fitted sklearn forest.
+#
+# Fit: every training row is dropped down every tree (tree_.apply) and, per
+# leaf, the distribution of training targets is stored as (value code, weight)
+# pairs with weight = count / leaf size. Leaves of all trees share one global id
+# space (node id + per-tree offset), so the index is a single CSR structure.
+#
+# Predict: the query's leaf ids from apply() select CSR segments; their weights
+# are scattered with one bincount into an (n_rows, n_values) conditional PMF,
+# averaged over trees. Its cumulative sum is the conditional CDF, from which any
+# quantile grid is read in one vectorized pass. When the target has few distinct
+# values (player counts) the per-leaf distributions are kept as a dense table
+# instead, and a query is one gather + sum over trees. Targets with more than
+# `max_values` distinct values are snapped to a quantile grid of that size.
+# A multi-output forest keeps one such index per output over the shared leaves.
+# Queries run in row chunks sized from the forest_kernel memory ceiling
+# (WS_FOREST_MEM_MB), so batch size never changes peak memory.
+
+
+def _as_float32(X) -> np.ndarray:
+    X = X.to_numpy() if hasattr(X, "to_numpy") else X
+    return np.ascontiguousarray(X, dtype=np.float32)
+
+
+class _LeafIndex:
+    """Per-output leaf -> training-target distribution (dense table or CSR)."""
+
+    def __init__(self, values, leaf, codes, counts, n_nodes, leaf_value,
+                 dense_max_values: int, dense_max_cells: int):
+        self.values = values
+        self.leaf_value = leaf_value
+        K = len(values)
+        size = np.bincount(leaf, weights=counts, minlength=n_nodes)
+        weights = (counts / size[leaf]).astype(np.float32)
+        nodes = np.unique(leaf)
+        if K <= dense_max_values and len(nodes) * K <= dense_max_cells:
+            # few distinct targets (counts): dense per-leaf PMF table, one gather per query
+            self.leaf_row = np.full(n_nodes, len(nodes), dtype=np.int32)   # last row = empty leaf
+            self.leaf_row[nodes] = np.arange(len(nodes), dtype=np.int32)
+            # stored (values, leaves): one contiguous take per value is cheaper than a row gather
+            self.table = np.zeros((K, len(nodes) + 1), dtype=np.float32)
+            self.table[codes, self.leaf_row[leaf]] = weights
+            self.codes = self.weights = self.leaf_ptr = None
+        else:
+            self.leaf_row = self.table = None
+            self.codes = codes.astype(np.int32 if K > 32767 else np.int16)
+            self.weights = weights
+            ptr = np.zeros(n_nodes + 1, dtype=np.int64)
+            np.cumsum(np.bincount(leaf, minlength=n_nodes), out=ptr[1:])
+            self.leaf_ptr = ptr.astype(np.int32) if ptr[-1] < np.iinfo(np.int32).max else ptr
+
+    def pmf(self, leaves: np.ndarray) -> np.ndarray:
+        """Tree-averaged conditional PMF over `values` for a (rows, trees) leaf matrix."""
+        n, n_trees = leaves.shape
+        K = len(self.values)
+        if self.table is not None:
+            rows = self.leaf_row[leaves]
+            p = np.stack([np.take(self.table[k], rows).sum(axis=1, dtype=np.float64) for k in range(K)], axis=1)
+            return p / n_trees
+        start = self.leaf_ptr[leaves].ravel().astype(np.int64)
+        length = (self.leaf_ptr[leaves + 1].ravel() - start).astype(np.int64)
+        row = np.repeat(np.repeat(np.arange(n), n_trees), length)
+        # positions start[j] .. start[j]+length[j]-1 for every (row, tree) segment
+        seg_start = np.repeat(start - np.concatenate([[0], np.cumsum(length)[:-1]]), length)
+        idx = seg_start + np.arange(int(length.sum()))
+        acc = np.bincount(row * K + self.codes[idx], weights=self.weights[idx], minlength=n * K)
+        return acc.reshape(n, K) / n_trees
+
+    def quantiles(self, p: np.ndarray, qs: np.ndarray) -> np.ndarray:
+        cdf = np.cumsum(p, axis=1)
+        # smallest value whose CDF reaches q (tolerance for float32 weights)
+        hit = cdf[:, :, None] >= (qs[None, None, :] - 1e-6)
+        return self.values[np.argmax(hit, axis=1)]
+
+
+def _value_grid(y: np.ndarray, max_values: int) -> tuple[np.ndarray, np.ndarray]:
+    ok = y[~np.isnan(y)]
+    values = np.unique(ok)
+    if len(values) > max_values:
+        values = np.unique(np.quantile(ok, np.linspace(0, 1, max_values)))
+    codes = np.clip(np.searchsorted(values, y, side="left"), 0, len(values) - 1)
+    return values, codes
+
+
+class QuantileForest:
+    """A fitted forest plus its leaf -> training-target index.
+
+    `y` may be 2-D (rows, outputs) for a multi-output forest; every output gets its
+    own index over the shared leaves, so one apply() serves all of them. `scale`
+    undoes per-output target scaling applied before fitting (leaf means only).
+    """
+
+    def __init__(self, forest, X, y, max_values: int = 1024, tree_block: int = 64,
+                 dense_max_values: int = 64, dense_max_cells: int = 64_000_000,
+                 targets: list[str] | None = None, scale=None):
+        self.forest = forest
+        Y = np.asarray(y, dtype=np.float64)
+        Y = Y.reshape(len(Y), -1)
+        n_out = Y.shape[1]
+        self.targets = list(targets) if targets is not None else None
+        scale = np.ones(n_out) if scale is None else np.asarray(scale, dtype=np.float64)
+        self.scale = scale
+
+        trees = [e.tree_ for e in forest.estimators_]
+        self.n_trees = len(trees)
+        self.node_offsets = np.concatenate([[0], np.cumsum([t.node_count for t in trees])]).astype(np.int64)
+        n_nodes = int(self.node_offsets[-1])
+
+        grids = [_value_grid(Y[:, j], max_values) for j in range(n_out)]
+        oks = [~np.isnan(Y[:, j]) for j in range(n_out)]
+        keys_parts = [[] for _ in range(n_out)]
+        counts_parts = [[] for _ in range(n_out)]
+        X = _as_float32(X)
+        # tree blocks bound the (rows x trees) leaf matrix held at once
+        for b0 in range(0, self.n_trees, tree_block):
+            b1 = min(b0 + tree_block, self.n_trees)
+            leaves = self._leaves(X, b0, b1)
+            for j, ((values, codes), ok) in enumerate(zip(grids, oks)):
+                k, c = np.unique((leaves[ok] * len(values) + codes[ok, None]).ravel(), return_counts=True)
+                keys_parts[j].append(k)
+                counts_parts[j].append(c)
+
+        self.outputs: list[_LeafIndex] = []
+        for j, (values, _) in enumerate(grids):
+            keys = np.concatenate(keys_parts[j])
+            K = len(values)
+            # leaf outputs of every tree, so the mean needs no second pass over the trees
+            leaf_value = np.concatenate([t.value[:, j, 0] for t in trees]).astype(np.float64) * scale[j]
+            self.outputs.append(_LeafIndex(values, keys // K, keys % K,
+                                           np.concatenate(counts_parts[j]).astype(np.float64),
+                                           n_nodes, leaf_value, dense_max_values, dense_max_cells))
+
+    @property
+    def values(self) -> np.ndarray:
+        return self.outputs[0].values
+
+    def output_index(self, target: str | int | None) -> int:
+        if target is None or isinstance(target, (int, np.integer)):
+            return int(target or 0)
+        if self.targets is None or target not in self.targets:
+            raise KeyError(f"forest has no output {target!r} (outputs: {self.targets})")
+        return self.targets.index(target)
+
+    # ---------- inference ----------
+    def predict(self, X, output: str | int | None = None) -> np.ndarray:
+        """Forest mean (same as the wrapped forest's predict)."""
+        idx = self.outputs[self.output_index(output)]
+        out = np.empty(len(X), dtype=np.float64)
+        for r0, r1, leaves in self._leaf_chunks(X, None):
+            out[r0:r1] = idx.leaf_value[leaves].mean(axis=1, dtype=np.float64)
+        return out
+
+    def predict_with_quantiles(self, X, qs, chunk_rows: int | None = None,
+                               output: str | int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """(forest mean, quantiles) from a single pass over the trees."""
+        return self.predict_all(X, qs, chunk_rows, outputs=[self.output_index(output)])[0]
+
+    def predict_all(self, X, qs, chunk_rows: int | None = None,
+                    outputs: list[int] | None = None) -> list[tuple[np.ndarray, np.ndarray]]:
+        """(mean, quantiles) for every output from one apply() per chunk."""
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        outputs = list(range(len(self.outputs))) if outputs is None else outputs
+        res = [(np.empty(len(X)), np.empty((len(X), len(qs)))) for _ in outputs]
+        for r0, r1, leaves in self._leaf_chunks(X, chunk_rows):
+            for (mean, q), j in zip(res, outputs):
+                idx = self.outputs[j]
+                mean[r0:r1] = idx.leaf_value[leaves].mean(axis=1, dtype=np.float64)
+                q[r0:r1] = idx.quantiles(idx.pmf(leaves), qs)
+        return res
+
+    def _leaves(self, X: np.ndarray, t0: int = 0, t1: int | None = None) -> np.ndarray:
+        """Global leaf ids, shape (rows, trees[t0:t1])."""
+        t1 = self.n_trees if t1 is None else t1
+        if t0 == 0 and t1 == self.n_trees:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)  # fitted with feature names, served arrays
+                leaves = self.forest.apply(X)   # threaded over trees (forest n_jobs)
+        else:
+            est = self.forest.estimators_
+            leaves = np.stack([est[t].tree_.apply(X) for t in range(t0, t1)], axis=1)
+        return leaves.astype(np.int64) + self.node_offsets[t0:t1]
+
+    # per (row, tree) cell: int64 leaf ids (+ offset copy), int32 table row, float32 gather, float64 leaf value
+    BYTES_PER_CELL = 32
+
+    def chunk_rows(self, mem_mb: float | None = None) -> int:
+        K = max(len(idx.values) for idx in self.outputs)
+        return chunk_rows_for(self.n_trees, self.BYTES_PER_CELL, mem_mb, extra_per_row=K * 32)
+
+    def _leaf_chunks(self, X, chunk_rows: int | None):
+        X = _as_float32(X)
+        chunk_rows = chunk_rows or self.chunk_rows()
+        for r0 in range(0, len(X), chunk_rows):
+            r1 = min(r0 + chunk_rows, len(X))
+            yield r0, r1, self._leaves(X[r0:r1])                  # (rows, trees)
+
+    def pmf(self, X, chunk_rows: int | None = None, output: str | int | None = None) -> np.ndarray:
+        """Conditional distribution over the output's values, shape (n_rows, n_values)."""
+        idx = self.outputs[self.output_index(output)]
+        out = np.empty((len(X), len(idx.values)), dtype=np.float64)
+        for r0, r1, leaves in self._leaf_chunks(X, chunk_rows):
+            out[r0:r1] = idx.pmf(leaves)
+        return out
+
+    def quantiles(self, X, qs, chunk_rows: int | None = None, output: str | int | None = None) -> np.ndarray:
+        """Weighted conditional quantiles for every level in `qs`, shape (n_rows, len(qs))."""
+        return self.predict_with_quantiles(X, qs, chunk_rows=chunk_rows, output=output)[1]
+
+    def weighted_mean(self, X, chunk_rows: int | None = None, output: str | int | None = None) -> np.ndarray:
+        """Mean of the conditional distribution (uses all training rows, not the bootstrap)."""
+        j = self.output_index(output)
+        return self.pmf(X, chunk_rows=chunk_rows, output=j) @ self.outputs[j].values
@@ -0,0 +1,186 @@
+from __future__ import annotations
+import hashlib, json, os, sqlite3, threading
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Callable
+import pandas as pd
+
+# Model registry: one SQLite file per models directory (models/registry.sqlite).
+#
+# Every save_model / save_qrf records the artifact (name, target, feature
+# signature, version, path, format, training-data fingerprint, rows, size, train
+# duration) and points the (model_name, feature_sig) slot of `active_models` at
+# it, in one transaction after the artifact itself has been written atomically.
+# Lookups are a primary-key read of `active_models` instead of globbing the
+# directory and sorting by mtime. SQLite rather than the DuckDB warehouse: the
+# parallel trainers register from several processes at once, and SQLite's
+# locking serialises those writes where DuckDB would refuse the second writer.
+#
+# ModelCache keeps recently loaded bundles in-process (LRU, keyed by path and
+# mtime), so serving every target or re-resolving a model doesn't reload it.
+
+REGISTRY_FILE = "registry.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    id               INTEGER PRIMARY KEY AUTOINCREMENT,
+    model_name       TEXT NOT NULL,
+    target           TEXT,
+    feature_sig      TEXT NOT NULL,
+    features         TEXT,
+    model_version    TEXT,
+    path             TEXT NOT NULL,
+    format           TEXT,
+    data_fingerprint TEXT,
+    train_rows       INTEGER,
+    size_bytes       INTEGER,
+    train_seconds    REAL,
+    created_ts       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS models_name_sig ON models (model_name, feature_sig, id);
+CREATE TABLE IF NOT EXISTS active_models (
+    model_name  TEXT NOT NULL,
+    feature_sig TEXT NOT NULL,
+    model_id    INTEGER NOT NULL REFERENCES models (id),
+    PRIMARY KEY (model_name, feature_sig)
+);
+"""
+
+
+def registry_path(models_dir: str | Path) -> Path:
+    return Path(models_dir) / REGISTRY_FILE
+
+
+def _connect(models_dir: str | Path) -> sqlite3.Connection:
+    Path(models_dir).mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(registry_path(models_dir), timeout=30)
+    con.row_factory = sqlite3.Row
+    con.executescript(_SCHEMA)
+    return con
+
+
+def data_fingerprint(df: pd.DataFrame, columns: list[str] | None = None) -> str:
+    """Content hash of the training rows (order-sensitive), for provenance and retrain skipping."""
+    cols = [c for c in (columns or list(df.columns)) if c in df.columns]
+    h = pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+    return hashlib.sha1(h.tobytes() + "|".join(cols).encode("utf-8")).hexdigest()[:16]
+
+
+def artifact_stem(model_name: str, feature_sig: str, version: str) -> str:
+    """File stem for a new artifact; the UTC save time keeps every registered row's file intact."""
+    return f"{model_name}_{feature_sig}_{version}_{pd.Timestamp.utcnow():%Y%m%dT%H%M%S%f}"
+
+
+def _size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.iterdir()) if path.is_dir() else path.stat().st_size
+
+
+def _insert(path: Path, row: tuple) -> int:
+    model_name, feature_sig = row[0], row[2]
+    with closing(_connect(path.parent)) as con, con:   # one transaction: row + active pointer
+        cur = con.execute(
+            "INSERT INTO models (model_name, target, feature_sig, features, model_version, path, format,"
+            " data_fingerprint, train_rows, size_bytes, train_seconds, created_ts)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+        con.execute("INSERT OR REPLACE INTO active_models (model_name, feature_sig, model_id) VALUES (?, ?, ?)",
+                    (model_name, feature_sig, cur.lastrowid))
+        return int(cur.lastrowid)
+
+
+def register(bundle, path: str | Path, feature_sig: str, fmt: str = "joblib") -> int:
+    """Record a saved artifact and make it the active model for (model_name, feature_sig)."""
+    path = Path(path)
+    return _insert(path, (
+        bundle.model_name, bundle.target, feature_sig, json.dumps(list(bundle.features)),
+        bundle.model_version, path.name, fmt, getattr(bundle, "data_fingerprint", None),
+        getattr(bundle, "train_rows", None), _size(path), getattr(bundle, "train_seconds", None),
+        pd.Timestamp.utcnow().isoformat(),
+    ))
+
+
+def adopt(path: str | Path, model_name: str, feature_sig: str, fmt: str) -> int:
+    """One-time migration: register an artifact saved before the registry existed.
+
+    Only the file name is trusted ({model_name}_{feature_sig}_{version}); provenance
+    columns stay NULL.
+    """
+    path = Path(path)
+    version = path.stem[len(f"{model_name}_{feature_sig}_"):]
+    return _insert(path, (model_name, None, feature_sig, None, version, path.name, fmt,
+                          None, None, _size(path), None, pd.Timestamp.utcnow().isoformat()))
+
+
+def active(models_dir: str | Path, model_name: str, feature_sig: str) -> dict | None:
+    """Registry row of the active model for (model_name, feature_sig), or None."""
+    if not registry_path(models_dir).exists():
+        return None
+    with closing(_connect(models_dir)) as con:
+        r = con.execute(
+            "SELECT m.* FROM active_models a JOIN models m ON m.id = a.model_id"
+            " WHERE a.model_name = ? AND a.feature_sig = ?", (model_name, feature_sig)).fetchone()
+    return dict(r) if r else None
+
+
+def active_state(models_dir: str | Path) -> str:
+    """Hash of every active (model_name, feature_sig) -> model id pointer; changes whenever a model is registered."""
+    if not registry_path(models_dir).exists():
+        return "empty"
+    with closing(_connect(models_dir)) as con:
+        rows = con.execute("SELECT model_name, feature_sig, model_id FROM active_models"
+                           " ORDER BY model_name, feature_sig").fetchall()
+    return hashlib.sha1(json.dumps([tuple(r) for r in rows]).encode("utf-8")).hexdigest()[:16]
+
+
+def resolve(models_dir: str | Path, model_name: str, feature_sig: str) -> str | None:
+    """Path of the active model if it is registered and still on disk."""
+    r = active(models_dir, model_name, feature_sig)
+    if r is None:
+        return None
+    p = Path(models_dir) / r["path"]   # stored relative to the models dir
+    return str(p) if p.exists() else None
+
+
+def history(models_dir: str | Path, since_id: int = 0) -> pd.DataFrame:
+    """All registered artifacts with id > since_id (plus an `active` flag)."""
+    if not registry_path(models_dir).exists():
+        return pd.DataFrame()
+    with closing(_connect(models_dir)) as con:
+        return pd.read_sql_query(
+            "SELECT m.*, a.model_id IS NOT NULL AS active FROM models m"
+            " LEFT JOIN active_models a ON a.model_id = m.id WHERE m.id > ? ORDER BY m.id",
+            con, params=(since_id,))
+
+
+class ModelCache:
+    """Thread-safe LRU of loaded bundles keyed by (path, mtime)."""
+
+    def __init__(self, maxsize: int = 8):
+        self.maxsize = maxsize
+        self._items: OrderedDict[tuple[str, float], Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, path: str | Path, loader: Callable[[str], Any]) -> Any:
+        key = (str(path), os.stat(path).st_mtime)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+        value = loader(str(path))
+        with self._lock:
+            self.misses += 1
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+cache = ModelCache(int(os.getenv("WS_MODEL_CACHE_SIZE", "8")))
+
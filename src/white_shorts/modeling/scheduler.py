@@ -0,0 +1,91 @@
+from __future__ import annotations
+import os, time, traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+try:
+    from threadpoolctl import threadpool_limits
+except Exception:
+    threadpool_limits = None
+
+# Process-parallel training of independent models.
+#
+# Each job runs in its own worker process with a thread budget of
+# cpu_count // workers, passed to the trainer (LightGBM num_threads / sklearn
+# n_jobs via `thread_kw`) and enforced on BLAS/OpenMP pools with threadpoolctl,
+# so N workers x library threads never oversubscribe the runner. Finished
+# bundles are saved inside the worker (big forests never get pickled back to the
+# parent) and results stream back as jobs complete, with wall and CPU time.
+
+
+@dataclass
+class TrainJob:
+    name: str
+    fn: Callable[..., Any]                    # trainer returning a bundle (module-level, picklable)
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+    save: Callable[[Any], Any] | None = None  # e.g. save_model / save_qrf; its return value is the result
+    thread_kw: str | None = "n_jobs"          # trainer kwarg receiving the thread budget
+
+
+@dataclass
+class JobResult:
+    name: str
+    result: Any = None
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    threads: int = 1
+    error: str | None = None
+
+    def timing(self) -> str:
+        return (f"wall {self.wall_s:.1f}s, cpu {self.cpu_s:.1f}s "
+                f"({self.threads} threads, {self.cpu_s / max(self.wall_s, 1e-9):.1f}x)")
+
+    def summary(self) -> str:
+        if self.error:
+            return f"{self.name}: FAILED after {self.wall_s:.1f}s: {self.error.strip().splitlines()[-1]}"
+        return f"{self.name}: {self.timing()} -> {self.result}"
+
+
+def default_workers(n_jobs: int) -> int:
+    """WS_TRAIN_WORKERS, else one worker per job up to the core count."""
+    env = os.getenv("WS_TRAIN_WORKERS")
+    n = int(env) if env else min(n_jobs, os.cpu_count() or 1)
+    return max(1, n)
+
+
+def _run(job: TrainJob, threads: int) -> JobResult:
+    t0, c0 = time.perf_counter(), time.process_time()
+    kwargs = dict(job.kwargs)
+    if job.thread_kw:
+        kwargs[job.thread_kw] = threads
+    try:
+        if threadpool_limits is not None:
+            with threadpool_limits(limits=threads):
+                bundle = job.fn(*job.args, **kwargs)
+        else:
+            bundle = job.fn(*job.args, **kwargs)
+        result = job.save(bundle) if job.save is not None else bundle
+        error = None
+    except Exception:
+        result, error = None, traceback.format_exc()
+    # process_time covers every thread of this process (the worker runs one job at a time)
+    return JobResult(job.name, result, time.perf_counter() - t0, time.process_time() - c0, threads, error)
+
+
+def run_jobs(jobs: list[TrainJob], workers: int | None = None,
+             total_threads: int | None = None) -> Iterator[JobResult]:
+    """Run jobs over a process pool, yielding each JobResult as it finishes."""
+    if not jobs:
+        return
+    workers = min(len(jobs), workers or default_workers(len(jobs)))
+    threads = max(1, (total_threads or os.cpu_count() or 1) // workers)
+    if workers == 1:
+        for job in jobs:
+            yield _run(job, threads)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futs = [ex.submit(_run, job, threads) for job in jobs]
+        for fut in as_completed(futs):
+            yield fut.result()
@@ -1,11 +1,13 @@
 
 from __future__ import annotations
-import os
+import os, time
 
 import pandas as pd
 from dataclasses import dataclass
 from typing import Any
+import lightgbm as lgb
 from lightgbm import LGBMRegressor
+from .registry import data_fingerprint
 
 @dataclass
 class ModelBundle:
@@ -14,22 +16,61 @@ class ModelBundle:
     target: str
     model_name: str
     model_version: str
-    
-def train_player_count(df, features, target, sample_weight=None, version="0.3.0"):
-    X = df[features].fillna(0)
+    # training provenance, recorded in the model registry
+    train_rows: int = 0
+    train_seconds: float = 0.0
+    data_fingerprint: str | None = None
+
+# Native-API equivalent of the LGBMRegressor below, for training from a shared
+# binary Dataset (lgb_dataset.shared_dataset); sklearn defaults spelled out.
+_PLAYER_PARAMS = {
+    "objective": "tweedie", "tweedie_variance_power": 1.1, "learning_rate": 0.03,
+    "num_leaves": 31, "max_depth": -1, "bagging_fraction": 0.8, "bagging_freq": 0,
+    "feature_fraction": 0.8, "min_data_in_leaf": 20, "min_sum_hessian_in_leaf": 1e-3,
+    "min_gain_to_split": 0.0, "lambda_l1": 0.0, "lambda_l2": 0.0, "verbosity": -1,
+}
+_PLAYER_ROUNDS = 400
+
+def train_player_count(df, features, target, sample_weight=None, version="0.3.0", n_jobs=None,
+                       dataset: str | None = None):
+    """LightGBM Tweedie model for one player target.
+
+    `dataset` is a binary Dataset of df[features] from lgb_dataset.shared_dataset;
+    when given, binning is skipped and the model is a native Booster (same
+    predict(X) interface).
+    """
     y = df[target].astype(float)
+    if dataset is not None:
+        from .lgb_dataset import load_dataset
+        t0 = time.perf_counter()
+        ds = load_dataset(dataset, y.to_numpy(), sample_weight)
+        params = dict(_PLAYER_PARAMS, num_threads=n_jobs or 0)
+        m = lgb.train(params, ds, num_boost_round=_PLAYER_ROUNDS)
+        return ModelBundle(
+            model=m,
+            features=features,
+            target=target,
+            model_name=f"lgbm_tweedie_{target}",
+            model_version=version,
+            train_rows=len(y),
+            train_seconds=time.perf_counter() - t0,
+            data_fingerprint=data_fingerprint(df, list(features) + [target]),
+        )
+    X = df[features].fillna(0)
 
     # Tweedie is much more stable for low-count data
     m = LGBMRegressor(
         objective="tweedie",
         tweedie_variance_power=1.1,  # close to Poisson
-        n_estimators=400,
+        n_estimators=_PLAYER_ROUNDS,
         learning_rate=0.03,
         max_depth=-1,
         subsample=0.8,
         colsample_bytree=0.8,
-        min_data_in_leaf=20
+        min_data_in_leaf=20,
+        n_jobs=n_jobs,
     )
+    t0 = time.perf_counter()
     m.fit(X, y, sample_weight=sample_weight)
 
     return ModelBundle(
@@ -37,18 +78,23 @@ def train_player_count(df, features, target, sample_weight=None, version="0.3.0"
         features=features,
         target=target,
         model_name=f"lgbm_tweedie_{target}",
-        model_version=version
+        model_version=version,
+        train_rows=len(X),
+        train_seconds=time.perf_counter() - t0,
+        data_fingerprint=data_fingerprint(df, list(features) + [target]),
     )
 
-def train_team_goals(df_team, features, target="team_goals", sample_weight=None, version="0.3.0"):
+def train_team_goals(df_team, features, target="team_goals", sample_weight=None, version="0.3.0", n_jobs=None):
     X = df_team[features].fillna(0)
     y = df_team[target].astype(float)
 
     m = LGBMRegressor(
         objective="poisson",     # totals still suit Poisson
         n_estimators=300,
-        learning_rate=0.05
+        learning_rate=0.05,
+        n_jobs=n_jobs,
     )
+    t0 = time.perf_counter()
     m.fit(X, y, sample_weight=sample_weight)
 
     return ModelBundle(
@@ -56,5 +102,8 @@ def train_team_goals(df_team, features, target="team_goals", sample_weight=None,
         features=features,
         target=target,
         model_name="lgbm_poisson_team_goals",
-        model_version=version
+        model_version=version,
+        train_rows=len(X),
+        train_seconds=time.perf_counter() - t0,
+        data_fingerprint=data_fingerprint(df_team, list(features) + [target]),
     )
@@ -1,9 +1,17 @@
 from __future__ import annotations
+import os, time, weakref
 from dataclasses import dataclass
 from typing import List
 import numpy as np
 import pandas as pd
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestRegressor
+from .qrf_forest import QuantileForest
+from .forest_kernel import ForestKernel
+from .registry import data_fingerprint
+from ..utils.trace import traced
+
+QRF_TARGETS = ("points", "goals", "assists", "shots_on_goal")
 
 @dataclass
 class ModelBundle:
@@ -12,34 +20,272 @@ class ModelBundle:
     target: str
     model_name: str
     model_version: str
+    output: int = 0   # output index of a multi-output forest
+    train_rows: int = 0
+    train_seconds: float = 0.0
+    data_fingerprint: str | None = None
 
-def train_player_qrf(df: pd.DataFrame, features: list[str], target: str, version: str = "0.3.0") -> ModelBundle:
+@traced
+def train_player_qrf(df: pd.DataFrame, features: list[str], target: str, version: str = "0.3.0",
+                     mode: str | None = None, n_estimators: int = 600, n_jobs: int = -1) -> ModelBundle:
+    """mode "leaf" (default, env WS_QRF_MODE): Meinshausen QRF; "trees": plain forest, quantiles of tree means."""
+    mode = mode or os.getenv("WS_QRF_MODE", "leaf")
     X = df[features].fillna(0)
     y = df[target].astype(float)
     rf = RandomForestRegressor(
-        n_estimators=600,
+        n_estimators=n_estimators,
         max_depth=None,
         min_samples_leaf=2,
         random_state=42,
-        n_jobs=-1,
+        n_jobs=n_jobs,
         bootstrap=True,
     )
+    t0 = time.perf_counter()
     rf.fit(X, y)
+    rf.set_params(n_jobs=-1)  # training thread budget shouldn't cap serving
+    model = QuantileForest(rf, X, y) if mode == "leaf" else rf
+    if mode == "leaf":
+        _stamp_full_fit(model, df, X, y.to_numpy()[:, None])
     return ModelBundle(
-        model=rf,
+        model=model,
         features=features,
         target=target,
         model_name=f"rf_qrf_{target}",
         model_version=version,
+        train_rows=len(X),
+        train_seconds=time.perf_counter() - t0,
+        data_fingerprint=data_fingerprint(df, list(features) + [target]),
     )
 
 
-def qrf_predict_with_quantiles(bundle: ModelBundle, X: pd.DataFrame, q_low: float = 0.10, q_high: float = 0.90):
-    # Convert to numpy array to silence sklearn's feature-name warning
+@dataclass
+class MultiModelBundle:
+    """One multi-output QRF serving several targets; `for_target` gives per-target bundles."""
+    model: QuantileForest
+    features: List[str]
+    targets: List[str]
+    model_name: str
+    model_version: str
+    train_rows: int = 0
+    train_seconds: float = 0.0
+    data_fingerprint: str | None = None
+
+    @property
+    def target(self) -> str:
+        return "+".join(self.targets)
+
+    def for_target(self, target: str) -> ModelBundle:
+        return ModelBundle(self.model, self.features, target, self.model_name, self.model_version,
+                           output=self.model.output_index(target))
+
+
+@traced
+def train_player_qrf_multi(df: pd.DataFrame, features: list[str], targets: list[str], version: str = "0.3.0",
+                           n_estimators: int = 600, n_jobs: int = -1) -> MultiModelBundle:
+    """One forest on the stacked target matrix; splits minimise the summed per-target MSE."""
+    X = df[features].fillna(0)
+    Y = df[list(targets)].astype(float).fillna(0).to_numpy()
+    # unit-variance targets so high-variance ones (shots) don't decide every split
+    scale = Y.std(axis=0)
+    scale[scale == 0] = 1.0
+    rf = RandomForestRegressor(
+        n_estimators=n_estimators,
+        max_depth=None,
+        min_samples_leaf=2,
+        random_state=42,
+        n_jobs=n_jobs,
+        bootstrap=True,
+    )
+    t0 = time.perf_counter()
+    rf.fit(X, Y / scale)
+    rf.set_params(n_jobs=-1)
+    model = QuantileForest(rf, X, Y, targets=list(targets), scale=scale)
+    _stamp_full_fit(model, df, X, Y)
+    return MultiModelBundle(
+        model=model,
+        features=features,
+        targets=list(targets),
+        model_name="rf_qrf_multi",
+        model_version=version,
+        train_rows=len(X),
+        train_seconds=time.perf_counter() - t0,
+        data_fingerprint=data_fingerprint(df, list(features) + list(targets)),
+    )
+
+
+def bundle_from_loaded(d: dict) -> ModelBundle | MultiModelBundle:
+    """Rebuild a bundle from an io_qrf load_* dict (per-target view if it carries `output`)."""
+    if d.get("targets") and "output" not in d:
+        return MultiModelBundle(d["model"], d["features"], list(d["targets"]), d["model_name"], d["model_version"])
+    return ModelBundle(d["model"], d["features"], d["target"], d["model_name"], d["model_version"],
+                       output=d.get("output", 0))
+
+
+# ---------- incremental (warm-start) updates ----------
+#
+# A full fit stamps the forest with a reference profile of its training data
+# (per-feature quantile bins, target mean/std), the data date each tree was
+# grown on and the last data date seen. update_player_qrf then grows a bounded
+# number of new trees on a recent window with sklearn's warm_start, retires
+# trees past a maximum age (and the oldest beyond the tree cap), and rebuilds
+# the leaf index over the full training frame, so old trees' leaf
+# distributions also pick up the new rows (apply() only, no refitting).
+# Growth cost scales with the recent window; the index pass is a traversal.
+# Drift guards fall back to a full retrain.
+
+def _data_through(df: pd.DataFrame) -> pd.Timestamp:
+    d = pd.to_datetime(df["date"], errors="coerce").max() if "date" in df.columns else pd.NaT
+    return (pd.Timestamp.utcnow().tz_localize(None) if pd.isna(d) else d).normalize()
+
+
+def _profile(X: pd.DataFrame, Y: np.ndarray, bins: int = 10) -> dict:
+    edges = {}
+    for f in X.columns:
+        e = np.unique(np.quantile(X[f].to_numpy(dtype=float), np.linspace(0, 1, bins + 1)))
+        if len(e) >= 2:
+            edges[f] = (e, _bin_freq(X[f].to_numpy(dtype=float), e))
+    return {"edges": edges, "y_mean": Y.mean(axis=0), "y_std": Y.std(axis=0)}
+
+
+def _bin_freq(x: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    h = np.histogram(np.clip(x, edges[0], edges[-1]), bins=edges)[0]
+    return h / max(len(x), 1)
+
+
+def _psi(ref: np.ndarray, cur: np.ndarray, eps: float = 1e-4) -> float:
+    ref, cur = np.maximum(ref, eps), np.maximum(cur, eps)
+    return float(np.sum((cur - ref) * np.log(cur / ref)))
+
+
+def _stamp_full_fit(model: QuantileForest, df: pd.DataFrame, X: pd.DataFrame, Y: np.ndarray) -> None:
+    through = _data_through(df)
+    model.profile = _profile(X, Y)
+    model.data_through = through
+    model.tree_born = np.full(model.n_trees, through.to_datetime64(), dtype="datetime64[D]")
+    model.updates = 0
+
+
+def drift_report(model: QuantileForest, X: pd.DataFrame, Y: np.ndarray) -> dict:
+    """Max feature PSI and max target-mean shift (in reference std units) of (X, Y) vs the full-fit profile."""
+    prof = model.profile
+    psi = {f: _psi(freq, _bin_freq(X[f].to_numpy(dtype=float), e))
+           for f, (e, freq) in prof["edges"].items() if f in X.columns}
+    std = np.where(prof["y_std"] > 0, prof["y_std"], 1.0)
+    shift = np.abs(Y.mean(axis=0) - prof["y_mean"]) / std
+    worst = max(psi, key=psi.get) if psi else None
+    return {"psi_max": psi[worst] if worst else 0.0, "psi_feature": worst, "target_shift": float(shift.max())}
+
+
+@traced
+def update_player_qrf(bundle, df: pd.DataFrame, new_trees: int | None = None, max_trees: int | None = None,
+                      recent_days: int | None = None, max_age_days: int | None = None,
+                      max_updates: int | None = None, psi_max: float | None = None,
+                      shift_max: float | None = None, n_jobs: int = -1):
+    """Warm-start `bundle` (ModelBundle or MultiModelBundle) on `df`, the current full training frame.
+
+    Returns (bundle, note). Falls back to a full retrain when the bundle can't be
+    warm-started, after `max_updates` increments, or when the recent window drifts
+    (feature PSI > psi_max or target mean shift > shift_max reference stds).
+    """
+    env = lambda k, d: type(d)(os.getenv(k, d))
+    new_trees = new_trees or env("WS_QRF_NEW_TREES", 50)
+    recent_days = recent_days or env("WS_QRF_RECENT_DAYS", 30)
+    max_age_days = max_age_days or env("WS_QRF_MAX_TREE_AGE_DAYS", 60)
+    max_updates = max_updates or env("WS_QRF_MAX_UPDATES", 14)
+    psi_max = psi_max or env("WS_QRF_PSI_MAX", 0.25)
+    shift_max = shift_max or env("WS_QRF_SHIFT_MAX", 0.5)
+    multi = isinstance(bundle, MultiModelBundle)
+    targets = list(bundle.targets) if multi else [bundle.target]
+
+    def full(reason: str):
+        n = max_trees or env("WS_QRF_MAX_TREES", 600)
+        if multi:
+            b = train_player_qrf_multi(df, bundle.features, targets, version=bundle.model_version,
+                                       n_estimators=n, n_jobs=n_jobs)
+        else:
+            b = train_player_qrf(df, bundle.features, bundle.target, version=bundle.model_version,
+                                 mode="leaf", n_estimators=n, n_jobs=n_jobs)
+        return b, f"full retrain ({reason})"
+
+    qf = bundle.model
+    if not isinstance(qf, QuantileForest) or qf.forest is None or getattr(qf, "profile", None) is None:
+        return full("no warm-startable forest")
+    if getattr(qf, "updates", 0) >= max_updates:
+        return full(f"{qf.updates} incremental updates since the last full fit")
+    max_trees = max_trees or qf.n_trees
+
+    dates = pd.to_datetime(df["date"], errors="coerce")
+    through = _data_through(df)
+    if through <= qf.data_through:
+        return bundle, f"no rows after {qf.data_through.date()}; kept"
+    recent = df[dates > through - pd.Timedelta(days=recent_days)]
+    X, Y = df[bundle.features].fillna(0), df[targets].astype(float).fillna(0).to_numpy()
+    Xr, Yr = recent[bundle.features].fillna(0), recent[targets].astype(float).fillna(0).to_numpy()
+    drift = drift_report(qf, Xr, Yr)
+    if drift["psi_max"] > psi_max:
+        return full(f"feature drift: PSI {drift['psi_max']:.2f} on {drift['psi_feature']}")
+    if drift["target_shift"] > shift_max:
+        return full(f"target shift {drift['target_shift']:.2f} std")
+
+    t0 = time.perf_counter()
+    # grow a clone: qf.forest is the loaded artifact held by registry.cache, which must stay
+    # as saved if this update fails; the surviving trees are shared, never refit
+    rf = clone(qf.forest)
+    rf.estimators_ = list(qf.forest.estimators_)
+    n_old = len(rf.estimators_)
+    # fresh seed per update: warm_start would otherwise re-draw seeds already used by surviving trees
+    rf.set_params(warm_start=True, n_estimators=n_old + new_trees, n_jobs=n_jobs,
+                  random_state=42 + 1000 * (qf.updates + 1))
+    rf.fit(Xr, (Yr / qf.scale) if multi else Yr[:, 0])
+    born = np.concatenate([qf.tree_born, np.full(new_trees, through.to_datetime64(), dtype="datetime64[D]")])
+    age = (through.to_datetime64().astype("datetime64[D]") - born).astype(int)
+    keep = age <= max_age_days
+    keep[n_old:] = True                                # never retire what was just grown
+    over = int(keep.sum()) - max_trees
+    if over > 0:                                       # then the oldest survivors beyond the cap
+        keep[np.flatnonzero(keep)[:over]] = False
+    rf.estimators_ = [e for e, k in zip(rf.estimators_, keep) if k]
+    rf.set_params(warm_start=False, n_estimators=len(rf.estimators_), n_jobs=-1)
+
+    model = QuantileForest(rf, X, Y if multi else Y[:, 0], targets=qf.targets, scale=qf.scale)
+    model.profile, model.data_through = qf.profile, through
+    model.tree_born, model.updates = born[keep], qf.updates + 1
+    fields = dict(model=model, features=bundle.features, model_name=bundle.model_name,
+                  model_version=bundle.model_version, train_rows=len(X), train_seconds=time.perf_counter() - t0,
+                  data_fingerprint=data_fingerprint(df, list(bundle.features) + targets))
+    out = MultiModelBundle(targets=targets, **fields) if multi else ModelBundle(target=bundle.target, **fields)
+    return out, (f"incremental: +{new_trees} trees on {len(recent)} recent rows, "
+                 f"retired {int((~keep).sum())}, {len(rf.estimators_)} trees, update {model.updates}/{max_updates}")
+
+
+def qrf_predict_quantile_grid(bundle: ModelBundle, X: pd.DataFrame, qs) -> tuple[np.ndarray, np.ndarray]:
+    """(mean, quantiles of shape (n_rows, len(qs))) for any quantile grid in one pass."""
     X = X[bundle.features].fillna(0).to_numpy()
-    est = np.stack([t.predict(X) for t in bundle.model.estimators_], axis=1)  # (n_samples, n_trees)
-    mean = est.mean(axis=1)
-    q10 = np.quantile(est, q_low, axis=1)
-    q90 = np.quantile(est, q_high, axis=1)
-    return mean, q10, q90
+    if isinstance(bundle.model, QuantileForest):
+        return bundle.model.predict_with_quantiles(X, qs, output=getattr(bundle, "output", 0))
+    # legacy forests: quantiles of per-tree means (narrower than true conditional quantiles),
+    # from the array-compiled kernel in row chunks under the memory ceiling
+    return _kernel(bundle.model).predict(X, qs)
+
+
+_KERNELS: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()   # forest -> compiled kernel
+
 
+def _kernel(forest) -> ForestKernel:
+    k = _KERNELS.get(forest)
+    if k is None or len(k.roots) != len(forest.estimators_):
+        k = _KERNELS[forest] = ForestKernel.from_sklearn(forest)
+    return k
+
+
+@traced
+def qrf_predict_multi(bundle: MultiModelBundle, X: pd.DataFrame, qs) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """target -> (mean, quantiles) for every target of a multi-output bundle, one pass over the trees."""
+    X = X[bundle.features].fillna(0).to_numpy()
+    return dict(zip(bundle.targets, bundle.model.predict_all(X, qs)))
+
+
+@traced
+def qrf_predict_with_quantiles(bundle: ModelBundle, X: pd.DataFrame, q_low: float = 0.10, q_high: float = 0.90):
+    mean, q = qrf_predict_quantile_grid(bundle, X, [q_low, q_high])
+    return mean, q[:, 0], q[:, 1]
@@ -0,0 +1,112 @@
+from __future__ import annotations
+import hashlib, json, time, traceback
+from dataclasses import dataclass, field
+from graphlib import TopologicalSorter
+from typing import Any, Callable, Iterator
+from .trace import span
+
+# In-process DAG of pipeline stages with content-fingerprint skipping.
+#
+# Every stage declares its dependencies, a function describing its inputs (a
+# small JSON-able dict: file content hashes, max dates, registry pointers,
+# options) and a function doing the work, which returns a dict describing its
+# outputs. Stages run in dependency order inside one process, so frames loaded
+# by one stage are reused by the next. Before running a stage its inputs are
+# fingerprinted and compared with the fingerprint recorded the last time it
+# ran; when they match (and `outputs_ok` confirms the recorded outputs are
+# still there) the stage is skipped, its recorded outputs are handed to the
+# stages that depend on it, and its last run time is reported as time saved.
+# A failed stage blocks everything downstream of it; independent stages still run.
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[Any, dict], dict | None]                  # (ctx, upstream outputs) -> outputs
+    inputs: Callable[[Any, dict], dict]                       # (ctx, upstream outputs) -> fingerprint parts
+    deps: tuple[str, ...] = ()
+    outputs_ok: Callable[[Any, dict], bool] | None = None     # (ctx, recorded outputs) -> still valid?
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str                       # ran | skipped | failed | blocked
+    seconds: float = 0.0
+    saved_seconds: float = 0.0
+    fingerprint: str | None = None
+    inputs: dict = field(default_factory=dict)
+    outputs: dict = field(default_factory=dict)
+    error: str | None = None
+
+    def summary(self) -> str:
+        if self.status == "ran":
+            return f"{self.name}: ran in {self.seconds:.2f}s"
+        if self.status == "skipped":
+            return f"{self.name}: skipped, inputs unchanged ({self.seconds:.2f}s to check, ~{self.saved_seconds:.2f}s saved)"
+        if self.status == "blocked":
+            return f"{self.name}: not run, {self.error}"
+        last = (self.error or "").strip().splitlines() or [""]
+        return f"{self.name}: FAILED after {self.seconds:.2f}s: {last[-1]}"
+
+
+def fingerprint(parts: dict) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def order(stages: list[Stage]) -> list[Stage]:
+    """Stages in dependency order (declaration order among independent ones); deps outside the set are ignored."""
+    by_name = {s.name: s for s in stages}
+    ts = TopologicalSorter()
+    for s in stages:
+        ts.add(s.name, *[d for d in s.deps if d in by_name])
+    ts.prepare()                      # raises graphlib.CycleError on cycles
+    out = []
+    while ts.is_active():
+        ready = sorted(ts.get_ready(), key=[s.name for s in stages].index)
+        for name in ready:
+            out.append(by_name[name])
+            ts.done(name)
+    return out
+
+
+def run_dag(stages: list[Stage], ctx: Any, previous: Callable[[str], dict | None],
+            force: set[str] | frozenset = frozenset(),
+            after: Callable[[StageResult], None] | None = None) -> Iterator[StageResult]:
+    """Run (or skip) each stage in order, yielding a StageResult per stage.
+
+    previous(name) returns the last successful run's record ({"fingerprint", "seconds", "outputs"})
+    or None; stages named in `force` (or "all") always run. `after` is called after every stage.
+    """
+    outputs: dict[str, dict] = {}
+    bad: set[str] = set()
+    for stage in order(stages):
+        blocked = [d for d in stage.deps if d in bad]
+        if blocked:
+            res = StageResult(stage.name, "blocked", error=f"upstream {', '.join(blocked)} did not complete")
+        else:
+            res = _run_stage(stage, ctx, outputs, previous(stage.name),
+                             "all" in force or stage.name in force)
+        if res.status in ("ran", "skipped"):
+            outputs[stage.name] = res.outputs
+        else:
+            bad.add(stage.name)
+        if after is not None:
+            after(res)
+        yield res
+
+
+def _run_stage(stage: Stage, ctx: Any, upstream: dict, prev: dict | None, forced: bool) -> StageResult:
+    t0 = time.perf_counter()
+    try:
+        parts = stage.inputs(ctx, upstream)
+        fp = fingerprint(parts)
+        if (not forced and prev is not None and prev.get("fingerprint") == fp
+                and (stage.outputs_ok is None or stage.outputs_ok(ctx, prev.get("outputs") or {}))):
+            return StageResult(stage.name, "skipped", time.perf_counter() - t0, float(prev.get("seconds") or 0.0),
+                               fp, parts, prev.get("outputs") or {})
+        with span(f"stage:{stage.name}", fingerprint=fp):
+            out = stage.run(ctx, upstream) or {}
+        return StageResult(stage.name, "ran", time.perf_counter() - t0, 0.0, fp, parts, out)
+    except Exception:
+        return StageResult(stage.name, "failed", time.perf_counter() - t0, error=traceback.format_exc())
@@ -0,0 +1,278 @@
+from __future__ import annotations
+import atexit, functools, json, os, sys, threading, time, uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Iterator
+
+try:
+    import resource
+except Exception:          # not on Windows
+    resource = None
+
+# Span tracing for CLI runs.
+#
+# `ws --profile` (or WS_PROFILE=1 for `python -m white_shorts.cli.*` entry
+# points) starts a tracer for the process. Stage functions are wrapped with
+# @traced / `with span(...)`; each call becomes a span with its parent (spans
+# nest per thread), wall time, CPU time (process_time, so threads the call
+# fans out to are included, worker processes are not), RSS at start / end,
+# the process's peak RSS so far, and row counts (rows of the first frame-like
+# argument and of the result). When tracing is off the wrappers cost one
+# global lookup.
+#
+# At the end of the run the spans are written to the DuckDB `run_spans` table,
+# optionally to a Chrome trace file (chrome://tracing, Perfetto) given with
+# --trace-json / WS_TRACE_JSON, and a per-name summary (calls, wall, self
+# time, CPU, rows) is printed to stderr.
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS run_spans (
+    run_id VARCHAR, command VARCHAR, span_id INTEGER, parent_id INTEGER, depth INTEGER, name VARCHAR,
+    start_s DOUBLE, wall_s DOUBLE, cpu_s DOUBLE, rss_start_mb DOUBLE, rss_end_mb DOUBLE, peak_rss_mb DOUBLE,
+    rows_in BIGINT, rows_out BIGINT, status VARCHAR, attrs_json VARCHAR, pid INTEGER, thread VARCHAR,
+    created_ts TIMESTAMP);
+"""
+
+
+def _flag(name: str) -> bool:
+    return os.getenv(name, "0").strip().lower() not in ("0", "false", "no", "")
+
+
+def _rss_mb() -> float | None:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except Exception:
+        return None
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10   # bytes on macOS, KiB on Linux
+
+
+def _rows(obj: Any) -> int | None:
+    """Row count of a frame / array / Arrow table (first element of a tuple result)."""
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]
+    shape = getattr(obj, "shape", None)
+    if shape:
+        return int(shape[0])
+    n = getattr(obj, "num_rows", None)
+    return int(n) if isinstance(n, int) else None
+
+
+@dataclass
+class Span:
+    span_id: int
+    parent_id: int | None
+    depth: int
+    name: str
+    start_s: float
+    rss_start_mb: float | None
+    attrs: dict = field(default_factory=dict)
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    rss_end_mb: float | None = None
+    peak_rss_mb: float | None = None
+    rows_in: int | None = None
+    rows_out: int | None = None
+    status: str = "ok"
+    thread: str = ""
+
+    def set(self, rows_in: int | None = None, rows_out: int | None = None, **attrs) -> None:
+        """Fill in row counts / attributes from inside the span."""
+        if rows_in is not None:
+            self.rows_in = int(rows_in)
+        if rows_out is not None:
+            self.rows_out = int(rows_out)
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    def __init__(self, run_id: str, command: str = "", trace_json: str | None = None):
+        self.run_id, self.command, self.trace_json = run_id, command, trace_json
+        self.spans: list[Span] = []
+        self.t0 = time.perf_counter()
+        self._ids = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> list[Span]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name: str, attrs: dict) -> Iterator[Span]:
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        with self._lock:
+            self._ids += 1
+            sid = self._ids
+        s = Span(sid, parent.span_id if parent else None, len(stack), name, time.perf_counter() - self.t0,
+                 _rss_mb(), dict(attrs), thread=threading.current_thread().name)
+        stack.append(s)
+        c0 = time.process_time()
+        try:
+            yield s
+        except BaseException as e:
+            s.status = f"error: {type(e).__name__}"
+            raise
+        finally:
+            s.wall_s = time.perf_counter() - self.t0 - s.start_s
+            s.cpu_s = time.process_time() - c0
+            s.rss_end_mb, s.peak_rss_mb = _rss_mb(), _peak_rss_mb()
+            stack.pop()
+            with self._lock:
+                self.spans.append(s)
+
+
+class _NullSpan:
+    def set(self, *args, **kwargs) -> None:
+        pass
+
+
+_NULL = _NullSpan()
+_tracer: Tracer | None = None
+
+
+def active() -> Tracer | None:
+    return _tracer
+
+
+@contextmanager
+def span(name: str, rows_in: int | None = None, **attrs) -> Iterator[Span | _NullSpan]:
+    """Record the enclosed block as a span (a no-op span when tracing is off)."""
+    if _tracer is None:
+        yield _NULL
+        return
+    with _tracer.span(name, attrs) as s:
+        s.set(rows_in=rows_in)
+        yield s
+
+
+def traced(name: str | Callable | None = None):
+    """Decorator: every call is a span named `name` (default: the function's qualified name).
+
+    Rows in = the first frame-like argument, rows out = the result; short scalar
+    positional arguments (paths, targets, model prefixes) are kept as attributes.
+    """
+    def deco(fn):
+        label = name if isinstance(name, str) else fn.__qualname__.replace(".<locals>", "")
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return fn(*args, **kwargs)
+            args_attr = [a if isinstance(a, (int, float, bool)) else str(a)[:200]
+                         for a in args if isinstance(a, (str, int, float, bool, os.PathLike))]
+            rows_in = next((r for r in map(_rows, args) if r is not None), None)
+            with _tracer.span(label, {"args": args_attr} if args_attr else {}) as s:
+                s.set(rows_in=rows_in)
+                out = fn(*args, **kwargs)
+                s.set(rows_out=_rows(out))
+                return out
+        return wrapper
+    return deco(name) if callable(name) else deco
+
+
+def start(run_id: str | None = None, command: str | None = None, trace_json: str | None = None) -> Tracer:
+    """Start tracing this process (idempotent: returns the running tracer)."""
+    global _tracer
+    if _tracer is None:
+        run_id = run_id or os.getenv("WS_RUN_ID") or f"trace-{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}"
+        _tracer = Tracer(run_id, command if command is not None else " ".join(sys.argv[1:])[:500],
+                         trace_json or os.getenv("WS_TRACE_JSON") or None)
+    elif trace_json:
+        _tracer.trace_json = trace_json
+    return _tracer
+
+
+def start_from_env() -> Tracer | None:
+    """WS_PROFILE=1: trace the whole process and write the spans at exit."""
+    if not _flag("WS_PROFILE"):
+        return None
+    tracer = start()
+    atexit.register(finish)
+    return tracer
+
+
+def summary(spans: list[Span]) -> list[dict]:
+    """Per-name totals: calls, wall, self (wall minus direct children), CPU, rows, peak RSS."""
+    child_wall: dict[int, float] = {}
+    for s in spans:
+        if s.parent_id is not None:
+            child_wall[s.parent_id] = child_wall.get(s.parent_id, 0.0) + s.wall_s
+    agg: dict[str, dict] = {}
+    for s in spans:
+        a = agg.setdefault(s.name, {"name": s.name, "calls": 0, "wall_s": 0.0, "self_s": 0.0, "cpu_s": 0.0,
+                                    "rows_out": 0, "peak_rss_mb": 0.0})
+        a["calls"] += 1
+        a["wall_s"] += s.wall_s
+        a["self_s"] += max(0.0, s.wall_s - child_wall.get(s.span_id, 0.0))
+        a["cpu_s"] += s.cpu_s
+        a["rows_out"] += s.rows_out or 0
+        a["peak_rss_mb"] = max(a["peak_rss_mb"], s.peak_rss_mb or 0.0)
+    return sorted(agg.values(), key=lambda a: -a["self_s"])
+
+
+def chrome_trace(tracer: Tracer) -> dict:
+    """Chrome trace-event JSON ("X" complete events, microseconds)."""
+    pid = os.getpid()
+    tids: dict[str, int] = {}
+    events = []
+    for s in sorted(tracer.spans, key=lambda s: s.start_s):
+        tid = tids.setdefault(s.thread, len(tids))
+        events.append({"name": s.name, "ph": "X", "ts": s.start_s * 1e6, "dur": s.wall_s * 1e6, "pid": pid,
+                       "tid": tid, "args": {"cpu_s": round(s.cpu_s, 6), "rows_in": s.rows_in, "rows_out": s.rows_out,
+                                            "rss_start_mb": s.rss_start_mb, "rss_end_mb": s.rss_end_mb,
+                                            "peak_rss_mb": s.peak_rss_mb, "status": s.status, **s.attrs}})
+    events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": t, "args": {"name": n}} for n, t in tids.items()]
+    return {"traceEvents": events, "displayTimeUnit": "ms",
+            "otherData": {"run_id": tracer.run_id, "command": tracer.command}}
+
+
+def _write_spans(tracer: Tracer) -> None:
+    import pandas as pd
+    from ..data.persist import append, connection
+    with connection() as con:
+        con.execute(_DDL)
+    now = datetime.utcnow()
+    append("run_spans", pd.DataFrame([{
+        "run_id": tracer.run_id, "command": tracer.command, "span_id": s.span_id, "parent_id": s.parent_id,
+        "depth": s.depth, "name": s.name, "start_s": s.start_s, "wall_s": s.wall_s, "cpu_s": s.cpu_s,
+        "rss_start_mb": s.rss_start_mb, "rss_end_mb": s.rss_end_mb, "peak_rss_mb": s.peak_rss_mb,
+        "rows_in": s.rows_in, "rows_out": s.rows_out, "status": s.status,
+        "attrs_json": json.dumps(s.attrs, default=str), "pid": os.getpid(), "thread": s.thread, "created_ts": now,
+    } for s in tracer.spans]))
+
+
+def finish(echo: bool = True) -> Tracer | None:
+    """Stop tracing; write run_spans (+ the Chrome trace) and print the per-name summary."""
+    global _tracer
+    tracer, _tracer = _tracer, None          # writing the spans must not trace itself
+    if tracer is None or not tracer.spans:
+        return tracer
+    if tracer.trace_json:
+        os.makedirs(os.path.dirname(os.path.abspath(tracer.trace_json)), exist_ok=True)
+        with open(tracer.trace_json, "w", encoding="utf-8") as f:
+            json.dump(chrome_trace(tracer), f)
+    try:
+        _write_spans(tracer)
+        where = "run_spans"
+    except Exception as e:                   # a locked / read-only DB must not fail the run
+        where = f"not written to run_spans ({type(e).__name__}: {e})"
+    if echo:
+        out = sys.stderr
+        print(f"profile {tracer.run_id}: {len(tracer.spans)} spans → {where}"
+              + (f", {tracer.trace_json}" if tracer.trace_json else ""), file=out)
+        print(f"  {'span':34s} {'calls':>5s} {'wall s':>8s} {'self s':>8s} {'cpu s':>8s} {'rows out':>10s} {'peak MB':>8s}",
+              file=out)
+        for a in summary(tracer.spans)[:25]:
+            print(f"  {a['name'][:34]:34s} {a['calls']:5d} {a['wall_s']:8.3f} {a['self_s']:8.3f} {a['cpu_s']:8.3f} "
+                  f"{a['rows_out']:10,d} {a['peak_rss_mb']:8.0f}", file=out)
+    return tracer
@@ -0,0 +1,73 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+import pytest
+
+from white_shorts.data.synthetic import SyntheticLeague
+from white_shorts.features.engine import engineer_fast
+from white_shorts.features.engineer import engineer_minimal
+
+
+def assert_parity(df: pd.DataFrame) -> None:
+    """engineer_fast == engineer_minimal: same columns, rows, order, index and values."""
+    ref, fast = engineer_minimal(df), engineer_fast(df)
+    pd.testing.assert_index_equal(ref.columns, fast.columns)
+    pd.testing.assert_index_equal(ref.index, fast.index)
+    for c in ref.columns:
+        pd.testing.assert_series_equal(ref[c], fast[c], check_dtype=False, check_exact=False, rtol=1e-9)
+
+
+@pytest.fixture(scope="module")
+def history() -> pd.DataFrame:
+    return SyntheticLeague(teams=6, games_per_team=24, seed=3).history(seasons=2, end="2025-04-15")
+
+
+def test_synthetic_history(history):
+    assert_parity(history)
+
+
+def test_string_dates_and_shuffled_rows(history):
+    df = history.sample(frac=1.0, random_state=0)
+    df["date"] = pd.to_datetime(df["date"]).dt.strftime("%d/%m/%Y")
+    assert_parity(df)
+
+
+def test_ties_on_the_same_date(history):
+    # a player with two rows on one date (double header / duplicated feed row),
+    # plus the many same-date rows per team and opponent every game day has
+    pid = history["player_id"].iloc[0]
+    rows = history.loc[history["player_id"] == pid].iloc[[2, 5]].copy()
+    rows["points"] = rows["points"] + 1
+    df = pd.concat([history, rows], ignore_index=True)
+    assert df.duplicated(["player_id", "date"]).any()
+    assert_parity(df)
+
+
+def test_player_changes_team(history):
+    df = history.copy()
+    pid = df["player_id"].iloc[0]
+    mine = df.index[df["player_id"] == pid]
+    later = mine[len(mine) // 2:]
+    old_team = df.at[later[0], "team"]
+    new_team = next(t for t in df["team"].unique() if t != old_team)
+    df.loc[later, "team"] = new_team
+    df.loc[later, "opponent"] = np.where(df.loc[later, "opponent"] == new_team, old_team,
+                                         df.loc[later, "opponent"])
+    assert df.loc[mine, "team"].nunique() == 2
+    assert_parity(df)
+
+
+def test_single_game_players(history):
+    one = history.groupby("game_id").head(1).head(3).copy()
+    one["player_id"] = [99_000_001, 99_000_002, 99_000_003]
+    df = pd.concat([history, one], ignore_index=True)
+    assert (df["player_id"].value_counts().loc[one["player_id"]] == 1).all()
+    assert_parity(df)
+
+
+def test_missing_keys_and_dates(history):
+    df = history.head(400).copy()
+    df.loc[df.index[::37], "date"] = None
+    df.loc[df.index[5::41], "team"] = None
+    df.loc[df.index[9::43], "opponent"] = None
+    assert_parity(df)